@@ -0,0 +1,92 @@
+'''
+broadcast_fanout.py :
+Microbenchmark comparing per-client encoding against
+the encode-once broadcast fan-out of the Server class
+'''
+# --- Libraries --- #
+import time
+import argparse
+from typing import Callable, Dict, Tuple, Union
+
+from terminal_chat_app.envelope import Envelope
+from terminal_chat_app.server import Server
+
+# --- Classes --- #
+class NullConnection:
+    '''
+    NullConnection class -
+    Stands in for a client socket and records every buffer handed to it
+    '''
+    buffers: Dict[int, bytes] = {}
+
+    def sendall(self, data: Union[bytes, memoryview]) -> None:
+        '''
+        Keep the underlying buffer alive, keyed by identity, and discard the data
+        '''
+        buffer: bytes = data.obj if isinstance(data, memoryview) else data
+        NullConnection.buffers[id(buffer)] = buffer
+        return
+
+
+class DirectServer(Server):
+    '''
+    DirectServer class -
+    Server writing frames straight to the connection instead of its
+    outbound queue, so every frame reaches the NullConnection
+    '''
+    def send_frame(self, conn: NullConnection, frame: Union[bytes, memoryview]) -> None:
+        '''
+        Hand the frame to the connection
+        '''
+        conn.sendall(frame)
+        return
+
+
+# --- Functions --- #
+def per_client_broadcast(server: Server, message: Envelope) -> None:
+    '''
+    Previous broadcast implementation: encode the message once per recipient
+    '''
+    for client in server.registry.snapshot():
+        server.send_envelope(client, message)
+
+
+def measure(broadcast: Callable[[Server, Envelope], None], server: Server, message: Envelope, rounds: int) -> Tuple[float, float]:
+    '''
+    Return the average time in microseconds and the average number
+    of frame buffers allocated per broadcast
+    '''
+    buffers: int = 0
+    start: float = time.perf_counter()
+
+    for _ in range(rounds):
+        NullConnection.buffers.clear()
+        broadcast(server, message)
+        buffers += len(NullConnection.buffers)
+
+    elapsed: float = time.perf_counter() - start
+    return elapsed / rounds * 1e6, buffers / rounds
+
+
+# --- Main function --- #
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the broadcast fan-out')
+    parser.add_argument('--clients', type=int, default=1000, help='Number of connected clients')
+    parser.add_argument('--size', type=int, default=120, help='Message size in characters')
+    parser.add_argument('--rounds', type=int, default=200, help='Number of broadcasts to time')
+    arguments: argparse.Namespace = parser.parse_args()
+
+    server = DirectServer()
+    for port in range(arguments.clients):
+        client = NullConnection()
+        server.registry.add(client, ('127.0.0.1', port))
+        server.registry.claim('bench%d' % port)
+        server.registry.register(client, 'bench%d' % port)
+    message: Envelope = Envelope(Envelope.CHAT, 'x' * arguments.size, 'bench')
+
+    print('%d clients, %d character messages, %d rounds' % (arguments.clients, arguments.size, arguments.rounds))
+    for label, broadcast in [('per-client encode', per_client_broadcast), ('encode-once', Server.broadcast)]:
+        usec, buffers = measure(broadcast, server, message, arguments.rounds)
+        print('%-18s %10.1f us/broadcast %8.1f frames allocated/broadcast' % (label, usec, buffers))
+
+    server.server_socket.close()
@@ -0,0 +1,426 @@
+'''
+load_test.py :
+Load generator that starts a local server in its own process, connects
+simulated clients speaking the real chat protocol and measures throughput,
+fan-out latency and the resource usage of the server
+'''
+# --- Libraries --- #
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import argparse
+import platform
+import selectors
+import threading
+import multiprocessing
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Optional
+
+# Only available on Unix, elsewhere the file descriptor limit
+# is left as is and the peak memory is not reported
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from run_server import ENGINES
+from terminal_chat_app.base_socket import BaseSocket
+from terminal_chat_app.client import Client
+from terminal_chat_app.envelope import Envelope
+from terminal_chat_app.receive_buffer import ReceiveBuffer
+
+# --- Constants --- #
+MARKER: str = 'BENCH'
+
+# --- Classes --- #
+class Receiver:
+    '''
+    Receiver class -
+    Reads the messages of a share of the simulated clients on a
+    single thread and records the fan-out latency of benchmark messages
+    '''
+    def __init__(self, framing: BaseSocket) -> None:
+        '''
+        Initialization
+        '''
+        self.framing: BaseSocket = framing
+        self.selector: selectors.BaseSelector = selectors.DefaultSelector()
+        self.buffers: Dict[socket.socket, ReceiveBuffer] = {}
+        self.incoming: 'queue.SimpleQueue[socket.socket]' = queue.SimpleQueue()
+        self.latencies: List[int] = []
+        self.received: int = 0
+        self.last_receive: float = 0
+        self.running: bool = True
+        self.thread: threading.Thread = threading.Thread(target=self.run, daemon=True)
+
+
+    def add(self, conn: socket.socket) -> None:
+        '''
+        Hand a connected client over to the receiving thread
+        '''
+        self.incoming.put(conn)
+        return
+
+
+    def reset(self) -> None:
+        '''
+        Forget everything received so far
+        '''
+        self.latencies = []
+        self.received = 0
+        return
+
+
+    def run(self) -> None:
+        '''
+        Read every client until the benchmark stops
+        '''
+        while self.running:
+            while not self.incoming.empty():
+                conn: socket.socket = self.incoming.get()
+                self.buffers[conn] = ReceiveBuffer(self.framing)
+                self.selector.register(conn, selectors.EVENT_READ)
+
+            for key, _ in self.selector.select(0.05):
+                buffer: ReceiveBuffer = self.buffers[key.fileobj]
+
+                try:
+                    buffer.fill(key.fileobj)
+                except OSError:
+                    self.selector.unregister(key.fileobj)
+                    continue
+
+                now: int = time.perf_counter_ns()
+                for message in buffer.envelopes():
+                    self.received += 1
+
+                    if message.kind == Envelope.CHAT and message.text.startswith(MARKER + ' '):
+                        self.latencies.append(now - int(message.text.split(' ', 2)[1]))
+                        self.last_receive = time.perf_counter()
+
+        self.selector.close()
+        return
+
+
+# --- Functions --- #
+def raise_fd_limit() -> None:
+    '''
+    Allow the process to open as many sockets as the system permits
+    '''
+    if resource is None:
+        return
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY:
+        hard = 65536
+
+    try:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (max(soft, hard), hard))
+    except (ValueError, OSError):
+        pass
+
+    return
+
+
+def resource_usage() -> Dict[str, Any]:
+    '''
+    CPU time and memory used by the current process
+    '''
+    if resource is None:
+        return {'cpu_seconds': time.process_time()}
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    stats: Dict[str, Any] = {
+        'cpu_seconds': usage.ru_utime + usage.ru_stime,
+        # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+        'max_rss_kb': usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss,
+    }
+
+    if os.path.exists('/proc/self/statm'):
+        with open('/proc/self/statm') as statm:
+            stats['rss_kb'] = int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+
+    return stats
+
+
+def run_server_process(engine: str, host: str, port: int, control: Connection, quiet: bool) -> None:
+    '''
+    Run a server in the current process and answer usage requests
+    from the load generator until it asks the server to stop
+    '''
+    if quiet:
+        devnull: int = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+
+    raise_fd_limit()
+    server = ENGINES[engine](host, port)
+    threading.Thread(target=server.start_server, daemon=True).start()
+
+    while control.recv() != 'stop':
+        control.send({**resource_usage(), **server.outbound_stats()})
+
+    sys.stdout.flush()
+    os._exit(0)
+
+
+def connect_client(host: str, port: int, name: str, timeout: float=10) -> Client:
+    '''
+    Connect a client and complete the username handshake,
+    retrying while the server is starting up
+    '''
+    deadline: float = time.monotonic() + timeout
+
+    while True:
+        try:
+            client = Client(host, port)
+            break
+        except ConnectionRefusedError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+    response: Optional[Envelope] = client.send_username(name)
+    if response is None or response.kind != Envelope.LOGIN:
+        raise ConnectionError('Handshake failed for %s' % name)
+
+    return client
+
+
+def paste_messages(client: Client, size: int, interval: float, deadline: float) -> int:
+    '''
+    Send a large message of `size` characters every `interval` seconds
+    until the deadline, as when someone pastes a document in the chat.
+    Returns the number of messages sent
+    '''
+    text: str = 'p' * size
+    pasted: int = 0
+
+    while time.perf_counter() < deadline:
+        client.send_client_message(text)
+        pasted += 1
+        time.sleep(interval)
+
+    return pasted
+
+
+def wait_until_idle(receivers: List[Receiver], quiet_period: float, timeout: float) -> None:
+    '''
+    Wait until no receiver got anything for `quiet_period` seconds
+    '''
+    deadline: float = time.monotonic() + timeout
+    previous: int = -1
+
+    while time.monotonic() < deadline:
+        received: int = sum(receiver.received for receiver in receivers)
+        if received == previous:
+            return
+
+        previous = received
+        time.sleep(quiet_period)
+
+    return
+
+
+def percentile(values: List[int], fraction: float) -> float:
+    '''
+    Nearest-rank percentile of sorted nanosecond values, in milliseconds
+    '''
+    if not values:
+        return 0.0
+
+    index: int = min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))
+    return values[index] / 1e6
+
+
+def run_benchmark(arguments: argparse.Namespace) -> Dict[str, Any]:
+    '''
+    Start the server, connect the clients, drive the message load
+    and collect the results
+    '''
+    raise_fd_limit()
+    control, server_control = multiprocessing.Pipe()
+    server_process = multiprocessing.Process(
+        target=run_server_process,
+        args=(arguments.engine, arguments.host, arguments.port, server_control, not arguments.server_log),
+        daemon=True
+    )
+    server_process.start()
+
+    framing: BaseSocket = BaseSocket()
+    receivers: List[Receiver] = [Receiver(framing) for _ in range(arguments.receiver_threads)]
+    for receiver in receivers:
+        receiver.thread.start()
+
+    clients: List[Client] = []
+    connect_start: float = time.perf_counter()
+
+    for index in range(arguments.clients):
+        client: Client = connect_client(arguments.host, arguments.port, 'bench-%d' % index)
+        receivers[index % len(receivers)].add(client.client_socket)
+        clients.append(client)
+
+    connect_time: float = time.perf_counter() - connect_start
+    wait_until_idle(receivers, 0.5, 60)
+
+    for receiver in receivers:
+        receiver.reset()
+
+    senders: List[Client] = clients[:min(arguments.senders, len(clients))]
+    interval: float = 1 / (len(senders) * arguments.rate)
+    padding: str = 'x' * max(0, arguments.size - len(MARKER) - 21)
+
+    control.send('usage')
+    server_before: Dict[str, Any] = control.recv()
+    client_before: Dict[str, Any] = resource_usage()
+
+    sent: int = 0
+    start: float = time.perf_counter()
+    next_send: float = start
+    deadline: float = start + arguments.duration
+
+    # The last client pastes large messages alongside the regular load
+    pastes: List[int] = [0]
+    paster: Optional[threading.Thread] = None
+    if arguments.paste_size > 0:
+        paster = threading.Thread(target=lambda: pastes.__setitem__(0, paste_messages(
+            clients[-1], arguments.paste_size, arguments.paste_interval, deadline)), daemon=True)
+        paster.start()
+
+    while (now := time.perf_counter()) < deadline:
+        if now < next_send:
+            time.sleep(next_send - now)
+            continue
+
+        senders[sent % len(senders)].send_client_message('%s %d %s' % (MARKER, time.perf_counter_ns(), padding))
+        sent += 1
+        next_send += interval
+
+    send_time: float = time.perf_counter() - start
+    if paster is not None:
+        paster.join()
+    wait_until_idle(receivers, 0.5, arguments.drain)
+
+    control.send('usage')
+    server_after: Dict[str, Any] = control.recv()
+    client_after: Dict[str, Any] = resource_usage()
+
+    last_receive: float = max(receiver.last_receive for receiver in receivers)
+    elapsed: float = max(last_receive, start + send_time) - start
+    latencies: List[int] = sorted(latency for receiver in receivers for latency in receiver.latencies)
+    expected: int = sent * len(clients)
+
+    for receiver in receivers:
+        receiver.running = False
+    for client in clients:
+        client.close_socket()
+
+    control.send('stop')
+    server_process.join(5)
+
+    return {
+        'config': {
+            'engine': arguments.engine,
+            'clients': len(clients),
+            'senders': len(senders),
+            'rate_per_sender': arguments.rate,
+            'message_size': arguments.size,
+            'paste_size': arguments.paste_size,
+            'paste_interval': arguments.paste_interval,
+            'duration': arguments.duration,
+            'framing_version': BaseSocket.FRAMING_VERSION,
+            'outbound_queue_policy': BaseSocket.OUTBOUND_QUEUE_POLICY,
+            'flush_window_us': BaseSocket.FLUSH_WINDOW_US,
+        },
+        'environment': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'results': {
+            'connect_seconds': connect_time,
+            'sent': sent,
+            'pasted': pastes[0],
+            'delivered': len(latencies),
+            'expected': expected,
+            'delivery_ratio': len(latencies) / expected if expected else 0.0,
+            'send_rate': sent / send_time,
+            'delivery_rate': len(latencies) / elapsed if elapsed else 0.0,
+            'latency_ms': {
+                'p50': percentile(latencies, 0.50),
+                'p99': percentile(latencies, 0.99),
+                'p999': percentile(latencies, 0.999),
+                'max': latencies[-1] / 1e6 if latencies else 0.0,
+                'mean': sum(latencies) / len(latencies) / 1e6 if latencies else 0.0,
+            },
+            'server': {
+                'cpu_seconds': server_after['cpu_seconds'] - server_before['cpu_seconds'],
+                'cpu_percent': 100 * (server_after['cpu_seconds'] - server_before['cpu_seconds']) / elapsed,
+                'max_rss_kb': server_after.get('max_rss_kb'),
+                'rss_kb': server_after.get('rss_kb'),
+                'evictions': server_after['evictions'],
+                'dropped_frames': server_after['dropped_frames'],
+            },
+            'load_generator': {
+                'cpu_seconds': client_after['cpu_seconds'] - client_before['cpu_seconds'],
+                'cpu_percent': 100 * (client_after['cpu_seconds'] - client_before['cpu_seconds']) / elapsed,
+            },
+        },
+    }
+
+
+def print_summary(report: Dict[str, Any]) -> None:
+    '''
+    Print the main figures of a benchmark report
+    '''
+    config: Dict[str, Any] = report['config']
+    results: Dict[str, Any] = report['results']
+    latency: Dict[str, float] = results['latency_ms']
+    server: Dict[str, Any] = results['server']
+    max_rss: str = '%d KB max RSS' % server['max_rss_kb'] if server['max_rss_kb'] is not None else 'max RSS unknown'
+
+    print('%s engine, %d clients, %d senders at %g msg/s, %d byte messages, %gs' % (
+        config['engine'], config['clients'], config['senders'], config['rate_per_sender'], config['message_size'], config['duration']))
+    print('connected in     %8.2f s' % results['connect_seconds'])
+    print('sent             %8d (%.0f msg/s)' % (results['sent'], results['send_rate']))
+    if config['paste_size'] > 0:
+        print('pasted           %8d messages of %d characters' % (results['pasted'], config['paste_size']))
+    print('delivered        %8d of %d (%.1f%%, %.0f msg/s)' % (
+        results['delivered'], results['expected'], 100 * results['delivery_ratio'], results['delivery_rate']))
+    print('latency          p50 %.2f ms  p99 %.2f ms  p999 %.2f ms  max %.2f ms' % (
+        latency['p50'], latency['p99'], latency['p999'], latency['max']))
+    print('server           %.1f%% CPU  %s  %d evictions  %d dropped frames' % (
+        server['cpu_percent'], max_rss, server['evictions'], server['dropped_frames']))
+    print('load generator   %.1f%% CPU' % results['load_generator']['cpu_percent'])
+
+
+# --- Main function --- #
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test a local chat server')
+    parser.add_argument('--engine', choices=list(ENGINES), default='thread', help='Server engine to benchmark')
+    parser.add_argument('--host', default='127.0.0.1', help='Address the server listens on')
+    parser.add_argument('--port', type=int, default=9090, help='Port the server listens on')
+    parser.add_argument('--clients', type=int, default=1000, help='Number of simulated clients')
+    parser.add_argument('--senders', type=int, default=10, help='Number of clients sending messages')
+    parser.add_argument('--rate', type=float, default=10, help='Messages per second sent by each sender')
+    parser.add_argument('--size', type=int, default=120, help='Message size in characters')
+    parser.add_argument('--paste-size', type=int, default=0, help='Size in characters of large messages pasted by one client (0 disables them)')
+    parser.add_argument('--paste-interval', type=float, default=1, help='Seconds between two pasted messages')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds to send messages for')
+    parser.add_argument('--drain', type=float, default=30, help='Maximum seconds to wait for deliveries once sending stops')
+    parser.add_argument('--receiver-threads', type=int, default=4, help='Threads reading the clients')
+    parser.add_argument('--server-log', action='store_true', help='Keep the output of the server')
+    parser.add_argument('--output', default=None, help='File to write the JSON report to')
+    arguments: argparse.Namespace = parser.parse_args()
+
+    report: Dict[str, Any] = run_benchmark(arguments)
+    print_summary(report)
+
+    if arguments.output:
+        with open(arguments.output, 'w') as output:
+            json.dump(report, output, indent=2)
+
+        print('Report written to %s' % arguments.output)
@@ -3,25 +3,90 @@ run_server.py :
 Driver code that runs the server on a specific port
 '''
 # --- Modules --- #
-import sys
-from typing import List
+import argparse
+from typing import Any, Dict, List, Optional, Tuple, Type
 
+from terminal_chat_app.cluster import run_workers
+from terminal_chat_app.federation import FederationBus
+from terminal_chat_app.handoff import Handoff
 from terminal_chat_app.server import Server
+from terminal_chat_app.async_server import AsyncServer
+from terminal_chat_app.reactor_server import ReactorServer
+
+# --- Constants --- #
+ENGINES: Dict[str, Type[Server]] = {
+    'thread': Server,
+    'async': AsyncServer,
+    'reactor': ReactorServer,
+}
+
+# --- Functions --- #
+def parse_address(address: str) -> Tuple[str, int]:
+    '''
+    Split a HOST:PORT string into a socket address
+    '''
+    host, port = address.split(':')
+    return host, int(port)
+
 
 # --- Main Function --- #
 if __name__ == '__main__':
-    arguments: List = sys.argv
-    if len(arguments) > 1:
-        port: List[str] = arguments[1].split(':')
+    parser = argparse.ArgumentParser(description='Run the chat server')
+    parser.add_argument('address', nargs='?', default=None, help='HOST:PORT to listen on')
+    parser.add_argument('--engine', choices=list(ENGINES), default='thread', help='Server engine used to handle connections')
+    parser.add_argument('--workers', type=int, default=1, help='Number of worker processes sharing the port')
+    parser.add_argument('--peer-listen', default=None, help='HOST:PORT to accept links from peer servers on')
+    parser.add_argument('--peers', default='', help='Comma separated HOST:PORT peer addresses to link to')
+    parser.add_argument('--handoff', default=None, help='Unix socket path used to hand a running reactor server over to this process')
+    arguments: argparse.Namespace = parser.parse_args()
+
+    if arguments.address:
+        port: List[str] = arguments.address.split(':')
     else:
         port: List[str] = []
+
+    federated: bool = arguments.peer_listen is not None or any(arguments.peers.split(','))
+
+    if arguments.workers > 1 and federated:
+        parser.error('--workers cannot be combined with federation')
+
+    if arguments.handoff and (arguments.engine != 'reactor' or arguments.workers > 1 or federated):
+        parser.error('--handoff requires a single reactor engine without federation')
     
     try:
+        server_class: Type[Server] = ENGINES[arguments.engine]
+
         if len(port) == 2:
-            server = Server(port[0], int(port[1]))
+            host, port_number = port[0], int(port[1])
         else:
-            server = Server()
+            host, port_number = Server.HOST, Server.PORT
+
+        peers: List[Tuple[str, int]] = [parse_address(peer) for peer in arguments.peers.split(',') if peer]
+
+        if arguments.workers > 1:
+            run_workers(server_class, host, port_number, arguments.workers)
+        elif arguments.handoff:
+            # Take over from the running server, if any, before
+            # opening the history it releases
+            handoff: Handoff = Handoff(arguments.handoff)
+            state: Optional[Dict[str, Any]] = handoff.take_over()
+            server = server_class(host, port_number)
+
+            if state is not None:
+                server.adopt(state)
+                handoff.complete()
+
+            handoff.listen(server)
+            server.start_server()
+        else:
+            server = server_class(host, port_number)
+
+            if federated:
+                peer_listen = parse_address(arguments.peer_listen) if arguments.peer_listen else None
+                server.bus = FederationBus(server, peer_listen, peers)
+                server.bus.start()
 
-        server.start_server()
+            server.start_server()
     except Exception as e:
-        print('Usage: python run_server.py HOST:PORT')
\ No newline at end of file
+        print('Error: %s' % e)
+        print('Usage: python run_server.py [HOST:PORT] [--engine {%s}] [--workers N] [--peer-listen HOST:PORT] [--peers HOST:PORT,...] [--handoff PATH]' % ','.join(ENGINES))
@@ -1,6 +1,7 @@
 '''
 test_client.py :
-Runs a test client without the use of the curses module
+Runs a test client without the use of the curses module.
+For load testing use `python -m benchmarks.load_test`
 '''
 # --- Libraries --- #
 import sys
@@ -13,14 +14,19 @@ from terminal_chat_app.client import Client
 
 # --- Functions --- #
 def create_client():
-    client = Client('192.168.56.1', 8080)
+    if len(sys.argv) > 1:
+        host, port = sys.argv[1].split(':')
+        client = Client(host, int(port))
+    else:
+        client = Client(BaseSocket.HOST, BaseSocket.PORT)
+
     return client
 
 
 # --- Main function --- #
 if __name__ == '__main__':
     client = create_client()
-    client.send_client_message('John')
+    client.send_username('John')
 
     time.sleep(1)
     client.send_client_message('Hello World')
@@ -30,4 +36,4 @@ if __name__ == '__main__':
 
     input()
 
-    client.send_client_message('!quit')
+    client.disconnect()
@@ -0,0 +1,234 @@
+'''
+async_client.py :
+Contains the interface and implementation for the AsyncClient class
+'''
+# --- Libraries --- #
+import asyncio
+from typing import List, Optional, Tuple
+
+from .base_socket import BaseSocket
+from .envelope import Envelope, EnvelopeAssembler
+
+# --- AsyncClient Class --- #
+class AsyncClient(BaseSocket):
+    '''
+    AsyncClient class -
+    asyncio client for bots and integrations. Many clients can share one
+    event loop, and sends are pipelined: frames queued during the same
+    loop iteration are written to the transport with a single call, and
+    a sender only waits when the transport's buffer is full.
+    '''
+    def __init__(self, host: str=BaseSocket.HOST, port: int=BaseSocket.PORT) -> None:
+        '''
+        Initialization
+        '''
+        self.host_address: Tuple[str, int] = (host, port)
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.pending: List[bytes] = []
+        self.closed: bool = False
+        self.session_token: Optional[str] = None
+        self.next_seq: int = 0
+        self.assembler: EnvelopeAssembler = EnvelopeAssembler(self.MAX_MESSAGE_SIZE)
+
+
+    async def connect(self) -> None:
+        '''
+        Open the connection to the server
+        '''
+        self.reader, self.writer = await asyncio.open_connection(*self.host_address)
+        return
+
+
+    async def login(self, username: str) -> bool:
+        '''
+        Ask for a username. Returns False if it is already taken
+        '''
+        await self.send_typed(Envelope(Envelope.LOGIN, username))
+        return (await self.read_message()).kind == Envelope.LOGIN
+
+
+    async def resume(self) -> bool:
+        '''
+        Reconnect after losing the connection and resume the session.
+        The room messages missed in between are received next. Returns
+        False if there is no session to resume or it expired.
+        Raises OSError if the server cannot be reached
+        '''
+        if self.session_token is None:
+            return False
+
+        if self.writer is not None:
+            self.writer.close()
+
+        self.pending = []
+        self.assembler = EnvelopeAssembler(self.MAX_MESSAGE_SIZE)
+        await self.connect()
+        self.closed = False
+
+        await self.send_typed(Envelope(Envelope.RESUME, self.session_token, seq=self.next_seq))
+        return (await self.read_message()).kind == Envelope.LOGIN
+
+
+    async def send(self, message: str) -> None:
+        '''
+        Queue a chat message to the server
+        '''
+        await self.send_typed(Envelope(Envelope.CHAT, message))
+        return
+
+
+    async def join(self, room: str) -> None:
+        '''
+        Move to another room
+        '''
+        await self.send_typed(Envelope(Envelope.JOIN, room))
+        return
+
+
+    async def leave(self) -> None:
+        '''
+        Go back to the default room
+        '''
+        await self.send_typed(Envelope(Envelope.LEAVE))
+        return
+
+
+    async def send_direct(self, recipient: str, message: str) -> None:
+        '''
+        Queue a private message to a single user
+        '''
+        await self.send_typed(Envelope(Envelope.DIRECT, message, recipient))
+        return
+
+
+    async def request_history(self, before: Optional[int]=None) -> None:
+        '''
+        Ask for the page of the current room's history preceding the
+        message numbered `before`, or for the last page if it is None
+        '''
+        await self.send_typed(Envelope(Envelope.HISTORY, seq=before or 0))
+        return
+
+
+    async def send_typed(self, message: Envelope) -> None:
+        '''
+        Queue a typed message to the server, in chunks if it is large.
+        The frames are written with every other frame queued in the same
+        loop iteration, and the call only waits when the transport has too
+        much data buffered.
+        '''
+        if self.closed or self.writer is None or self.writer.is_closing():
+            raise ConnectionResetError('Connection closed')
+
+        if not self.pending:
+            asyncio.get_running_loop().call_soon(self.flush)
+
+        self.pending.extend(self.encode_chunks(message))
+        await self.writer.drain()
+        return
+
+
+    def flush(self) -> None:
+        '''
+        Write every queued frame to the transport at once
+        '''
+        frames: List[bytes] = self.pending
+        self.pending = []
+
+        if frames and not self.writer.is_closing():
+            self.writer.writelines(frames)
+
+        return
+
+
+    async def read_message(self) -> Envelope:
+        '''
+        Wait for the next message from the server.
+        Raises ConnectionResetError once the server closed the connection,
+        and ValueError if a frame is larger than the maximum message size
+        '''
+        try:
+            message_length: int = self.decode_header(await self.reader.readexactly(self.header_size))
+            if message_length > self.max_frame_size:
+                raise ValueError('Frame of %d bytes exceeds the maximum message size' % message_length)
+
+            message: Envelope = self.decode_envelope(await self.reader.readexactly(message_length))
+        except asyncio.IncompleteReadError:
+            raise ConnectionResetError('Connection closed by peer')
+
+        return message
+
+
+    def __aiter__(self) -> 'AsyncClient':
+        '''
+        Iterate over the incoming messages
+        '''
+        return self
+
+
+    async def __anext__(self) -> Envelope:
+        '''
+        Next incoming message, with the chunks of large messages reassembled.
+        Heartbeats of the server are answered and session tokens are kept,
+        both are skipped. Iteration stops when the server disconnects the
+        client or closes the connection
+        '''
+        message: Optional[Envelope] = None
+
+        while message is None:
+            if self.closed:
+                raise StopAsyncIteration
+
+            try:
+                message = self.assembler.add(await self.read_message())
+                if message is None:
+                    continue
+
+                if message.kind == Envelope.PING:
+                    await self.send_typed(Envelope(Envelope.PONG))
+                    message = None
+                elif message.kind == Envelope.SESSION:
+                    self.session_token = message.text
+                    message = None
+            except (ConnectionError, OSError, ValueError):
+                self.closed = True
+                raise StopAsyncIteration
+
+        # Room messages are numbered from 1, the other messages carry 0
+        if message.seq:
+            self.next_seq = max(self.next_seq, message.seq + 1)
+
+        if message.kind == Envelope.QUIT:
+            self.closed = True
+            raise StopAsyncIteration
+
+        return message
+
+
+    async def close(self) -> None:
+        '''
+        Tell the server the client is leaving and close the connection
+        '''
+        if self.writer is None:
+            return
+
+        self.session_token = None
+
+        if not self.closed and not self.writer.is_closing():
+            try:
+                await self.send_typed(Envelope(Envelope.QUIT))
+                self.flush()
+                await self.writer.drain()
+            except (ConnectionError, OSError):
+                pass
+
+        self.closed = True
+        self.writer.close()
+
+        try:
+            await self.writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+        return
@@ -0,0 +1,240 @@
+'''
+async_server.py :
+Contains the interface and implementation for the AsyncServer class
+'''
+# --- Libraries --- #
+import asyncio
+from typing import Any, Callable, Optional
+
+from .envelope import Envelope, EnvelopeAssembler
+from .outbound_queue import OutboundQueue
+from .server import Server
+
+# --- AsyncServer Class --- #
+class AsyncServer(Server):
+    '''
+    AsyncServer class -
+    Serves every client connection from a single asyncio event loop
+    instead of dispatching one thread per connection
+    '''
+    BLOCKING_QUEUES: bool = False
+
+    def __init__(self, host: str=Server.HOST, port: int=Server.PORT) -> None:
+        '''
+        Initialization
+        '''
+        super().__init__(host, port)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+    def start_server(self) -> None:
+        '''
+        Starting the server to listen to incoming connections on the host machine
+        '''
+        self.server_socket.bind(self.host_address)
+        self.server_socket.listen(self.BACKLOG)
+
+        self.logger.info('START', 'Server listening at %s:%d', *self.host_address)
+        self.start_stats_listener()
+        self.start_heartbeats()
+
+        try:
+            asyncio.run(self.accept_client_connection())
+        except KeyboardInterrupt:
+            self.server_up = False
+            self.logger.warning('WARNING', 'Server closed. KeyboardInterrupt exception detected')
+            self.server_socket.close()
+
+        return
+
+
+    async def accept_client_connection(self) -> None:
+        '''
+        Accepts incoming client connections and schedules a handler
+        coroutine on the event loop for each of those connections.
+        '''
+        self.loop = asyncio.get_running_loop()
+        server = await asyncio.start_server(self.handle_client, sock=self.server_socket)
+
+        async with server:
+            await server.serve_forever()
+
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        '''
+        Individual handler coroutine that assigns an alias
+        for a single connection and handles incoming messages
+        from the client.
+        '''
+        self.record_connection(writer, writer.get_extra_info('peername')[:2])
+
+        # Chunks of large messages wait in the outbound queue rather than in the transport
+        self.limit_unsent_data(writer.get_extra_info('socket'))
+        if self.CHUNK_SIZE > 0:
+            writer.transport.set_write_buffer_limits(high=self.CHUNK_SIZE)
+
+        wakeup: asyncio.Event = asyncio.Event()
+        self.outbound[writer] = OutboundQueue(self.OUTBOUND_QUEUE_SIZE, self.queue_policy, wakeup.set)
+        asyncio.create_task(self.handle_client_output(writer, wakeup))
+
+        try:
+            name: Optional[str] = await self.handle_username_assignment(reader, writer)
+        except (Exception, asyncio.CancelledError):
+            name = None
+
+        if name is None:
+            self.logger.info('INFO', '%s:%d disconnecting...', *self.registry.address(writer))
+            self.unregister_client(writer, None)
+            self.close_outbound_queue(writer)
+            return
+
+        self.register_client(writer, name)
+        assembler: EnvelopeAssembler = EnvelopeAssembler(self.MAX_MESSAGE_SIZE)
+        lost: bool = False
+
+        while self.server_up:
+            try:
+                msg: Optional[Envelope] = assembler.add(await self.read_message(reader))
+                self.touch(writer)
+            except (asyncio.IncompleteReadError, ConnectionError) as e:
+                self.logger.warning('WARNING', '%s encoutered by %s:%d - %s', type(e).__name__, *self.registry.address(writer), e)
+                msg = Envelope(Envelope.QUIT)
+                lost = True
+            except asyncio.CancelledError:
+                # The event loop is shutting down
+                msg = Envelope(Envelope.QUIT)
+            except ValueError as e:
+                self.logger.warning('WARNING', 'Malformed message from %s:%d - %s', *self.registry.address(writer), e)
+                msg = Envelope(Envelope.QUIT)
+            except Exception as e:
+                self.logger.error('ERROR', 'Unknown error occured: %s', e)
+                msg = Envelope(Envelope.QUIT)
+
+            # Chunk of a large message
+            if msg is None:
+                continue
+
+            if msg.kind == Envelope.QUIT:
+                self.logger.info('INFO', '%s:%d disconnecting...', *self.registry.address(writer))
+
+                self.unregister_client(writer, name, lost)
+                self.close_outbound_queue(writer)
+
+                break
+
+            # A message the server fails to handle only disconnects its sender
+            try:
+                self.process_message(writer, name, msg)
+            except Exception as e:
+                self.logger.error('ERROR', 'Unknown error occured while handling a message from %s:%d - %s', *self.registry.address(writer), e)
+                self.unregister_client(writer, name)
+                self.close_outbound_queue(writer)
+                break
+
+        return
+
+
+    async def handle_client_output(self, writer: asyncio.StreamWriter, wakeup: asyncio.Event) -> None:
+        '''
+        Individual writer coroutine that flushes the connection's
+        outbound queue and waits for the transport to drain.
+        Pending frames are coalesced into a single transport write.
+        Closes the connection once the queue is closed and drained.
+        '''
+        queue: OutboundQueue = self.outbound[writer]
+        window: float = self.FLUSH_WINDOW_US / 1e6
+
+        try:
+            while True:
+                frames = queue.pending()
+
+                if not frames:
+                    if queue.closed:
+                        break
+
+                    await wakeup.wait()
+                    wakeup.clear()
+
+                    if window > 0 and (self.FLUSH_WINDOW_BYTES <= 0 or queue.nbytes < self.FLUSH_WINDOW_BYTES):
+                        await asyncio.sleep(window)
+                    continue
+
+                sent: int = sum(len(frame) for frame in frames)
+                writer.writelines(frames)
+                queue.consume(sent)
+                self.metrics.increment('bytes_out', sent)
+                await writer.drain()
+        except (ConnectionError, OSError):
+            queue.close(discard=True)
+
+        writer.close()
+        return
+
+
+    async def handle_username_assignment(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> Optional[str]:
+        '''
+        Handle the assignment of a new user's username assignment.
+        Returns None if the client left during the handshake
+        '''
+        while True:
+            claimed: asyncio.Future = self.loop.create_future()
+            reply: Optional[Envelope] = self.answer_username(writer, await self.read_message(reader), claimed.set_result)
+            self.touch(writer)
+
+            # The other clients are served while the other workers or nodes answer the claim
+            if reply is None:
+                reply = await claimed
+
+            self.send_envelope(writer, reply)
+
+            if reply.kind == Envelope.QUIT:
+                return None
+            if reply.kind == Envelope.LOGIN:
+                return reply.text
+
+
+    def send_message(self, conn: asyncio.StreamWriter, message: str) -> None:
+        '''
+        Queue an encoded message on the connection's transport
+        '''
+        self.send_frame(conn, self.encode_message(message))
+        return
+
+
+    def run_threadsafe(self, callback: Callable[..., Any], *args: Any) -> None:
+        '''
+        Schedule a callback from another thread on the event loop.
+        Callbacks scheduled once the loop is closed are dropped
+        '''
+        if self.loop is None:
+            callback(*args)
+            return
+
+        try:
+            self.loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # The server stopped while the other workers or nodes were still sending events
+            pass
+
+        return
+
+
+    def abort_connection(self, conn: asyncio.StreamWriter) -> None:
+        '''
+        Close the connection's transport immediately, discarding buffered data
+        '''
+        conn.transport.abort()
+        return
+
+
+    async def read_message(self, reader: asyncio.StreamReader) -> Envelope:
+        '''
+        Decode incoming messages from the connection's stream.
+        Raises ValueError if a frame is larger than the maximum message size
+        '''
+        message_length: int = self.decode_header(await reader.readexactly(self.header_size))
+
+        if message_length > self.max_frame_size:
+            raise ValueError('Frame of %d bytes exceeds the maximum message size' % message_length)
+
+        return self.decode_envelope(await reader.readexactly(message_length))
@@ -5,9 +5,14 @@ Contains the interface and implementation for the Base class
 # --- Libraries --- #
 import os
 import socket
+import struct
+from typing import List, Sequence, Union
 
 from dotenv import load_dotenv
 
+from .envelope import Envelope
+from .outbound_queue import OutboundQueue
+
 # --- Class --- #
 load_dotenv()
 
@@ -17,35 +22,234 @@ class BaseSocket:
     Provide common socket operation
     '''
     HEADER: int = int(os.getenv('HEADER', 64))
+    FRAMING_VERSION: int = int(os.getenv('FRAMING_VERSION', 1))
+    BINARY_HEADER: struct.Struct = struct.Struct('!I')
     FORMAT: str = os.getenv('FORMAT', 'utf-8')
     HOST: str = os.getenv('HOST', socket.gethostbyname(socket.gethostname()))
     PORT: int = int(os.getenv('PORT', 8080))
+    BACKLOG: int = int(os.getenv('BACKLOG', 1024))
+    OUTBOUND_QUEUE_SIZE: int = int(os.getenv('OUTBOUND_QUEUE_SIZE', 1024))
+    OUTBOUND_QUEUE_POLICY: str = os.getenv('OUTBOUND_QUEUE_POLICY', 'disconnect')
+    LINK_QUEUE_SIZE: int = int(os.getenv('LINK_QUEUE_SIZE', 65536))
+    FLUSH_WINDOW_US: int = int(os.getenv('FLUSH_WINDOW_US', 0))
+    FLUSH_WINDOW_BYTES: int = int(os.getenv('FLUSH_WINDOW_BYTES', 0))
+    IOV_MAX: int = 1024
+    RECV_BUFFER_SIZE: int = int(os.getenv('RECV_BUFFER_SIZE', 65536))
+    CHUNK_SIZE: int = int(os.getenv('CHUNK_SIZE', 16384))
+    MAX_MESSAGE_SIZE: int = int(os.getenv('MAX_MESSAGE_SIZE', 1024 * 1024))
+    HISTORY_SIZE: int = int(os.getenv('HISTORY_SIZE', 50))
+    HISTORY_PAGE_SIZE: int = int(os.getenv('HISTORY_PAGE_SIZE', 20))
+    HISTORY_DIR: str = os.getenv('HISTORY_DIR', '')
+    HISTORY_SEGMENT_SIZE: int = int(os.getenv('HISTORY_SEGMENT_SIZE', 16 * 1024 * 1024))
+    SCROLLBACK_SIZE: int = int(os.getenv('SCROLLBACK_SIZE', 1000))
+    LOG_LEVEL: str = os.getenv('LOG_LEVEL', 'INFO')
+    STATS_HOST: str = os.getenv('STATS_HOST', '127.0.0.1')
+    STATS_PORT: int = int(os.getenv('STATS_PORT', 0))
+    HEARTBEAT_INTERVAL: float = float(os.getenv('HEARTBEAT_INTERVAL', 30))
+    IDLE_TIMEOUT: float = float(os.getenv('IDLE_TIMEOUT', 90))
+    RATE_LIMIT: float = float(os.getenv('RATE_LIMIT', 10))
+    RATE_BURST: float = float(os.getenv('RATE_BURST', 20))
+    GLOBAL_RATE_LIMIT: float = float(os.getenv('GLOBAL_RATE_LIMIT', 0))
+    GLOBAL_RATE_BURST: float = float(os.getenv('GLOBAL_RATE_BURST', 0))
+    THROTTLE_DISCONNECT: int = int(os.getenv('THROTTLE_DISCONNECT', 100))
+    SESSION_TIMEOUT: float = float(os.getenv('SESSION_TIMEOUT', 120))
+    RESUME_LIMIT: int = int(os.getenv('RESUME_LIMIT', 200))
+    RECONNECT_ATTEMPTS: int = int(os.getenv('RECONNECT_ATTEMPTS', 5))
+    RECONNECT_DELAY: float = float(os.getenv('RECONNECT_DELAY', 0.25))
     
     CLIENT_DISCONNECT_MESSAGE: str = os.getenv('CLIENT_DISCONNECT_MESSAGE', '!quit')
-    USERNAME_EXISTS_MESSAGE: str = os.getenv('USERNAME_EXISTS_MESSAGE', 'Username exists')
-    PROCEED_MESSAGE: str = os.getenv('PROCEED_MESSAGE', 'Proceed')
-    EMPTY_MESSAGE: str = os.getenv('EMPTY_MESSAGE', 'Empty')
-    ERROR_MESSAGE: str = os.getenv('ERROR_MESSAGE', 'Error encountered')
+
+    DEFAULT_ROOM: str = os.getenv('DEFAULT_ROOM', 'lobby')
+    JOIN_COMMAND: str = '/join'
+    LEAVE_COMMAND: str = '/leave'
+    HISTORY_COMMAND: str = '/history'
+    MSG_COMMAND: str = '/msg'
+
+    @property
+    def header_size(self) -> int:
+        '''
+        Number of bytes taken by the length header of a message
+        '''
+        if self.FRAMING_VERSION == 2:
+            return self.BINARY_HEADER.size
+
+        return self.HEADER
+
+
+    @property
+    def max_frame_size(self) -> int:
+        '''
+        Largest typed message frame accepted: an envelope with the longest
+        sender and a text of MAX_MESSAGE_SIZE characters of 4 bytes each
+        '''
+        return Envelope.HEADER.size + 0xFFFF + 4 * self.MAX_MESSAGE_SIZE
+
+
+    def encode_header(self, message_length: int) -> bytes:
+        '''
+        Build the length header for a payload of `message_length` bytes.
+        Version 1 uses a space-padded ASCII header of `HEADER` bytes,
+        version 2 uses a 4-byte big-endian unsigned integer
+        '''
+        if self.FRAMING_VERSION == 2:
+            return self.BINARY_HEADER.pack(message_length)
+
+        header: bytes = str(message_length).encode(self.FORMAT)
+        return header + b' ' * (self.HEADER - len(header))
+
+
+    def decode_header(self, header: bytes) -> int:
+        '''
+        Extract the payload length from a length header
+        '''
+        if self.FRAMING_VERSION == 2:
+            return self.BINARY_HEADER.unpack(header)[0]
+
+        return int(str(header, self.FORMAT))
+
+
+    def encode_message(self, message: str) -> bytes:
+        '''
+        Encode a message into a single frame of header and payload
+        '''
+        payload: bytes = message.encode(self.FORMAT)
+        return self.encode_header(len(payload)) + payload
+
+
+    def encode_envelope(self, message: Envelope) -> bytes:
+        '''
+        Encode a typed message into a single frame of header and payload
+        '''
+        payload: bytes = message.encode(self.FORMAT)
+        return self.encode_header(len(payload)) + payload
+
+
+    def encode_chunks(self, message: Envelope) -> List[bytes]:
+        '''
+        Encode a typed message into a single frame, or into a frame per
+        chunk if its text takes more than CHUNK_SIZE bytes
+        '''
+        return [self.encode_envelope(part) for part in message.split(self.CHUNK_SIZE, self.FORMAT)]
+
+
+    def decode_envelope(self, payload: Union[bytes, memoryview]) -> Envelope:
+        '''
+        Decode the payload of a frame into a typed message
+        '''
+        return Envelope.decode(payload, self.FORMAT)
+
+
+    def send_envelope(self, conn: socket.socket, message: Envelope) -> None:
+        '''
+        Send a typed message throught the socket, in chunks if it is large
+        '''
+        self.send_encoded(conn, self.encode_chunks(message))
+        return
+
+
+    def send_encoded(self, conn: socket.socket, frames: Sequence[Union[bytes, memoryview]]) -> None:
+        '''
+        Send the frames of an encoded typed message: a single
+        frame, or the chunk frames of a large message
+        '''
+        if len(frames) == 1:
+            self.send_frame(conn, frames[0])
+        else:
+            self.send_chunks(conn, frames)
+
+        return
+
+
+    def send_chunks(self, conn: socket.socket, frames: Sequence[Union[bytes, memoryview]]) -> None:
+        '''
+        Send the chunk frames of a large message, one after the other
+        '''
+        for frame in frames:
+            self.send_frame(conn, frame)
+
+        return
+
 
     def send_message(self, conn: socket.socket, message: str) -> None:
         '''
         Send encoded messages throught the socket
         '''
-        message_length: bytes = str(len(message)).encode(self.FORMAT)
-        message_length += b' ' * (self.HEADER - len(message_length))
+        self.send_frame(conn, self.encode_message(message))
+        return
 
-        conn.send(message_length)
-        conn.send(message.encode(self.FORMAT))
+
+    def send_frame(self, conn: socket.socket, frame: Union[bytes, memoryview]) -> None:
+        '''
+        Send an already encoded frame throught the socket
+        '''
+        conn.sendall(frame)
+        return
+
+
+    def send_frames(self, conn: socket.socket, frames: List[Union[bytes, memoryview]]) -> int:
+        '''
+        Write several frames with a single scatter-gather call and
+        return the number of bytes the socket accepted
+        '''
+        frames = frames[:self.IOV_MAX]
+
+        if hasattr(conn, 'sendmsg'):
+            return conn.sendmsg(frames)
+
+        return conn.send(b''.join(frames))
+
+
+    def write_queued_frames(self, conn: socket.socket, queue: OutboundQueue) -> None:
+        '''
+        Write the frames of an outbound queue to a blocking socket, pending
+        frames coalesced into a single write, until the queue is closed and
+        drained. The queue is discarded if the socket fails
+        '''
+        try:
+            while (frames := queue.wait_for_frames()):
+                queue.consume(self.send_frames(conn, frames))
+        except OSError:
+            queue.close(discard=True)
 
         return
     
 
+    def receive_exactly(self, conn: socket.socket, length: int) -> bytes:
+        '''
+        Read exactly `length` bytes from the socket
+        '''
+        data: bytearray = bytearray(length)
+        view: memoryview = memoryview(data)
+        received: int = 0
+
+        while received < length:
+            count: int = conn.recv_into(view[received:])
+            if count == 0:
+                raise ConnectionResetError('Connection closed by peer')
+
+            received += count
+
+        return bytes(data)
+
+
     def receive_message(self, conn: socket.socket) -> str:
         '''
         Decode incoming messages
         '''
-        message_length: str = conn.recv(self.HEADER).decode(self.FORMAT)
-        message_length: int = int(message_length)
+        message_length: int = self.decode_header(self.receive_exactly(conn, self.header_size))
 
-        message: str = conn.recv(message_length).decode(self.FORMAT)
+        message: str = self.receive_exactly(conn, message_length).decode(self.FORMAT)
         return message
+
+
+    def receive_envelope(self, conn: socket.socket) -> Envelope:
+        '''
+        Receive and decode a typed message.
+        Raises ValueError if the frame is larger than the maximum message size
+        '''
+        message_length: int = self.decode_header(self.receive_exactly(conn, self.header_size))
+
+        if message_length > self.max_frame_size:
+            raise ValueError('Frame of %d bytes exceeds the maximum message size' % message_length)
+
+        return self.decode_envelope(self.receive_exactly(conn, message_length))
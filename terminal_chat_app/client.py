@@ -3,11 +3,15 @@ client.py :
 Contains the interface and implementation for the Client class
 '''
 # --- Libraries --- #
+import time
+import random
 import socket
 import threading
-from typing import Callable
+from typing import Callable, List, Optional, Tuple, Union
 
 from .base_socket import BaseSocket
+from .envelope import Envelope
+from .receive_buffer import ReceiveBuffer
 
 # --- Client Class --- #
 class Client(BaseSocket):
@@ -20,26 +24,110 @@ class Client(BaseSocket):
         '''
         Initialization
         '''
+        self.host_address: Tuple[str, int] = (host, port)
         self.client_socket: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.client_socket.connect((host, port))
+        self.client_socket.connect(self.host_address)
+        self.receive_buffer: Optional[ReceiveBuffer] = None
+        self.session_token: Optional[str] = None
+        self.next_seq: int = 0
 
 
-    def handle_incoming_message(self, callback: Callable[[str], None]) -> None:
+    def handle_incoming_message(self, callback: Callable[[Envelope], None]) -> None:
         '''
         Listen for incoming packets from the server and call the callback function with the message
         '''
+        buffer: ReceiveBuffer = ReceiveBuffer(self)
+
         while True:
             try:
-                message = self.receive_message(self.client_socket)
-                if message == self.CLIENT_DISCONNECT_MESSAGE:
-                    self.client_socket.close()
+                for message in self.track_session(self.answer_pings(buffer.receive_envelopes(self.client_socket))):
+                    if message.kind == Envelope.QUIT:
+                        self.client_socket.close()
 
-                callback(message)
+                    callback(message)
             except Exception:
                 return
 
 
-    def start_listening(self, callback: Callable[[str], None]) -> None:
+    def read_messages(self) -> List[Envelope]:
+        '''
+        Read the data currently available on the socket and return every
+        complete message, for callers that wait for the socket themselves.
+        Raises ConnectionResetError once the server closed the connection
+        '''
+        if self.receive_buffer is None:
+            self.receive_buffer = ReceiveBuffer(self)
+
+        self.receive_buffer.fill(self.client_socket)
+        return self.track_session(self.answer_pings(self.receive_buffer.envelopes()))
+
+
+    def answer_pings(self, messages: List[Envelope]) -> List[Envelope]:
+        '''
+        Answer the heartbeats of the server and return the other messages
+        '''
+        if not any(message.kind == Envelope.PING for message in messages):
+            return messages
+
+        self.send_client_envelope(Envelope(Envelope.PONG))
+        return [message for message in messages if message.kind != Envelope.PING]
+
+
+    def track_session(self, messages: List[Envelope]) -> List[Envelope]:
+        '''
+        Keep the session token and the sequence number following the
+        last room message received, and return the other messages
+        '''
+        for message in messages:
+            if message.kind == Envelope.SESSION:
+                self.session_token = message.text
+            # Room messages are numbered from 1, the other messages carry 0
+            elif message.seq:
+                self.next_seq = max(self.next_seq, message.seq + 1)
+
+        return [message for message in messages if message.kind != Envelope.SESSION]
+
+
+    def resume_session(self) -> bool:
+        '''
+        Reconnect after losing the connection and resume the session, so
+        the server only sends the room messages missed in between. Attempts
+        are spaced by a randomized exponential backoff, so clients cut off
+        together do not reconnect all at once. Returns False, and gives the
+        session up, if the server cannot be reached or the session expired
+        '''
+        if self.session_token is None:
+            return False
+
+        for attempt in range(self.RECONNECT_ATTEMPTS):
+            time.sleep(self.RECONNECT_DELAY * 2 ** attempt * random.uniform(0.5, 1.5))
+
+            try:
+                conn: socket.socket = socket.create_connection(self.host_address)
+            except OSError:
+                continue
+
+            try:
+                self.send_envelope(conn, Envelope(Envelope.RESUME, self.session_token, seq=self.next_seq))
+                response: Envelope = self.receive_envelope(conn)
+            except (OSError, ValueError):
+                conn.close()
+                continue
+
+            if response.kind != Envelope.LOGIN:
+                conn.close()
+                break
+
+            self.client_socket.close()
+            self.client_socket = conn
+            self.receive_buffer = None
+            return True
+
+        self.session_token = None
+        return False
+
+
+    def start_listening(self, callback: Callable[[Envelope], None]) -> None:
         '''
         Start the process of listening for incoming messages and 
         process them with the callback function
@@ -47,34 +135,126 @@ class Client(BaseSocket):
         threading.Thread(target=self.handle_incoming_message, args=(callback,)).start()
 
 
-    def send_username(self, username: str) -> str:
+    def send_username(self, username: str) -> Union[Envelope, None]:
         '''
-        Method for sending a username to be set for the client
+        Method for sending a username to be set for the client.
+        Returns the server's reply, which is a login message with the
+        username once accepted, or None if the server could not be reached
         '''
         try:
-            self.send_message(self.client_socket, username)
-            response = self.receive_message(self.client_socket)
+            self.send_envelope(self.client_socket, Envelope(Envelope.LOGIN, username))
+            response: Envelope = self.receive_envelope(self.client_socket)
 
             return response
         except Exception:
-            return self.ERROR_MESSAGE
+            return None
 
 
-    def send_client_message(self, message: str) -> str:
+    def send_client_envelope(self, message: Envelope) -> bool:
         '''
-        Send messages to the server
+        Send a typed message to the server. If the connection is lost,
+        the session is resumed and the message sent again.
+        Returns False, and closes the socket, if it cannot be resumed
         '''
         try:
-            self.send_message(self.client_socket, message)
-            
-            if any(message == x for x in [BaseSocket.CLIENT_DISCONNECT_MESSAGE]):
-                self.close_socket()
-                return message
-
-            return message
-        except:
+            self.send_envelope(self.client_socket, message)
+            return True
+        except OSError:
+            pass
+
+        if message.kind != Envelope.QUIT and self.resume_session():
+            return self.send_client_envelope(message)
+
+        self.close_socket()
+        return False
+
+
+    def send_client_message(self, message: str) -> bool:
+        '''
+        Send messages to the server.
+        Returns False, and closes the socket, if the connection is lost
+        '''
+        return self.send_client_envelope(Envelope(Envelope.CHAT, message))
+
+
+    def send_input(self, text: str) -> bool:
+        '''
+        Send a line typed by the user, as a command or a chat message.
+        Returns False, and closes the socket, if the connection is lost
+        '''
+        return self.send_client_envelope(self.parse_input(text))
+
+
+    def parse_input(self, text: str) -> Envelope:
+        '''
+        Build the typed message for a line typed by the user: `/join ROOM`,
+        `/leave`, `/msg USER MESSAGE` and `/history [SEQ]` become their
+        own message types, anything else is a chat message
+        '''
+        command, _, argument = text.partition(' ')
+
+        if command == self.JOIN_COMMAND and argument.strip():
+            return Envelope(Envelope.JOIN, argument.strip())
+
+        if command == self.LEAVE_COMMAND:
+            return Envelope(Envelope.LEAVE)
+
+        if command == self.MSG_COMMAND:
+            recipient, _, message = argument.strip().partition(' ')
+            return Envelope(Envelope.DIRECT, message, recipient)
+
+        if command == self.HISTORY_COMMAND:
+            # isdigit() also accepts characters like '²', which int() rejects
+            try:
+                before: int = max(int(argument), 0)
+            except ValueError:
+                before = 0
+
+            return Envelope(Envelope.HISTORY, seq=before)
+
+        return Envelope(Envelope.CHAT, text)
+
+
+    def join_room(self, room: str) -> bool:
+        '''
+        Move to another room
+        '''
+        return self.send_client_envelope(Envelope(Envelope.JOIN, room))
+
+
+    def leave_room(self) -> bool:
+        '''
+        Go back to the default room
+        '''
+        return self.send_client_envelope(Envelope(Envelope.LEAVE))
+
+
+    def send_direct(self, recipient: str, message: str) -> bool:
+        '''
+        Send a private message to a single user
+        '''
+        return self.send_client_envelope(Envelope(Envelope.DIRECT, message, recipient))
+
+
+    def disconnect(self) -> None:
+        '''
+        Tell the server the client is leaving and close the socket
+        '''
+        self.session_token = None
+
+        if self.send_client_envelope(Envelope(Envelope.QUIT)):
             self.close_socket()
-            return self.CLIENT_DISCONNECT_MESSAGE
+
+        return
+
+
+    def request_history(self, before: Union[int, None]) -> bool:
+        '''
+        Ask the server for the page of the current room's history
+        preceding the message with the sequence number `before`,
+        or for the last page if it is None
+        '''
+        return self.send_client_envelope(Envelope(Envelope.HISTORY, seq=before or 0))
 
 
     def close_socket(self) -> None:
@@ -5,14 +5,20 @@ Provides the interface to accomodate the Client class
 # --- Libraries --- #
 import sys
 import curses
+import socket
+import selectors
 from traceback import print_exc
-from typing import Callable, Dict, List, Union
+from typing import Callable, Dict, List, Optional, Union
 from curses import ascii
 from curses.textpad import Textbox
 
 from .client import Client
+from .envelope import Envelope
+from .history import MessageHistory
 from .key_maps import initialize_keymap
-from .utils import render_text, init_header_color_map, \
+from .renderer import ChatRenderer
+from .scrollback import Scrollback
+from .utils import format_line, format_message, interface_line, \
     receive_broadcast
 
 
@@ -99,8 +105,7 @@ def ask_username(stdscr: curses.window, client: Client) -> Union[str, int]:
         Textbox callback function for handling window closing through the ESC key
         '''
         if x == ascii.ESC:
-            client.send_username(client.CLIENT_DISCONNECT_MESSAGE)
-            client.close_socket()
+            client.disconnect()
             print('Process exited with return value 0')
             sys.exit(0)
 
@@ -118,22 +123,15 @@ def ask_username(stdscr: curses.window, client: Client) -> Union[str, int]:
         tb.edit(tb_function)
         result: str = tb.gather().strip()
 
-        try:
-            if len(result) < 1:
-                response = client.EMPTY_MESSAGE
-            else:
-                response = client.send_username(result)
-        except:
-            client.close_socket()
-            return -1
-        
-        if response == client.USERNAME_EXISTS_MESSAGE:
-            warning_message = 'The username entered has already been taken. Please use another username\n'
-        elif response == client.EMPTY_MESSAGE:
+        response: Optional[Envelope] = client.send_username(result) if result else None
+
+        if not result:
             warning_message = 'Please enter a non-empty username.\n'
-        elif response == client.ERROR_MESSAGE:
+        elif response is None:
             warning_message = 'An unknown error has occured.\n'
-        elif response == client.CLIENT_DISCONNECT_MESSAGE:
+        elif response.kind == Envelope.USERNAME_TAKEN:
+            warning_message = 'The username entered has already been taken. Please use another username\n'
+        elif response.kind == Envelope.QUIT:
             client.close_socket()
             print('Process exited with return value 0')
             sys.exit(0)
@@ -160,53 +158,114 @@ def chat_room(stdscr: curses.window, client: Client, username: str) -> int:
     Displays the chat room interface for the user
     '''
     PAD_MAXLINE: int = 20
+    # Windows cannot wait on the console with select, keys are polled there instead
+    KEY_POLL_INTERVAL: Union[float, None] = 0.05 if sys.platform == 'win32' else None
 
     key: Union[None, str] = None
     current_text: List[str] = []
-    textpad_chats: List[str] = ['<Interface>: You joined the room\n']
+    renderer: ChatRenderer = ChatRenderer(stdscr, PAD_MAXLINE)
+    textpad_chats: Scrollback = Scrollback(client.SCROLLBACK_SIZE)
+    textpad_chats.extend(interface_line('You joined the room', renderer.width))
     current_pad_scroll: int = 0
-    header_color_map = init_header_color_map(username)
+    current_room: List[str] = [client.DEFAULT_ROOM]
+    oldest_seq: List[Optional[int]] = [None]
+    requested_seq: List[Optional[int]] = [None]
     keymap: Dict[str, Callable[[], None]] = initialize_keymap(
         current_text,
         client
     )
 
+    def handle_message(message: Envelope) -> None:
+        '''
+        Track room changes, place messages replayed from the history by
+        their sequence number and append every other message to the chat
+        '''
+        if message.kind == Envelope.ROOM:
+            # The chat shows the history of the room that was joined
+            current_room[0] = message.text
+            oldest_seq[0] = requested_seq[0] = None
+            textpad_chats.clear()
+            textpad_chats.extend(interface_line('You joined #%s' % message.text, renderer.width))
+            return
+
+        if not message.replayed:
+            receive_broadcast(message, textpad_chats, username, renderer.width)
+            return
+
+        # Replayed messages arrive oldest first and are appended,
+        # older pages arrive newest first and are prepended
+        if oldest_seq[0] is not None and message.seq < oldest_seq[0]:
+            textpad_chats.prepend(format_line(*format_message(message, username), renderer.width))
+        else:
+            receive_broadcast(message, textpad_chats, username, renderer.width)
+
+        if oldest_seq[0] is None or message.seq < oldest_seq[0]:
+            oldest_seq[0] = message.seq
+
+    # Wait on both the keyboard and the server socket, so the loop
+    # only wakes up for a keypress or an incoming message
+    selector: selectors.BaseSelector = selectors.DefaultSelector()
+    selector.register(client.client_socket, selectors.EVENT_READ)
+    watched_socket: socket.socket = client.client_socket
+    if KEY_POLL_INTERVAL is None:
+        selector.register(sys.stdin, selectors.EVENT_READ)
+
     stdscr.nodelay(True)
-    client.start_listening(lambda x: receive_broadcast(x, textpad_chats))
 
     while key != ascii.ESC:
-        
-        render_text(
-            stdscr,
-            textpad_chats, 
-            current_pad_scroll,
-            current_pad_scroll + min(PAD_MAXLINE, len(textpad_chats)),
-            PAD_MAXLINE,
-            current_text,
-            header_color_map
-        )
+        # The client is on a new socket after resuming its session
+        if client.client_socket is not watched_socket:
+            selector.unregister(watched_socket)
+            selector.register(client.client_socket, selectors.EVENT_READ)
+            watched_socket = client.client_socket
+            textpad_chats.extend(interface_line('Reconnected to the server', renderer.width))
 
-        try:
-            key = stdscr.getkey()
-        except Exception: 
-            key = None
-        
-        try:
-            if key is None:
+        current_pad_scroll = min(current_pad_scroll, max(0, len(textpad_chats) - PAD_MAXLINE))
+
+        renderer.render(textpad_chats, current_pad_scroll, current_room[0], current_text)
+
+        for event, _ in selector.select(KEY_POLL_INTERVAL):
+            if event.fileobj is not client.client_socket:
                 continue
-            if key == 'KEY_UP':
-                if current_pad_scroll > 0:
-                    current_pad_scroll -= 1
-            elif key == 'KEY_DOWN':
-                if current_pad_scroll + PAD_MAXLINE < len(textpad_chats):
-                    current_pad_scroll += 1
-            else:
-                keymap[key]()
-                if key == '\n' and len(textpad_chats) > PAD_MAXLINE:
-                    current_pad_scroll = len(textpad_chats) - PAD_MAXLINE
-        except Exception:
-            print_exc(1000)
-            client.send_client_message(client.CLIENT_DISCONNECT_MESSAGE)
+
+            try:
+                messages: List[Envelope] = client.read_messages()
+            except (OSError, ValueError):
+                messages = []
+                if not client.resume_session():
+                    selector.unregister(client.client_socket)
+                    textpad_chats.extend(interface_line('Lost the connection to the server', renderer.width))
+
+            for message in messages:
+                handle_message(message)
+
+        # Handle every key typed since the last wakeup
+        while True:
+            try:
+                key = stdscr.getkey()
+            except Exception:
+                key = None
+                break
+
+            try:
+                if key == 'KEY_UP':
+                    if current_pad_scroll > 0:
+                        current_pad_scroll -= 1
+                    elif (oldest_seq[0] is None or oldest_seq[0] > MessageHistory.FIRST_SEQ) and requested_seq[0] != oldest_seq[0]:
+                        # Page back through the room's history once the top is reached,
+                        # until its first message is shown
+                        requested_seq[0] = oldest_seq[0]
+                        client.request_history(oldest_seq[0])
+                elif key == 'KEY_DOWN':
+                    if current_pad_scroll + PAD_MAXLINE < len(textpad_chats):
+                        current_pad_scroll += 1
+                else:
+                    keymap[key]()
+                    if key == '\n' and len(textpad_chats) > PAD_MAXLINE:
+                        current_pad_scroll = len(textpad_chats) - PAD_MAXLINE
+            except Exception:
+                print_exc(1000)
+                client.disconnect()
 
     return 0
 
@@ -227,7 +286,7 @@ def init_main_screen(stdscr: curses.window) -> int:
         return exit_status
     except Exception:
         print_exc()
-        connected_client.send_client_message(connected_client.CLIENT_DISCONNECT_MESSAGE)
+        connected_client.disconnect()
         return -1
 
 def run_main() -> None:
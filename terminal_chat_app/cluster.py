@@ -0,0 +1,536 @@
+'''
+cluster.py :
+Contains the interface and implementation for running the server
+as several worker processes sharing one port
+'''
+# --- Libraries --- #
+import os
+import json
+import signal
+import socket
+import functools
+import itertools
+import selectors
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, Union
+
+from .base_socket import BaseSocket
+from .envelope import Envelope
+from .logger import AsyncLogger
+from .outbound_queue import OutboundQueue
+from .receive_buffer import ReceiveBuffer
+from .server import Server
+
+# --- ClusterHub Class --- #
+class ClusterHub(BaseSocket):
+    '''
+    ClusterHub class -
+    Runs in the parent process, relays broadcasts between the workers
+    and owns the cluster-wide set of usernames. Sessions stay in the
+    worker that issued them, the hub knows which one, so a client that
+    reconnects to another worker gets its session handed over.
+    Events are queued and written by a thread per worker, so a slow
+    worker never stalls the others
+    '''
+    def __init__(self, workers: List[socket.socket], logger: AsyncLogger) -> None:
+        '''
+        Initialization
+        '''
+        self.logger: AsyncLogger = logger
+        self.selector: selectors.BaseSelector = selectors.DefaultSelector()
+        self.buffers: Dict[socket.socket, ReceiveBuffer] = {}
+        self.outbound: Dict[socket.socket, OutboundQueue] = {}
+        self.usernames: Dict[str, socket.socket] = {}
+        # Worker and username of every session token, and the token of every username
+        self.sessions: Dict[str, Tuple[socket.socket, str]] = {}
+        self.session_tokens: Dict[str, str] = {}
+        # Worker asking for a session being handed over, the ID of its request and the worker keeping the session
+        self.handovers: Dict[int, Tuple[socket.socket, int, socket.socket]] = {}
+        self.handover_ids = itertools.count()
+
+        for worker in workers:
+            self.buffers[worker] = ReceiveBuffer(self)
+            self.outbound[worker] = OutboundQueue(self.LINK_QUEUE_SIZE, OutboundQueue.DISCONNECT)
+            self.selector.register(worker, selectors.EVENT_READ)
+            threading.Thread(target=self.write_queued_frames, args=(worker, self.outbound[worker]), daemon=True).start()
+
+
+    def serve(self) -> None:
+        '''
+        Relay events between the workers until every worker has exited
+        '''
+        while self.buffers:
+            for key, _ in self.selector.select():
+                self.handle_worker(key.fileobj)
+
+        self.selector.close()
+        return
+
+
+    def handle_worker(self, worker: socket.socket) -> None:
+        '''
+        Process every event a worker sent
+        '''
+        buffer: ReceiveBuffer = self.buffers[worker]
+
+        try:
+            buffer.fill(worker)
+        except OSError:
+            self.remove_worker(worker)
+            return
+
+        for raw in buffer.messages():
+            event: Dict[str, Any] = json.loads(raw)
+
+            if event['type'] == 'publish':
+                frame: memoryview = memoryview(self.encode_message(raw))
+                for other in list(self.buffers):
+                    if other is not worker:
+                        self.send_frame(other, frame)
+
+            elif event['type'] == 'claim':
+                granted: bool = event['name'] not in self.usernames
+                if granted:
+                    self.usernames[event['name']] = worker
+
+                self.send_message(worker, json.dumps({'type': 'claimed', 'id': event['id'], 'granted': granted}))
+
+            elif event['type'] == 'release':
+                if self.usernames.get(event['name']) is worker:
+                    del self.usernames[event['name']]
+                    self.forget_session(event['name'])
+
+            elif event['type'] == 'session':
+                self.forget_session(event['name'])
+                self.sessions[event['token']] = (worker, event['name'])
+                self.session_tokens[event['name']] = event['token']
+
+            elif event['type'] == 'resume':
+                self.request_handover(worker, event['id'], event['token'])
+
+            elif event['type'] == 'handed_over':
+                self.complete_handover(worker, event['id'], event['name'], event['room'])
+
+            elif event['type'] == 'direct':
+                # Route private messages to the worker holding the recipient
+                owner: Optional[socket.socket] = self.usernames.get(event['to'])
+
+                if owner is not None and owner is not worker:
+                    self.send_message(owner, raw)
+                else:
+                    self.send_message(worker, json.dumps({**event, 'type': 'receipt', 'delivered': False}))
+
+            elif event['type'] == 'receipt':
+                owner: Optional[socket.socket] = self.usernames.get(event['from'])
+
+                if owner is not None:
+                    self.send_message(owner, raw)
+
+        return
+
+
+    def send_frame(self, conn: socket.socket, frame: Union[bytes, memoryview]) -> None:
+        '''
+        Queue an encoded event for a worker's writer, without waiting.
+        A worker whose queue is full is shut down, and removed once the
+        hub notices its connection closed
+        '''
+        queue: Optional[OutboundQueue] = self.outbound.get(conn)
+
+        if queue is None or queue.put(frame):
+            return
+
+        self.logger.warning('WARNING', 'Dropping a worker too slow to keep up with the cluster')
+        queue.close(discard=True)
+
+        try:
+            conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+        return
+
+
+    def forget_session(self, name: str) -> None:
+        '''
+        Forget the session token of a username, if it has one
+        '''
+        token: Optional[str] = self.session_tokens.pop(name, None)
+
+        if token is not None:
+            del self.sessions[token]
+
+        return
+
+
+    def request_handover(self, worker: socket.socket, request_id: int, token: str) -> None:
+        '''
+        Ask the worker keeping a session to hand it over to the worker
+        the client reconnected to. The session is expired if no other
+        worker keeps it
+        '''
+        session: Optional[Tuple[socket.socket, str]] = self.sessions.get(token)
+
+        if session is None or session[0] is worker:
+            self.send_message(worker, json.dumps({'type': 'resumed', 'id': request_id, 'name': None, 'room': None}))
+            return
+
+        handover_id: int = next(self.handover_ids)
+        self.handovers[handover_id] = (worker, request_id, session[0])
+        self.send_message(session[0], json.dumps({'type': 'handover', 'id': handover_id, 'token': token}))
+        return
+
+
+    def complete_handover(self, owner: socket.socket, handover_id: int, name: Optional[str], room: Optional[str]) -> None:
+        '''
+        Move a handed over session and its username to the worker that
+        asked for it, and tell that worker. The username is released if
+        that worker exited meanwhile
+        '''
+        handover: Optional[Tuple[socket.socket, int, socket.socket]] = self.handovers.pop(handover_id, None)
+
+        if name is not None and self.usernames.get(name) is owner:
+            self.forget_session(name)
+
+            if handover is not None:
+                self.usernames[name] = handover[0]
+            else:
+                del self.usernames[name]
+
+        if handover is not None:
+            self.send_message(handover[0], json.dumps({'type': 'resumed', 'id': handover[1], 'name': name, 'room': room}))
+
+        return
+
+
+    def remove_worker(self, worker: socket.socket) -> None:
+        '''
+        Forget an exited worker and release the usernames it held.
+        The sessions it was asked to hand over are expired
+        '''
+        self.selector.unregister(worker)
+        del self.buffers[worker]
+        self.outbound.pop(worker).close(discard=True)
+
+        for name in [name for name, owner in self.usernames.items() if owner is worker]:
+            del self.usernames[name]
+            self.forget_session(name)
+
+        for handover_id, (requester, request_id, owner) in list(self.handovers.items()):
+            if requester is worker:
+                del self.handovers[handover_id]
+            elif owner is worker:
+                del self.handovers[handover_id]
+                self.send_message(requester, json.dumps({'type': 'resumed', 'id': request_id, 'name': None, 'room': None}))
+
+        worker.close()
+        return
+
+
+# --- ClusterBus Class --- #
+class ClusterBus(BaseSocket):
+    '''
+    ClusterBus class -
+    Runs in a worker process and connects its server to the ClusterHub.
+    Events are queued and written by the bus's own thread, so the server
+    never waits for the hub, and the worker stops if its queue overflows
+    '''
+    CLAIM_TIMEOUT: float = 5.0
+
+    def __init__(self, conn: socket.socket, server: Server) -> None:
+        '''
+        Initialization
+        '''
+        self.conn: socket.socket = conn
+        self.server: Server = server
+        self.outbound: OutboundQueue = OutboundQueue(self.LINK_QUEUE_SIZE, OutboundQueue.DISCONNECT)
+        self.lock: threading.Lock = threading.Lock()
+        # Username, callback and timeout of every username claim waiting for the hub
+        self.claims: Dict[int, Tuple[str, Callable[[bool], None], threading.Timer]] = {}
+        self.claim_ids = itertools.count()
+        # Callback and timeout of every session resumed from another worker
+        self.resumes: Dict[int, Tuple[Callable[[Optional[Tuple[str, Optional[str]]]], None], threading.Timer]] = {}
+        self.resume_ids = itertools.count()
+
+
+    def start(self) -> None:
+        '''
+        Start listening for events relayed by the hub, and writing the events sent to it
+        '''
+        threading.Thread(target=self.handle_hub_events, daemon=True).start()
+        threading.Thread(target=self.write_queued_frames, args=(self.conn, self.outbound), daemon=True).start()
+
+
+    def handle_hub_events(self) -> None:
+        '''
+        Deliver broadcasts and private messages from the other workers
+        to the local clients and complete pending username claims
+        '''
+        buffer: ReceiveBuffer = ReceiveBuffer(self)
+
+        try:
+            while True:
+                for raw in buffer.receive(self.conn):
+                    event: Dict[str, Any] = json.loads(raw)
+
+                    if event['type'] == 'publish':
+                        self.server.run_threadsafe(self.server.broadcast, Envelope(*event['message']), False, event['room'])
+                    elif event['type'] == 'direct':
+                        self.server.run_threadsafe(self.server.receive_direct, event['from'], event['to'], event['message'])
+                    elif event['type'] == 'receipt':
+                        self.server.run_threadsafe(self.server.direct_receipt, event['from'], event['to'], event['message'], event['delivered'])
+                    elif event['type'] == 'claimed':
+                        self.complete_claim(event['id'], event['granted'])
+                    elif event['type'] == 'handover':
+                        self.server.run_threadsafe(self.server.hand_over_session, event['token'], functools.partial(self.send_handover, event['id']))
+                    elif event['type'] == 'resumed':
+                        self.complete_resume(event['id'], event['name'], event['room'])
+        except OSError:
+            self.server.logger.warning('WARNING', 'Lost the connection to the cluster hub')
+
+        # The hub only closes the connection when the parent process exits,
+        # so the worker terminates as if the parent had terminated it
+        self.server.logger.flush()
+        os.kill(os.getpid(), signal.SIGTERM)
+        return
+
+
+    def send_frame(self, conn: socket.socket, frame: Union[bytes, memoryview]) -> None:
+        '''
+        Queue an encoded event for the bus's writer, without waiting.
+        The connection to the hub is shut down if the queue is full,
+        which stops the worker
+        '''
+        if self.outbound.put(frame):
+            return
+
+        self.server.logger.warning('WARNING', 'The cluster hub is too slow to keep up with the events')
+        self.outbound.close(discard=True)
+
+        try:
+            conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+        return
+
+
+    def send_event(self, event: Dict[str, Any]) -> None:
+        '''
+        Send an event to the hub
+        '''
+        self.send_message(self.conn, json.dumps(event))
+        return
+
+
+    def publish(self, message: Envelope, room: Optional[str]=None) -> None:
+        '''
+        Relay a broadcast to the clients of every other worker
+        '''
+        self.send_event({'type': 'publish', 'message': message.fields(), 'room': room})
+        return
+
+
+    def send_direct(self, sender: str, recipient: str, text: str) -> bool:
+        '''
+        Relay a private message to the worker holding the recipient.
+        The hub answers with a receipt, so the message is always accepted
+        '''
+        self.send_event({'type': 'direct', 'from': sender, 'to': recipient, 'message': text})
+        return True
+
+
+    def send_receipt(self, sender: str, recipient: str, text: str, delivered: bool) -> None:
+        '''
+        Send the receipt of a relayed private message back to its sender's worker
+        '''
+        self.send_event({'type': 'receipt', 'from': sender, 'to': recipient, 'message': text, 'delivered': delivered})
+        return
+
+
+    def claim_username(self, name: str, callback: Callable[[bool], None]) -> None:
+        '''
+        Reserve a username across the cluster, without waiting for the hub.
+        `callback` is called from the bus's thread with False if another
+        client already holds it, or if the hub did not answer in time
+        '''
+        claim_id: int = next(self.claim_ids)
+        timer: threading.Timer = threading.Timer(self.CLAIM_TIMEOUT, self.expire_claim, (claim_id,))
+        timer.daemon = True
+
+        with self.lock:
+            self.claims[claim_id] = (name, callback, timer)
+
+        timer.start()
+        self.send_event({'type': 'claim', 'id': claim_id, 'name': name})
+        return
+
+
+    def complete_claim(self, claim_id: int, granted: bool) -> None:
+        '''
+        Pass the hub's answer to a username claim to its callback
+        '''
+        with self.lock:
+            claim: Optional[Tuple[str, Callable[[bool], None], threading.Timer]] = self.claims.pop(claim_id, None)
+
+        if claim is not None:
+            _, callback, timer = claim
+            timer.cancel()
+            callback(granted)
+
+        return
+
+
+    def expire_claim(self, claim_id: int) -> None:
+        '''
+        Refuse a username claim the hub did not answer in time. The username
+        is released in case the hub grants it later
+        '''
+        with self.lock:
+            claim: Optional[Tuple[str, Callable[[bool], None], threading.Timer]] = self.claims.pop(claim_id, None)
+
+        if claim is not None:
+            name, callback, _ = claim
+            self.release_username(name)
+            callback(False)
+
+        return
+
+
+    def release_username(self, name: str) -> None:
+        '''
+        Make a username available to the cluster again
+        '''
+        self.send_event({'type': 'release', 'name': name})
+        return
+
+
+    def register_session(self, token: str, name: str) -> None:
+        '''
+        Tell the hub which worker keeps a session, so it can be
+        resumed from the other workers
+        '''
+        self.send_event({'type': 'session', 'token': token, 'name': name})
+        return
+
+
+    def resume_session(self, token: str, callback: Callable[[Optional[Tuple[str, Optional[str]]]], None]) -> None:
+        '''
+        Take over a session kept by another worker, without waiting for
+        the hub. `callback` is called from the bus's thread with the
+        username and room of the session, now held by this worker, or with
+        None if no worker keeps it or the hub did not answer in time
+        '''
+        resume_id: int = next(self.resume_ids)
+        timer: threading.Timer = threading.Timer(self.CLAIM_TIMEOUT, self.complete_resume, (resume_id, None, None))
+        timer.daemon = True
+
+        with self.lock:
+            self.resumes[resume_id] = (callback, timer)
+
+        timer.start()
+        self.send_event({'type': 'resume', 'id': resume_id, 'token': token})
+        return
+
+
+    def complete_resume(self, resume_id: int, name: Optional[str], room: Optional[str]) -> None:
+        '''
+        Pass a session handed over by another worker to its callback.
+        A session handed over after the request timed out is ended,
+        releasing its username
+        '''
+        with self.lock:
+            resume: Optional[Tuple[Callable[[Optional[Tuple[str, Optional[str]]]], None], threading.Timer]] = self.resumes.pop(resume_id, None)
+
+        if resume is None:
+            if name is not None:
+                self.release_username(name)
+            return
+
+        callback, timer = resume
+        timer.cancel()
+        callback(None if name is None else (name, room))
+        return
+
+
+    def send_handover(self, handover_id: int, session: Optional[Tuple[str, Optional[str]]]) -> None:
+        '''
+        Send the username and room of a session handed over to another worker, if it was found
+        '''
+        name, room = (None, None) if session is None else session
+        self.send_event({'type': 'handed_over', 'id': handover_id, 'name': name, 'room': room})
+        return
+
+
+# --- Functions --- #
+def interrupt(signum: int, frame: Any) -> None:
+    '''
+    Signal handler stopping the cluster on SIGTERM like on a KeyboardInterrupt
+    '''
+    raise KeyboardInterrupt
+
+
+def run_workers(server_class: Type[Server], host: str, port: int, workers: int) -> None:
+    '''
+    Fork `workers` server processes bound to the same port with
+    SO_REUSEPORT and relay their traffic through a ClusterHub
+    '''
+    if not hasattr(os, 'fork') or not hasattr(socket, 'SO_REUSEPORT'):
+        raise OSError('Running several workers requires fork and SO_REUSEPORT')
+
+    hub_sockets: List[socket.socket] = []
+    pids: List[int] = []
+
+    for index in range(workers):
+        hub_end, worker_end = socket.socketpair()
+        pid: int = os.fork()
+
+        if pid == 0:
+            hub_end.close()
+            for other in hub_sockets:
+                other.close()
+
+            # Every worker keeps its own history log
+            if server_class.HISTORY_DIR:
+                server_class.HISTORY_DIR = os.path.join(server_class.HISTORY_DIR, 'worker-%d' % index)
+
+            # Worker N serves its statistics on STATS_PORT + N
+            if server_class.STATS_PORT:
+                server_class.STATS_PORT += index
+
+            server: Server = server_class(host, port)
+            server.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            server.bus = ClusterBus(worker_end, server)
+            server.bus.start()
+
+            server.logger.info('START', 'Worker %d running with pid %d', index, os.getpid())
+            server.start_server()
+            server.logger.flush()
+            os._exit(0)
+
+        worker_end.close()
+        hub_sockets.append(hub_end)
+        pids.append(pid)
+
+    # Created after forking, so the workers do not inherit its writer thread
+    logger: AsyncLogger = AsyncLogger(server_class.LOG_LEVEL)
+
+    # Only the parent handles SIGTERM, the workers keep the default action
+    signal.signal(signal.SIGTERM, interrupt)
+
+    try:
+        ClusterHub(hub_sockets, logger).serve()
+    except KeyboardInterrupt:
+        logger.warning('WARNING', 'Cluster closed. Terminating the workers')
+
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+        os.waitpid(pid, 0)
+
+    return
@@ -0,0 +1,188 @@
+'''
+envelope.py :
+Contains the interface and implementation for the Envelope and EnvelopeAssembler classes
+'''
+# --- Libraries --- #
+import time
+import codecs
+import struct
+from typing import Any, List, Optional, Union
+
+# --- Envelope Class --- #
+class Envelope:
+    '''
+    Envelope class -
+    Typed message exchanged between the clients and the server. A fixed
+    header packed with struct holds the message type, flags, sequence
+    number, server timestamp and sender length, followed by the sender
+    and the text. Both ends dispatch on the type and read the sender from
+    its own field. Room changes, private messages and history requests
+    have their own types, so the server never interprets the text of a
+    chat message as a command.
+    '''
+    HEADER: struct.Struct = struct.Struct('!BBQdH')
+
+    # Message types
+    LOGIN: int = 1              # Username requested by a client, or accepted by the server
+    USERNAME_TAKEN: int = 2     # Requested username already in use
+    QUIT: int = 3               # Client leaving, or server confirming a client left during the handshake
+    CHAT: int = 4               # Text typed by a client, or a room message from `sender`
+    NOTICE: int = 5             # Announcement from the server
+    PRIVATE: int = 6            # Private message from `sender`
+    ROOM: int = 7               # Room the client is now in
+    DELIVERED: int = 8          # Private message delivered to `sender`
+    UNDELIVERED: int = 9        # Private message not delivered, `sender` is not online
+    PING: int = 10
+    PONG: int = 11
+    SESSION: int = 12           # Token to resume the session after losing the connection
+    RESUME: int = 13            # Session token of a reconnecting client, with the sequence number of the first message it missed
+    SESSION_EXPIRED: int = 14   # Session to resume is unknown or expired
+    CHUNK: int = 15             # Part of the text of a large message, whose last part comes with the message itself
+    JOIN: int = 16              # Room a client moves to
+    LEAVE: int = 17             # Client going back to the default room
+    DIRECT: int = 18            # Private message sent by a client to the user in `sender`
+    HISTORY: int = 19           # Page of the room history preceding the message numbered `seq`, or the last page if 0
+
+    # Flags
+    REPLAY: int = 1             # Replayed from the room history
+    CONTINUED: int = 2          # Last part of a large message, preceded by its chunks
+    OVERSIZED: int = 4          # Set on receipt when the text exceeded the size limit and was dropped
+
+    def __init__(self, kind: int, text: str='', sender: str='', seq: int=0, timestamp: Optional[float]=None, flags: int=0) -> None:
+        '''
+        Initialization
+        '''
+        self.kind: int = kind
+        self.text: str = text
+        self.sender: str = sender
+        self.seq: int = seq
+        self.timestamp: float = time.time() if timestamp is None else timestamp
+        self.flags: int = flags
+
+
+    def __repr__(self) -> str:
+        '''
+        Readable representation, for logs and debugging
+        '''
+        return 'Envelope(%d, %r, sender=%r, seq=%d, flags=%d)' % (self.kind, self.text, self.sender, self.seq, self.flags)
+
+
+    @property
+    def replayed(self) -> bool:
+        '''
+        Whether the message is replayed from the room history
+        '''
+        return bool(self.flags & self.REPLAY)
+
+
+    def replay(self) -> 'Envelope':
+        '''
+        Copy of the message flagged as replayed from the room history
+        '''
+        return Envelope(self.kind, self.text, self.sender, self.seq, self.timestamp, self.flags | self.REPLAY)
+
+
+    def fields(self) -> List[Any]:
+        '''
+        Type, text, sender, sequence number and timestamp as a JSON
+        serializable list. `Envelope(*fields)` rebuilds the message
+        '''
+        return [self.kind, self.text, self.sender, self.seq, self.timestamp]
+
+
+    def split(self, size: int, encoding: str='utf-8') -> List['Envelope']:
+        '''
+        Split a message whose text takes more than `size` bytes into chunks
+        of about `size` bytes of text, followed by the message itself with
+        the last part, flagged as continued. Smaller messages are returned alone
+        '''
+        # No encoding takes more than 4 bytes per character
+        if size <= 0 or len(self.text) <= size // 4:
+            return [self]
+
+        data: bytes = self.text.encode(encoding)
+        if len(data) <= size:
+            return [self]
+
+        # Characters cut in two by a chunk boundary are carried over to the next part
+        decoder: codecs.IncrementalDecoder = codecs.getincrementaldecoder(encoding)()
+        parts: List[str] = [decoder.decode(data[start:start + size]) for start in range(0, len(data), size)]
+
+        chunks: List[Envelope] = [Envelope(self.CHUNK, part, timestamp=self.timestamp) for part in parts[:-1]]
+        return chunks + [Envelope(self.kind, parts[-1], self.sender, self.seq, self.timestamp, self.flags | self.CONTINUED)]
+
+
+    def encode(self, encoding: str='utf-8') -> bytes:
+        '''
+        Pack the message into a payload
+        '''
+        sender: bytes = self.sender.encode(encoding)
+        return self.HEADER.pack(self.kind, self.flags, self.seq, self.timestamp, len(sender)) + sender + self.text.encode(encoding)
+
+
+    @classmethod
+    def decode(cls, payload: Union[bytes, memoryview], encoding: str='utf-8') -> 'Envelope':
+        '''
+        Unpack a message from a payload.
+        Raises ValueError if the payload is malformed
+        '''
+        if len(payload) < cls.HEADER.size:
+            raise ValueError('Truncated envelope of %d bytes' % len(payload))
+
+        kind, flags, seq, timestamp, sender_length = cls.HEADER.unpack_from(payload)
+        start: int = cls.HEADER.size
+        end: int = start + sender_length
+
+        if end > len(payload):
+            raise ValueError('Envelope sender exceeds the payload')
+
+        return cls(kind, str(payload[end:], encoding), str(payload[start:end], encoding), seq, timestamp, flags)
+
+
+# --- EnvelopeAssembler Class --- #
+class EnvelopeAssembler:
+    '''
+    EnvelopeAssembler class -
+    Rebuilds the large messages of a connection split by `Envelope.split`.
+    The text of every chunk is collected as it arrives and joined once the
+    message with the last part comes. When the text grows past `limit`
+    characters, it is dropped and the message is flagged as oversized.
+    '''
+    def __init__(self, limit: int=0) -> None:
+        '''
+        Initialization
+        '''
+        self.limit: int = limit
+        self.parts: List[str] = []
+        self.size: int = 0
+
+
+    def add(self, message: Envelope) -> Optional[Envelope]:
+        '''
+        Collect a received message. Returns None for a chunk, or the
+        message itself, with the full text if it was split
+        '''
+        if message.kind != Envelope.CHUNK and not message.flags & Envelope.CONTINUED:
+            if 0 < self.limit < len(message.text):
+                message.text = ''
+                message.flags |= Envelope.OVERSIZED
+            return message
+
+        self.size += len(message.text)
+
+        if self.limit <= 0 or self.size <= self.limit:
+            self.parts.append(message.text)
+        else:
+            self.parts = []
+
+        if message.kind == Envelope.CHUNK:
+            return None
+
+        message.flags &= ~Envelope.CONTINUED
+        if 0 < self.limit < self.size:
+            message.flags |= Envelope.OVERSIZED
+
+        message.text = ''.join(self.parts)
+        self.parts = []
+        self.size = 0
+        return message
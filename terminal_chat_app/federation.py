@@ -0,0 +1,424 @@
+'''
+federation.py :
+Contains the interface and implementation for linking servers
+on different hosts into a single chat room
+'''
+# --- Libraries --- #
+import json
+import time
+import uuid
+import socket
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from .base_socket import BaseSocket
+from .envelope import Envelope
+from .outbound_queue import OutboundQueue
+from .receive_buffer import ReceiveBuffer
+from .server import Server
+
+# --- FederationBus Class --- #
+class FederationBus(BaseSocket):
+    '''
+    FederationBus class -
+    Links a server to its peers. Broadcasts are flooded to every peer and
+    de-duplicated by message ID, so each node only fans out to its own clients.
+    Usernames are reserved with every directly connected peer, so the nodes
+    of a cluster should be linked as a full mesh. Events are queued and
+    written by a thread per link, so a slow peer never stalls the server,
+    and a link whose queue overflows is dropped.
+    '''
+    CLAIM_TIMEOUT: float = 5.0
+    RECONNECT_INTERVAL: float = 2.0
+    SEEN_MESSAGES: int = 4096
+
+    def __init__(self, server: Server, listen_address: Optional[Tuple[str, int]], peer_addresses: List[Tuple[str, int]]) -> None:
+        '''
+        Initialization
+        '''
+        self.server: Server = server
+        self.node_id: str = uuid.uuid4().hex[:12]
+        self.listen_address: Optional[Tuple[str, int]] = listen_address
+        self.peer_addresses: List[Tuple[str, int]] = peer_addresses
+
+        self.lock: threading.Lock = threading.Lock()
+        self.peers: Dict[str, socket.socket] = {}
+        self.outbound: Dict[socket.socket, OutboundQueue] = {}
+        self.local_usernames: Set[str] = set()
+        self.remote_usernames: Dict[str, str] = {}
+        # Username, callback, peers yet to answer, answers and timeout of every pending username claim
+        self.claims: Dict[str, Tuple[str, Callable[[bool], None], Set[str], List[bool], threading.Timer]] = {}
+        self.seen: 'OrderedDict[str, None]' = OrderedDict()
+        self.message_ids = itertools.count()
+        self.running: bool = True
+
+
+    def start(self) -> None:
+        '''
+        Start accepting peer links and connecting to the configured peers
+        '''
+        if self.listen_address is not None:
+            listener: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listener.bind(self.listen_address)
+            listener.listen()
+
+            self.server.logger.info('START', 'Federation %s listening for peers at %s:%d', self.node_id, *self.listen_address)
+            threading.Thread(target=self.accept_peer_connection, args=(listener,), daemon=True).start()
+
+        for address in self.peer_addresses:
+            threading.Thread(target=self.connect_to_peer, args=(address,), daemon=True).start()
+
+        return
+
+
+    def accept_peer_connection(self, listener: socket.socket) -> None:
+        '''
+        Accept links opened by other nodes
+        '''
+        while self.running:
+            conn, _ = listener.accept()
+            threading.Thread(target=self.handle_peer, args=(conn, False), daemon=True).start()
+
+
+    def connect_to_peer(self, address: Tuple[str, int]) -> None:
+        '''
+        Keep a link open to a configured peer, reconnecting when it drops
+        '''
+        while self.running:
+            try:
+                conn: socket.socket = socket.create_connection(address)
+            except OSError:
+                time.sleep(self.RECONNECT_INTERVAL)
+                continue
+
+            self.handle_peer(conn, True)
+            time.sleep(self.RECONNECT_INTERVAL)
+
+
+    def handle_peer(self, conn: socket.socket, initiator: bool) -> None:
+        '''
+        Exchange the node IDs and usernames of both ends of a link,
+        then process the events sent by the peer until the link drops
+        '''
+        queue: OutboundQueue = OutboundQueue(self.LINK_QUEUE_SIZE, OutboundQueue.DISCONNECT)
+        self.outbound[conn] = queue
+        threading.Thread(target=self.write_queued_frames, args=(conn, queue), daemon=True).start()
+
+        buffer: ReceiveBuffer = ReceiveBuffer(self)
+        peer_id: Optional[str] = None
+
+        try:
+            with self.lock:
+                usernames: List[str] = list(self.local_usernames)
+
+            self.send_event(conn, {'type': 'hello', 'node': self.node_id, 'usernames': usernames})
+
+            while True:
+                for raw in buffer.receive(conn):
+                    event: Dict[str, Any] = json.loads(raw)
+
+                    if peer_id is None:
+                        peer_id = self.register_peer(conn, event, initiator)
+                        if peer_id is None:
+                            raise ConnectionAbortedError('Duplicate link')
+                    else:
+                        self.handle_peer_event(peer_id, conn, event)
+        except (OSError, ValueError):
+            pass
+
+        if peer_id is not None:
+            self.remove_peer(peer_id, conn)
+
+        del self.outbound[conn]
+        queue.close(discard=True)
+        conn.close()
+        return
+
+
+    def register_peer(self, conn: socket.socket, hello: Dict[str, Any], initiator: bool) -> Optional[str]:
+        '''
+        Record a new peer from its hello event. When two nodes linked each
+        other, only the link initiated by the node with the smaller ID is kept.
+        '''
+        peer_id: str = hello['node']
+        initiator_id: str = self.node_id if initiator else peer_id
+
+        with self.lock:
+            if peer_id == self.node_id:
+                return None
+
+            existing: Optional[socket.socket] = self.peers.get(peer_id)
+            if existing is not None:
+                if initiator_id != min(self.node_id, peer_id):
+                    return None
+
+                try:
+                    existing.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+            self.peers[peer_id] = conn
+            for name in hello['usernames']:
+                self.remote_usernames[name] = peer_id
+
+        self.server.logger.info('INFO', 'Federated with node %s', peer_id)
+        return peer_id
+
+
+    def remove_peer(self, peer_id: str, conn: socket.socket) -> None:
+        '''
+        Forget a peer whose link dropped, along with the usernames it held
+        '''
+        with self.lock:
+            if self.peers.get(peer_id) is not conn:
+                return
+
+            del self.peers[peer_id]
+            for name in [name for name, owner in self.remote_usernames.items() if owner == peer_id]:
+                del self.remote_usernames[name]
+
+            # Pending claims no longer wait for the lost peer
+            answered: List[str] = []
+            for claim_id, (_, _, waiting, _, _) in self.claims.items():
+                waiting.discard(peer_id)
+                if not waiting:
+                    answered.append(claim_id)
+
+        for claim_id in answered:
+            self.complete_claim(claim_id)
+
+        self.server.logger.warning('WARNING', 'Lost the link to node %s', peer_id)
+        return
+
+
+    def handle_peer_event(self, peer_id: str, conn: socket.socket, event: Dict[str, Any]) -> None:
+        '''
+        Process a single event sent by a peer
+        '''
+        if event['type'] == 'publish':
+            if self.mark_seen(event['id']):
+                self.server.run_threadsafe(self.server.broadcast, Envelope(*event['message']), False, event['room'])
+                self.forward(event, exclude=peer_id)
+
+        elif event['type'] == 'claim':
+            with self.lock:
+                name: str = event['name']
+                granted: bool = name not in self.local_usernames and self.remote_usernames.get(name, peer_id) == peer_id
+
+                if granted:
+                    self.remote_usernames[name] = peer_id
+
+            self.send_event(conn, {'type': 'claimed', 'id': event['id'], 'granted': granted})
+
+        elif event['type'] == 'claimed':
+            answered: bool = False
+
+            with self.lock:
+                claim = self.claims.get(event['id'])
+                if claim is not None and peer_id in claim[2]:
+                    _, _, waiting, result, _ = claim
+                    waiting.discard(peer_id)
+                    result.append(event['granted'])
+                    answered = not waiting
+
+            if answered:
+                self.complete_claim(event['id'])
+
+        elif event['type'] == 'release':
+            with self.lock:
+                if self.remote_usernames.get(event['name']) == peer_id:
+                    del self.remote_usernames[event['name']]
+
+        elif event['type'] == 'direct':
+            self.server.run_threadsafe(self.server.receive_direct, event['from'], event['to'], event['message'])
+
+        elif event['type'] == 'receipt':
+            self.server.run_threadsafe(self.server.direct_receipt, event['from'], event['to'], event['message'], event['delivered'])
+
+        return
+
+
+    def mark_seen(self, message_id: str) -> bool:
+        '''
+        Remember a message ID. Returns False if it was already seen
+        '''
+        with self.lock:
+            if message_id in self.seen:
+                return False
+
+            self.seen[message_id] = None
+            if len(self.seen) > self.SEEN_MESSAGES:
+                self.seen.popitem(last=False)
+
+        return True
+
+
+    def send_frame(self, conn: socket.socket, frame: Union[bytes, memoryview]) -> None:
+        '''
+        Queue an encoded event for a peer link's writer, without waiting.
+        A link whose queue is full is shut down, its handler then removes the peer
+        '''
+        queue: Optional[OutboundQueue] = self.outbound.get(conn)
+
+        if queue is None or queue.put(frame):
+            return
+
+        self.server.logger.warning('WARNING', 'Dropping a link too slow to keep up with the events')
+        queue.close(discard=True)
+
+        try:
+            conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+        return
+
+
+    def send_event(self, conn: socket.socket, event: Dict[str, Any]) -> None:
+        '''
+        Send an event over a single peer link
+        '''
+        self.send_message(conn, json.dumps(event))
+        return
+
+
+    def forward(self, event: Dict[str, Any], exclude: Optional[str]=None) -> None:
+        '''
+        Send an event to every peer, except the one it came from.
+        The event is encoded once for every link
+        '''
+        with self.lock:
+            links: List[Tuple[str, socket.socket]] = list(self.peers.items())
+
+        frame: bytes = self.encode_message(json.dumps(event))
+
+        for peer_id, conn in links:
+            if peer_id != exclude:
+                self.send_frame(conn, frame)
+
+        return
+
+
+    def publish(self, message: Envelope, room: Optional[str]=None) -> None:
+        '''
+        Relay a broadcast to the clients of every other node
+        '''
+        message_id: str = '%s:%d' % (self.node_id, next(self.message_ids))
+
+        self.mark_seen(message_id)
+        self.forward({'type': 'publish', 'id': message_id, 'message': message.fields(), 'room': room})
+        return
+
+
+    def send_to_owner(self, name: str, event: Dict[str, Any]) -> bool:
+        '''
+        Send an event to the peer holding a username.
+        Returns False if no linked peer holds it
+        '''
+        with self.lock:
+            conn: Optional[socket.socket] = self.peers.get(self.remote_usernames.get(name))
+
+        if conn is None:
+            return False
+
+        self.send_event(conn, event)
+        return True
+
+
+    def send_direct(self, sender: str, recipient: str, text: str) -> bool:
+        '''
+        Relay a private message to the node holding the recipient.
+        Returns False if no linked node holds it
+        '''
+        return self.send_to_owner(recipient, {'type': 'direct', 'from': sender, 'to': recipient, 'message': text})
+
+
+    def send_receipt(self, sender: str, recipient: str, text: str, delivered: bool) -> None:
+        '''
+        Send the receipt of a relayed private message back to its sender's node
+        '''
+        self.send_to_owner(sender, {'type': 'receipt', 'from': sender, 'to': recipient, 'message': text, 'delivered': delivered})
+        return
+
+
+    def claim_username(self, name: str, callback: Callable[[bool], None]) -> None:
+        '''
+        Reserve a username with every connected peer, without waiting for them.
+        `callback` is called with False if any node already holds or is claiming
+        it, or does not answer in time, possibly from another thread
+        '''
+        with self.lock:
+            if name in self.local_usernames or name in self.remote_usernames:
+                granted: Optional[bool] = False
+            elif not self.peers:
+                granted = True
+                self.local_usernames.add(name)
+            else:
+                granted = None
+                self.local_usernames.add(name)
+                claim_id: str = '%s:%d' % (self.node_id, next(self.message_ids))
+                timer: threading.Timer = threading.Timer(self.CLAIM_TIMEOUT, self.complete_claim, (claim_id,))
+                timer.daemon = True
+                self.claims[claim_id] = (name, callback, set(self.peers), [], timer)
+
+        if granted is not None:
+            callback(granted)
+            return
+
+        timer.start()
+        self.forward({'type': 'claim', 'id': claim_id, 'name': name})
+        return
+
+
+    def complete_claim(self, claim_id: str) -> None:
+        '''
+        Pass the outcome of a username claim to its callback, once every
+        peer answered, or when it times out. The username is released
+        unless every peer granted it
+        '''
+        with self.lock:
+            claim = self.claims.pop(claim_id, None)
+
+        if claim is None:
+            return
+
+        name, callback, waiting, result, timer = claim
+        timer.cancel()
+        granted: bool = not waiting and all(result)
+
+        if not granted:
+            self.release_username(name)
+
+        callback(granted)
+        return
+
+
+    def release_username(self, name: str) -> None:
+        '''
+        Make a username available to the cluster again
+        '''
+        with self.lock:
+            self.local_usernames.discard(name)
+
+        self.forward({'type': 'release', 'name': name})
+        return
+
+
+    def register_session(self, token: str, name: str) -> None:
+        '''
+        Sessions are only resumed on the node that issued them,
+        the other nodes do not need to know about them
+        '''
+        return
+
+
+    def resume_session(self, token: str, callback: Callable[[Optional[Tuple[str, Optional[str]]]], None]) -> None:
+        '''
+        Sessions are not handed over between nodes, a client that
+        reconnects to another node has to log in again
+        '''
+        callback(None)
+        return
@@ -0,0 +1,217 @@
+'''
+handoff.py :
+Contains the interface and implementation for the Handoff class
+'''
+# --- Libraries --- #
+import os
+import json
+import socket
+import selectors
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from .base_socket import BaseSocket
+from .history import MessageHistory
+
+if TYPE_CHECKING:
+    from .reactor_server import ReactorServer
+
+# --- Handoff Class --- #
+class Handoff(BaseSocket):
+    '''
+    Handoff class -
+    Hot restart of a ReactorServer. The running server listens on a Unix
+    socket for its successor. When a new process connects, the server
+    stops between two events and passes it the listening socket and every
+    client connection with SCM_RIGHTS, along with their usernames, rooms,
+    sessions and the data read or queued but not yet handled. Once the successor
+    adopted everything, the old process lets go of the connections and
+    exits, so no client is disconnected.
+    '''
+    # SCM_RIGHTS passes at most 253 descriptors per message on Linux
+    BATCH_SIZE: int = 200
+    TIMEOUT: float = 10.0
+
+    def __init__(self, path: str) -> None:
+        '''
+        Initialization
+        '''
+        self.path: str = path
+        self.server: Optional['ReactorServer'] = None
+        self.listener: Optional[socket.socket] = None
+        self.conn: Optional[socket.socket] = None
+
+
+    def listen(self, server: 'ReactorServer') -> None:
+        '''
+        Wait for a successor on the Unix socket, from the server's event loop
+        '''
+        # A socket file left by a crashed server refuses connections
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        self.server = server
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.path)
+        self.listener.listen(1)
+        self.listener.setblocking(False)
+
+        server.selector.register(self.listener, selectors.EVENT_READ, self.hand_off)
+        return
+
+
+    def close_listener(self) -> None:
+        '''
+        Stop waiting for a successor and free the path for it
+        '''
+        self.server.selector.unregister(self.listener)
+        self.listener.close()
+
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+        return
+
+
+    def send_event(self, conn: socket.socket, event: Dict[str, Any], fds: Sequence[int]=()) -> None:
+        '''
+        Send an event, followed by the file descriptors it announces
+        '''
+        self.send_message(conn, json.dumps({**event, 'fds': len(fds)}))
+
+        # The descriptors travel with a single marker byte, so a
+        # regular read of the next event never consumes them
+        if fds:
+            socket.send_fds(conn, [b'\0'], fds)
+
+        return
+
+
+    def receive_event(self, conn: socket.socket) -> Tuple[Dict[str, Any], List[socket.socket]]:
+        '''
+        Receive an event and the sockets passed along with it
+        '''
+        event: Dict[str, Any] = json.loads(self.receive_message(conn))
+        sockets: List[socket.socket] = []
+
+        if event['fds']:
+            _, fds, _, _ = socket.recv_fds(conn, 1, event['fds'])
+            sockets = [socket.socket(fileno=fd) for fd in fds]
+
+        return event, sockets
+
+
+    def hand_off(self, sock: socket.socket, mask: int) -> None:
+        '''
+        Hand the server over to the process that connected. If the
+        successor fails before confirming, the server keeps running.
+        '''
+        try:
+            conn, _ = sock.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+
+        server: 'ReactorServer' = self.server
+        self.close_listener()
+        conn.setblocking(True)
+        conn.settimeout(self.TIMEOUT)
+        history_closed: bool = False
+
+        try:
+            if json.loads(self.receive_message(conn))['type'] != 'takeover':
+                raise ValueError('Unexpected handoff request')
+
+            clients: List[socket.socket] = server.transferable_clients()
+            server.logger.info('HANDOFF', 'Handing %d connections over to a new process', len(clients))
+
+            self.send_event(conn, {'type': 'listener'}, [server.server_socket.fileno()])
+
+            # History kept in memory only is handed over with the sockets,
+            # the log on disk is reopened by the successor
+            if server.history.log is None:
+                self.send_event(conn, {'type': 'history', **server.history.state()})
+            server.history.close()
+            history_closed = True
+
+            self.send_event(conn, {'type': 'sessions', **server.sessions.state()})
+
+            for start in range(0, len(clients), self.BATCH_SIZE):
+                batch: List[socket.socket] = clients[start:start + self.BATCH_SIZE]
+                self.send_event(conn, {'type': 'clients', 'clients': [server.export_client(client) for client in batch]},
+                                [client.fileno() for client in batch])
+
+            self.send_event(conn, {'type': 'done'})
+            confirmed: bool = json.loads(self.receive_message(conn))['type'] == 'ok'
+        except (OSError, ValueError, KeyError) as e:
+            server.logger.error('HANDOFF', 'Handoff failed, resuming: %s', e)
+            confirmed = False
+
+        if not confirmed:
+            conn.close()
+            if history_closed and server.history.log is not None:
+                server.history = MessageHistory(server.HISTORY_SIZE, server.HISTORY_DIR, server.HISTORY_SEGMENT_SIZE)
+            self.listen(server)
+            return
+
+        server.detach_clients()
+        server.logger.info('HANDOFF', 'Handoff complete, exiting')
+
+        # Closing the link tells the successor every port was released
+        conn.close()
+        return
+
+
+    def take_over(self) -> Optional[Dict[str, Any]]:
+        '''
+        Ask the server listening on the Unix socket to hand itself over.
+        Returns the listening socket, the history, the suspended sessions and
+        the client connections it passed, or None if no server is running there
+        '''
+        conn: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        try:
+            conn.connect(self.path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            conn.close()
+            return None
+
+        conn.settimeout(self.TIMEOUT)
+        self.send_message(conn, json.dumps({'type': 'takeover'}))
+
+        state: Dict[str, Any] = {'listener': None, 'history': None, 'sessions': None, 'clients': []}
+
+        while True:
+            event, sockets = self.receive_event(conn)
+
+            if event['type'] == 'done':
+                break
+            elif event['type'] == 'listener':
+                state['listener'] = sockets[0]
+            elif event['type'] == 'history':
+                state['history'] = event
+            elif event['type'] == 'sessions':
+                state['sessions'] = event
+            elif event['type'] == 'clients':
+                state['clients'].extend(zip(sockets, event['clients']))
+
+        self.conn = conn
+        return state
+
+
+    def complete(self) -> None:
+        '''
+        Confirm the takeover, then wait until the previous
+        process released its connections and ports
+        '''
+        self.send_message(self.conn, json.dumps({'type': 'ok'}))
+
+        self.conn.settimeout(None)
+        try:
+            self.conn.recv(1)
+        except OSError:
+            pass
+
+        self.conn.close()
+        self.conn = None
+        return
@@ -0,0 +1,276 @@
+'''
+history.py :
+Contains the interface and implementation for the HistoryLog
+and MessageHistory classes
+'''
+# --- Libraries --- #
+import os
+import json
+import mmap
+import struct
+import threading
+from collections import deque
+from typing import Any, BinaryIO, Deque, Dict, List, Optional, Tuple
+
+from .envelope import Envelope
+
+# --- HistoryLog Class --- #
+class HistoryLog:
+    '''
+    HistoryLog class -
+    Append-only message log split into segment files. A fixed-width
+    index maps every sequence number to its record and is memory-mapped,
+    so any message can be read back without loading the segments.
+    Sequence numbers start at FIRST_SEQ, the record numbered `seq`
+    is the entry `seq - FIRST_SEQ` of the index.
+    '''
+    INDEX_ENTRY: struct.Struct = struct.Struct('!IQI')
+    FIRST_SEQ: int = 1
+
+    def __init__(self, directory: str, segment_size: int) -> None:
+        '''
+        Initialization
+        '''
+        os.makedirs(directory, exist_ok=True)
+
+        self.directory: str = directory
+        self.segment_size: int = segment_size
+        self.lock: threading.Lock = threading.Lock()
+
+        self.index_file: BinaryIO = open(os.path.join(directory, 'index'), 'ab+')
+        self.index_file.seek(0, os.SEEK_END)
+
+        # Drop a partially written entry left by a crash
+        self.count: int = self.index_file.tell() // self.INDEX_ENTRY.size
+        self.index_file.truncate(self.count * self.INDEX_ENTRY.size)
+
+        self.index_map: Optional[mmap.mmap] = None
+        self.mapped: int = 0
+        self.readers: Dict[int, BinaryIO] = {}
+
+        self.segment_number: int = self.entry(self.count - 1)[0] if self.count else 0
+        self.segment: BinaryIO = open(self.segment_path(self.segment_number), 'ab')
+        self.segment_offset: int = self.segment.tell()
+
+
+    def segment_path(self, number: int) -> str:
+        '''
+        Path of the segment file with the given number
+        '''
+        return os.path.join(self.directory, 'segment-%08d.log' % number)
+
+
+    def append(self, room: str, message: Envelope) -> int:
+        '''
+        Append a message to the log and return its sequence number,
+        which is set on the message
+        '''
+        with self.lock:
+            message.seq = self.FIRST_SEQ + self.count
+            record: bytes = (json.dumps([room, message.fields()]) + '\n').encode('utf-8')
+
+            if self.segment_offset > 0 and self.segment_offset + len(record) > self.segment_size:
+                self.segment.close()
+                self.segment_number += 1
+                self.segment = open(self.segment_path(self.segment_number), 'ab')
+                self.segment_offset = 0
+
+            self.segment.write(record)
+            self.segment.flush()
+            self.index_file.write(self.INDEX_ENTRY.pack(self.segment_number, self.segment_offset, len(record)))
+            self.index_file.flush()
+
+            self.segment_offset += len(record)
+            self.count += 1
+
+            return message.seq
+
+
+    def entry(self, position: int) -> Tuple[int, int, int]:
+        '''
+        Segment number, offset and length of the record at a position
+        of the index, read from the mapped index
+        '''
+        if position >= self.mapped:
+            if self.index_map is not None:
+                self.index_map.close()
+
+            self.index_map = mmap.mmap(self.index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.mapped = len(self.index_map) // self.INDEX_ENTRY.size
+
+        return self.INDEX_ENTRY.unpack_from(self.index_map, position * self.INDEX_ENTRY.size)
+
+
+    def read(self, seq: int) -> Tuple[str, Envelope]:
+        '''
+        Room and message with the given sequence number
+        '''
+        with self.lock:
+            segment, offset, length = self.entry(seq - self.FIRST_SEQ)
+
+            reader: Optional[BinaryIO] = self.readers.get(segment)
+            if reader is None:
+                reader = self.readers[segment] = open(self.segment_path(segment), 'rb')
+
+            reader.seek(offset)
+            room, fields = json.loads(reader.read(length))
+
+        return room, Envelope(*fields)
+
+
+    def close(self) -> None:
+        '''
+        Close every file of the log
+        '''
+        with self.lock:
+            if self.index_map is not None:
+                self.index_map.close()
+
+            for reader in self.readers.values():
+                reader.close()
+
+            self.segment.close()
+            self.index_file.close()
+
+        return
+
+
+# --- MessageHistory Class --- #
+class MessageHistory:
+    '''
+    MessageHistory class -
+    Keeps the last messages of every room in a ring buffer for replay
+    on join, and optionally every message in a HistoryLog for paging
+    back through older history by sequence number. Sequence numbers
+    start at 1, messages outside any room's history keep the sequence number 0
+    '''
+    FIRST_SEQ: int = HistoryLog.FIRST_SEQ
+    SCAN_LIMIT: int = 10000
+
+    def __init__(self, size: int, directory: str='', segment_size: int=16 * 1024 * 1024) -> None:
+        '''
+        Initialization
+        '''
+        self.size: int = size
+        self.rooms: Dict[str, Deque[Envelope]] = {}
+        self.lock: threading.Lock = threading.Lock()
+        self.log: Optional[HistoryLog] = HistoryLog(directory, segment_size) if directory else None
+        self.next_seq: int = self.FIRST_SEQ + (self.log.count if self.log is not None else 0)
+
+        # Warm up the ring buffers with the tail of the log
+        if self.log is not None:
+            for seq in range(max(self.FIRST_SEQ, self.next_seq - self.SCAN_LIMIT), self.next_seq):
+                room, message = self.log.read(seq)
+                self.ring(room).append(message)
+
+
+    def ring(self, room: str) -> Deque[Envelope]:
+        '''
+        Ring buffer of the given room
+        '''
+        ring: Optional[Deque[Envelope]] = self.rooms.get(room)
+
+        if ring is None:
+            ring = self.rooms[room] = deque(maxlen=self.size)
+
+        return ring
+
+
+    def record(self, room: str, message: Envelope) -> int:
+        '''
+        Store a message sent to a room and return its sequence number,
+        which is set on the message
+        '''
+        with self.lock:
+            if self.log is not None:
+                seq: int = self.log.append(room, message)
+            else:
+                seq: int = self.next_seq
+                message.seq = seq
+
+            self.next_seq = seq + 1
+            self.ring(room).append(message)
+
+        return seq
+
+
+    def recent(self, room: str) -> List[Envelope]:
+        '''
+        The last messages of a room, oldest first
+        '''
+        with self.lock:
+            return list(self.rooms.get(room, ()))
+
+
+    def state(self) -> Dict[str, Any]:
+        '''
+        Next sequence number and ring buffers, to hand them over to another process
+        '''
+        with self.lock:
+            return {'next_seq': self.next_seq, 'rooms': {room: [message.fields() for message in ring] for room, ring in self.rooms.items()}}
+
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        '''
+        Take over the next sequence number and ring buffers of another process
+        '''
+        with self.lock:
+            self.next_seq = state['next_seq']
+
+            for room, messages in state['rooms'].items():
+                self.ring(room).extend(Envelope(*fields) for fields in messages)
+
+        return
+
+
+    def close(self) -> None:
+        '''
+        Close the log, if there is one
+        '''
+        if self.log is not None:
+            self.log.close()
+
+        return
+
+
+    def page(self, room: str, before: Optional[int], count: int, after: int=0) -> List[Envelope]:
+        '''
+        Up to `count` messages of a room older than the sequence number
+        `before`, and not older than `after`, newest first. Served from
+        the ring buffer when possible, then from the log.
+        '''
+        with self.lock:
+            ring: List[Envelope] = list(self.rooms.get(room, ()))
+            end: int = self.next_seq if before is None else min(before, self.next_seq)
+
+        messages: List[Envelope] = [message for message in reversed(ring) if after <= message.seq < end][:count]
+
+        if len(messages) < count and self.log is not None:
+            seq: int = messages[-1].seq if messages else end
+            lowest: int = max(after, self.FIRST_SEQ, seq - self.SCAN_LIMIT)
+
+            while len(messages) < count and seq > lowest:
+                seq -= 1
+                message_room, message = self.log.read(seq)
+
+                if message_room == room:
+                    messages.append(message)
+
+        return messages
+
+
+    def since(self, room: str, seq: int, count: int) -> List[Envelope]:
+        '''
+        The last `count` messages of a room numbered `seq` or later,
+        oldest first. The log is only read when the ring buffer no
+        longer reaches back to `seq`
+        '''
+        with self.lock:
+            ring: List[Envelope] = list(self.rooms.get(room, ()))
+
+        messages: List[Envelope] = [message for message in ring if message.seq >= seq]
+
+        if len(messages) == len(ring) == self.size and len(messages) < count and self.log is not None:
+            messages = self.page(room, messages[0].seq, count - len(messages), seq)[::-1] + messages
+
+        return messages[-count:]
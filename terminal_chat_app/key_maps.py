@@ -37,21 +37,21 @@ def disconnect_client(client: Client) -> NoReturn:
     Send a disconnection message to the server
     and exit the client application
     '''
-    client.send_client_message(client.CLIENT_DISCONNECT_MESSAGE)
+    client.disconnect()
     sys.exit(0)
 
 def send_message(text_list: List[str], client: Client) -> Union[None, NoReturn]:
     '''
     Send the message saved in the `text_list`
-    to the server. Disconnects the client application
-    if the disconnect message is sent
+    to the server. Exits the client application
+    if the connection to the server was lost
     '''
     message: str = ''.join(text_list)
 
-    response: str = client.send_client_message(message)
+    sent: bool = client.send_input(message)
     text_list.clear()
     
-    if response == client.CLIENT_DISCONNECT_MESSAGE:
+    if not sent:
         sys.exit(0)
     
     return
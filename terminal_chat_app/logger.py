@@ -0,0 +1,125 @@
+'''
+logger.py :
+Contains the interface and implementation for the AsyncLogger class
+'''
+# --- Libraries --- #
+import sys
+import atexit
+import threading
+from queue import SimpleQueue
+from typing import Any, Dict, Optional, TextIO, Tuple
+
+# --- AsyncLogger Class --- #
+class AsyncLogger:
+    '''
+    AsyncLogger class -
+    Leveled logger whose records are formatted and written by a
+    background thread, so logging never blocks the threads serving clients.
+    Records below the configured level are dropped before being queued.
+    '''
+    DEBUG: int = 10
+    INFO: int = 20
+    WARNING: int = 30
+    ERROR: int = 40
+    LEVELS: Dict[str, int] = {'DEBUG': DEBUG, 'INFO': INFO, 'WARNING': WARNING, 'ERROR': ERROR, 'OFF': 100}
+
+    def __init__(self, level: str='INFO', stream: Optional[TextIO]=None) -> None:
+        '''
+        Initialization
+        '''
+        if level.upper() not in self.LEVELS:
+            raise ValueError('Unknown log level: %s' % level)
+
+        self.level: int = self.LEVELS[level.upper()]
+        self.stream: Optional[TextIO] = stream
+        self.records: 'SimpleQueue[Optional[Tuple[str, str, Tuple[Any, ...]]]]' = SimpleQueue()
+        self.lock: threading.Lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+
+
+    def log(self, level: int, tag: str, message: str, *args: Any) -> None:
+        '''
+        Queue a record to be written as `[TAG] message % args`
+        '''
+        if level < self.level:
+            return
+
+        if self.thread is None:
+            self.start()
+
+        self.records.put((tag, message, args))
+        return
+
+
+    def debug(self, tag: str, message: str, *args: Any) -> None:
+        '''
+        Log a record at the DEBUG level
+        '''
+        self.log(self.DEBUG, tag, message, *args)
+        return
+
+
+    def info(self, tag: str, message: str, *args: Any) -> None:
+        '''
+        Log a record at the INFO level
+        '''
+        self.log(self.INFO, tag, message, *args)
+        return
+
+
+    def warning(self, tag: str, message: str, *args: Any) -> None:
+        '''
+        Log a record at the WARNING level
+        '''
+        self.log(self.WARNING, tag, message, *args)
+        return
+
+
+    def error(self, tag: str, message: str, *args: Any) -> None:
+        '''
+        Log a record at the ERROR level
+        '''
+        self.log(self.ERROR, tag, message, *args)
+        return
+
+
+    def start(self) -> None:
+        '''
+        Start the writer thread, and make sure queued records
+        are written when the interpreter exits
+        '''
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.write_records, daemon=True)
+                self.thread.start()
+                atexit.register(self.flush)
+
+        return
+
+
+    def write_records(self) -> None:
+        '''
+        Format and write queued records until the logger is flushed
+        '''
+        while (record := self.records.get()) is not None:
+            tag, message, args = record
+            print('[%s] %s' % (tag, message % args if args else message), file=self.stream or sys.stdout)
+
+        return
+
+
+    def flush(self) -> None:
+        '''
+        Write every queued record and stop the writer thread.
+        The thread is started again by the next record.
+        '''
+        with self.lock:
+            thread: Optional[threading.Thread] = self.thread
+            self.thread = None
+
+        if thread is not None:
+            self.records.put(None)
+            thread.join()
+            atexit.unregister(self.flush)
+
+        return
@@ -0,0 +1,215 @@
+'''
+metrics.py :
+Contains the interface and implementation for the Histogram, Metrics
+and StatsListener classes
+'''
+# --- Libraries --- #
+import json
+import time
+import socket
+import bisect
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+
+# --- Histogram Class --- #
+class Histogram:
+    '''
+    Histogram class -
+    Counts observations in exponentially growing buckets,
+    from one microsecond up to about a minute
+    '''
+    def __init__(self, start: float=1e-6, factor: float=2, buckets: int=26) -> None:
+        '''
+        Initialization
+        '''
+        self.bounds: List[float] = [start * factor ** index for index in range(buckets)]
+        self.counts: List[int] = [0] * (buckets + 1)
+        self.count: int = 0
+        self.sum: float = 0
+        self.max: float = 0
+        self.lock: threading.Lock = threading.Lock()
+
+
+    def observe(self, value: float) -> None:
+        '''
+        Record a single observation
+        '''
+        index: int = bisect.bisect_left(self.bounds, value)
+
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+
+        return
+
+
+    def quantile(self, fraction: float) -> float:
+        '''
+        Upper bound of the bucket holding the given quantile
+        '''
+        rank: float = fraction * self.count
+        seen: int = 0
+
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(self.bounds[index], self.max) if index < len(self.bounds) else self.max
+
+        return 0.0
+
+
+    def snapshot(self) -> Dict[str, Any]:
+        '''
+        Summary of the observations and the non-empty buckets
+        '''
+        with self.lock:
+            return {
+                'count': self.count,
+                'sum': self.sum,
+                'mean': self.sum / self.count if self.count else 0.0,
+                'p50': self.quantile(0.5),
+                'p99': self.quantile(0.99),
+                'p999': self.quantile(0.999),
+                'max': self.max,
+                'buckets': [[bound, count] for bound, count in zip(self.bounds + [None], self.counts) if count],
+            }
+
+
+# --- Metrics Class --- #
+class Metrics:
+    '''
+    Metrics class -
+    Counters and histograms describing the activity of a server
+    '''
+    COUNTERS: List[str] = ['connections_total', 'messages_in', 'messages_out', 'direct_messages', 'bytes_in', 'bytes_out', 'pings_sent', 'idle_reaped',
+                           'throttled_messages', 'throttled_global', 'throttle_disconnects', 'sessions_resumed', 'sessions_expired',
+                           'chunked_messages', 'oversized_messages']
+
+    def __init__(self) -> None:
+        '''
+        Initialization
+        '''
+        self.counters: Dict[str, int] = dict.fromkeys(self.COUNTERS, 0)
+        self.lock: threading.Lock = threading.Lock()
+        self.broadcast_duration: Histogram = Histogram()
+        self.handshake_latency: Histogram = Histogram()
+        self.started: float = time.monotonic()
+
+
+    def increment(self, name: str, amount: int=1) -> None:
+        '''
+        Add `amount` to a counter
+        '''
+        with self.lock:
+            self.counters[name] += amount
+
+        return
+
+
+    def snapshot(self) -> Dict[str, Any]:
+        '''
+        Current value of every counter and histogram
+        '''
+        with self.lock:
+            counters: Dict[str, int] = dict(self.counters)
+
+        return {
+            'uptime_seconds': time.monotonic() - self.started,
+            **counters,
+            'broadcast_duration_seconds': self.broadcast_duration.snapshot(),
+            'handshake_latency_seconds': self.handshake_latency.snapshot(),
+        }
+
+
+# --- StatsListener Class --- #
+class StatsListener:
+    '''
+    StatsListener class -
+    Serves a snapshot of the server statistics to every connection.
+    A client may send `json` to get JSON instead of the text format.
+    '''
+    def __init__(self, host: str, port: int, snapshot: Callable[[], Dict[str, Any]]) -> None:
+        '''
+        Initialization
+        '''
+        self.address: Tuple[str, int] = (host, port)
+        self.snapshot: Callable[[], Dict[str, Any]] = snapshot
+        self.listener: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.running: bool = True
+
+
+    def start(self) -> None:
+        '''
+        Start serving statistics from a background thread
+        '''
+        self.listener.bind(self.address)
+        self.listener.listen()
+
+        threading.Thread(target=self.accept_stats_connection, daemon=True).start()
+        return
+
+
+    def accept_stats_connection(self) -> None:
+        '''
+        Answer every incoming connection with the current statistics
+        '''
+        while self.running:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                # The listener was closed
+                return
+
+            try:
+                conn.settimeout(1)
+                try:
+                    request: str = conn.recv(64).decode('ascii', 'replace').strip().lower()
+                except socket.timeout:
+                    request = ''
+
+                stats: Dict[str, Any] = self.snapshot()
+                conn.sendall((json.dumps(stats) + '\n' if request == 'json' else format_text(stats)).encode('utf-8'))
+            except OSError:
+                pass
+            finally:
+                conn.close()
+
+
+    def close(self) -> None:
+        '''
+        Stop serving statistics and release the port
+        '''
+        self.running = False
+
+        try:
+            self.listener.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+        self.listener.close()
+        return
+
+
+# --- Functions --- #
+def format_text(stats: Dict[str, Any]) -> str:
+    '''
+    Render statistics as one `name value` line per figure.
+    Histograms are summarized by their count, mean, quantiles and maximum,
+    and mappings are rendered with their keys as labels
+    '''
+    lines: List[str] = []
+
+    for name, value in stats.items():
+        if not isinstance(value, dict):
+            lines.append('%s %s' % (name, value))
+        elif 'buckets' in value:
+            for stat in ['count', 'mean', 'p50', 'p99', 'p999', 'max']:
+                lines.append('%s{stat="%s"} %s' % (name, stat, value[stat]))
+        else:
+            for label, item in value.items():
+                lines.append('%s{key="%s"} %s' % (name, label, item))
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,258 @@
+'''
+outbound_queue.py :
+Contains the interface and implementation for the OutboundQueue class
+'''
+# --- Libraries --- #
+import time
+import threading
+from collections import deque
+from typing import Callable, Deque, List, Optional, Sequence, Union
+
+# --- OutboundQueue Class --- #
+class OutboundQueue:
+    '''
+    OutboundQueue class -
+    Bounded queue of encoded frames waiting to be written to a single connection.
+    Frames handed to the writer stay at the head of the queue until they are
+    consumed, and are never dropped, so a frame is written whole or not at all.
+    The chunk frames of large messages wait in a separate lane and are released
+    one at a time, each behind every frame queued while the previous chunk was
+    written, so small messages never wait for more than a chunk.
+    '''
+    DROP_OLDEST: str = 'drop_oldest'
+    DISCONNECT: str = 'disconnect'
+    BLOCK: str = 'block'
+    POLICIES: List[str] = [DROP_OLDEST, DISCONNECT, BLOCK]
+
+    def __init__(self, maxsize: int, policy: str, notify: Optional[Callable[[], None]]=None) -> None:
+        '''
+        Initialization
+        '''
+        if policy not in self.POLICIES:
+            raise ValueError('Unknown outbound queue policy: %s' % policy)
+
+        self.frames: Deque[Union[bytes, memoryview]] = deque()
+        # Chunked messages not started yet, the remaining chunks
+        # of the current one and its chunk waiting in `frames`
+        self.streams: Deque[Sequence[Union[bytes, memoryview]]] = deque()
+        self.chunks: Deque[Union[bytes, memoryview]] = deque()
+        self.chunk: Optional[Union[bytes, memoryview]] = None
+        # Frames at the head of the queue handed to the writer and not consumed yet
+        self.inflight: int = 0
+        self.maxsize: int = maxsize
+        self.policy: str = policy
+        self.notify: Optional[Callable[[], None]] = notify
+        self.condition: threading.Condition = threading.Condition()
+        self.nbytes: int = 0
+        self.dropped: int = 0
+        self.closed: bool = False
+
+
+    def __len__(self) -> int:
+        '''
+        Number of frames and chunked messages waiting to be written
+        '''
+        return len(self.frames) + len(self.streams)
+
+
+    def put(self, frame: Union[bytes, memoryview]) -> bool:
+        '''
+        Add a frame to the queue, applying the overflow policy when it is full.
+        Returns False if the connection should be disconnected.
+        '''
+        with self.condition:
+            if not self.make_room():
+                return False
+
+            # Closed, or nothing older could be dropped to make room for the frame
+            if self.closed or len(self) >= self.maxsize:
+                return True
+
+            self.frames.append(frame)
+            self.nbytes += len(frame)
+            self.condition.notify_all()
+
+        if self.notify is not None:
+            self.notify()
+
+        return True
+
+
+    def put_chunks(self, frames: Sequence[Union[bytes, memoryview]]) -> bool:
+        '''
+        Add the chunk frames of a large message to the queue, as a single
+        entry, applying the overflow policy when it is full.
+        Returns False if the connection should be disconnected.
+        '''
+        with self.condition:
+            if not self.make_room():
+                return False
+
+            if self.closed or len(self) >= self.maxsize:
+                return True
+
+            self.streams.append(frames)
+            if self.chunk is None:
+                self.release_chunk()
+            self.condition.notify_all()
+
+        if self.notify is not None:
+            self.notify()
+
+        return True
+
+
+    def make_room(self) -> bool:
+        '''
+        Apply the overflow policy until an entry fits, while holding the lock.
+        When every queued entry is being written, dropping the oldest entry
+        drops the new one instead. Returns False if the connection should be
+        disconnected.
+        '''
+        while not self.closed and len(self) >= self.maxsize:
+            if self.policy == self.DROP_OLDEST:
+                self.dropped += 1
+                if not self.drop_oldest():
+                    break
+            elif self.policy == self.BLOCK:
+                self.condition.wait()
+            else:
+                return False
+
+        return True
+
+
+    def drop_oldest(self) -> bool:
+        '''
+        Drop the oldest queued frame, or chunked message, that is not being
+        written, while holding the lock. The chunk being written is kept too,
+        so a chunked message is either sent whole or not at all.
+        Returns False if there is none
+        '''
+        for index in range(self.inflight, len(self.frames)):
+            if self.frames[index] is not self.chunk:
+                self.nbytes -= len(self.frames[index])
+                del self.frames[index]
+                return True
+
+        if self.streams:
+            self.streams.popleft()
+            return True
+
+        return False
+
+
+    def release_chunk(self) -> None:
+        '''
+        Queue the next chunk of the current chunked message, or of the
+        next one, behind the frames already queued, while holding the lock
+        '''
+        if not self.chunks and self.streams:
+            self.chunks = deque(self.streams.popleft())
+
+        self.chunk = self.chunks.popleft() if self.chunks else None
+
+        if self.chunk is not None:
+            self.frames.append(self.chunk)
+            self.nbytes += len(self.chunk)
+
+        return
+
+
+    def pending(self) -> List[Union[bytes, memoryview]]:
+        '''
+        Snapshot of the frames waiting to be written, without removing them.
+        Only the current chunk of a chunked message is included. The frames
+        are handed to the writer, and kept until the next `consume`
+        '''
+        with self.condition:
+            self.inflight = len(self.frames)
+            return list(self.frames)
+
+
+    def backlog(self) -> List[Union[bytes, memoryview]]:
+        '''
+        Snapshot of the chunk frames not released yet, in the order
+        they will be written after the pending frames
+        '''
+        with self.condition:
+            return list(self.chunks) + [frame for frames in self.streams for frame in frames]
+
+
+    def wait_for_frames(self, window: float=0, min_bytes: int=0) -> List[Union[bytes, memoryview]]:
+        '''
+        Block until frames are available and return a snapshot of them.
+        Once the first frame arrives, keep collecting frames for up to
+        `window` seconds or until `min_bytes` are queued, so they can be
+        flushed together. Returns an empty list once the queue is closed and drained.
+        '''
+        with self.condition:
+            while not self.frames and not self.closed:
+                self.condition.wait()
+
+            deadline: float = time.monotonic() + window
+            while not self.closed and (min_bytes <= 0 or self.nbytes < min_bytes):
+                remaining: float = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+
+                self.condition.wait(remaining)
+
+            self.inflight = len(self.frames)
+            return list(self.frames)
+
+
+    def consume(self, count: int) -> None:
+        '''
+        Remove `count` written bytes from the front of the queue,
+        keeping the unwritten tail of a partially written frame.
+        The writer is done with its snapshot, only a partially written
+        frame is still being written
+        '''
+        with self.condition:
+            self.inflight = 0
+
+            while count > 0 and self.frames:
+                frame = self.frames[0]
+
+                if count < len(frame):
+                    self.frames[0] = memoryview(frame)[count:]
+                    self.nbytes -= count
+                    self.inflight = 1
+                    if frame is self.chunk:
+                        self.chunk = self.frames[0]
+                    break
+
+                count -= len(frame)
+                self.nbytes -= len(frame)
+                self.frames.popleft()
+
+                if frame is self.chunk:
+                    self.release_chunk()
+
+            self.condition.notify_all()
+
+        return
+
+
+    def close(self, discard: bool=False) -> None:
+        '''
+        Stop accepting frames and wake up every waiting reader and writer.
+        Frames already queued are still handed out unless `discard` is set.
+        '''
+        with self.condition:
+            self.closed = True
+            if discard:
+                self.frames.clear()
+                self.streams.clear()
+                self.chunks.clear()
+                self.chunk = None
+                self.nbytes = 0
+                self.inflight = 0
+
+            self.condition.notify_all()
+
+        if self.notify is not None:
+            self.notify()
+
+        return
@@ -0,0 +1,47 @@
+'''
+rate_limit.py :
+Contains the interface and implementation for the TokenBucket class
+'''
+# --- Libraries --- #
+import time
+import threading
+from typing import Optional
+
+# --- TokenBucket Class --- #
+class TokenBucket:
+    '''
+    TokenBucket class -
+    Allows `rate` events per second on average and bursts of up to
+    `burst` events. Tokens are refilled lazily when one is taken,
+    so an idle bucket costs nothing.
+    '''
+    def __init__(self, rate: float, burst: float) -> None:
+        '''
+        Initialization
+        '''
+        self.rate: float = rate
+        self.burst: float = max(burst, 1)
+        self.tokens: float = self.burst
+        self.updated: float = time.monotonic()
+        self.rejected: int = 0
+        self.lock: threading.Lock = threading.Lock()
+
+
+    def take(self, now: Optional[float]=None) -> bool:
+        '''
+        Take a token. Returns False, and counts a rejection,
+        if the bucket is empty
+        '''
+        now = time.monotonic() if now is None else now
+
+        with self.lock:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            if self.tokens < 1:
+                self.rejected += 1
+                return False
+
+            self.tokens -= 1
+
+        return True
@@ -0,0 +1,527 @@
+'''
+reactor_server.py :
+Contains the interface and implementation for the ReactorServer class
+'''
+# --- Libraries --- #
+import time
+import base64
+import socket
+import functools
+import selectors
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Sequence, Tuple, Union
+
+from .envelope import Envelope
+from .outbound_queue import OutboundQueue
+from .receive_buffer import ReceiveBuffer
+from .server import Server
+
+# --- ReactorServer Class --- #
+class ReactorServer(Server):
+    '''
+    ReactorServer class -
+    Multiplexes the listening socket and every client socket
+    in a single thread using the platform's best selector (epoll on Linux)
+    '''
+    BLOCKING_QUEUES: bool = False
+
+    def __init__(self, host: str=Server.HOST, port: int=Server.PORT) -> None:
+        '''
+        Initialization
+        '''
+        super().__init__(host, port)
+        self.selector: selectors.BaseSelector = selectors.DefaultSelector()
+        self.inbound: Dict[socket.socket, ReceiveBuffer] = {}
+        self.dirty: Dict[socket.socket, float] = {}
+        # Messages received from connections whose username is being claimed with the other workers or nodes
+        self.claiming: Dict[socket.socket, List[Envelope]] = {}
+        # Disconnected clients whose last queued frames are still being written
+        self.closing: Dict[socket.socket, OutboundQueue] = {}
+        self.callbacks: Deque[Tuple[Callable[..., Any], Tuple[Any, ...]]] = deque()
+        self.wakeup_reader, self.wakeup_writer = socket.socketpair()
+        self.adopted_listener: bool = False
+
+
+    def start_server(self) -> None:
+        '''
+        Starting the server to listen to incoming connections on the host machine
+        '''
+        self.server_socket.setblocking(False)
+        if not self.adopted_listener:
+            self.server_socket.bind(self.host_address)
+        self.server_socket.listen(self.BACKLOG)
+        self.selector.register(self.server_socket, selectors.EVENT_READ, self.accept_client_connection)
+
+        self.wakeup_reader.setblocking(False)
+        self.wakeup_writer.setblocking(False)
+        self.selector.register(self.wakeup_reader, selectors.EVENT_READ, self.handle_callbacks)
+
+        self.logger.info('START', 'Server listening at %s:%d', *self.host_address)
+        self.start_stats_listener()
+        self.start_heartbeats()
+
+        try:
+            while self.server_up:
+                for key, mask in self.selector.select(self.flush_timeout()):
+                    key.data(key.fileobj, mask)
+
+                self.flush_dirty_connections()
+        except KeyboardInterrupt:
+            self.server_up = False
+            self.logger.warning('WARNING', 'Server closed. KeyboardInterrupt exception detected')
+        finally:
+            self.selector.close()
+            self.server_socket.close()
+
+        return
+
+
+    def run_threadsafe(self, callback: Callable[..., Any], *args: Any) -> None:
+        '''
+        Schedule a callback from another thread on the reactor loop
+        '''
+        self.callbacks.append((callback, args))
+
+        try:
+            self.wakeup_writer.send(b'\0')
+        except (BlockingIOError, InterruptedError):
+            # The loop has not handled the previous wakeups yet
+            pass
+
+        return
+
+
+    def handle_callbacks(self, sock: socket.socket, mask: int) -> None:
+        '''
+        Run the callbacks scheduled from other threads
+        '''
+        try:
+            while sock.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+        while self.callbacks:
+            callback, args = self.callbacks.popleft()
+            callback(*args)
+
+        return
+
+
+    def accept_client_connection(self, sock: socket.socket, mask: int) -> None:
+        '''
+        Accepts an incoming client connection and registers it
+        with the selector for non-blocking reads
+        '''
+        # The listening socket belongs to the successor after a handoff
+        if not self.server_up:
+            return
+
+        try:
+            conn, addr = sock.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+
+        conn.setblocking(False)
+        self.limit_unsent_data(conn)
+
+        self.record_connection(conn, addr)
+        self.inbound[conn] = ReceiveBuffer(self)
+        self.outbound[conn] = OutboundQueue(self.OUTBOUND_QUEUE_SIZE, self.queue_policy)
+        self.selector.register(conn, selectors.EVENT_READ, self.handle_client)
+
+        return
+
+
+    def handle_client(self, conn: socket.socket, mask: int) -> None:
+        '''
+        Handles a readiness event for a single client connection
+        '''
+        if conn not in self.registry:
+            return
+
+        if mask & selectors.EVENT_WRITE:
+            self.flush_messages(conn)
+
+        if not mask & selectors.EVENT_READ:
+            return
+
+        buffer: ReceiveBuffer = self.inbound[conn]
+
+        try:
+            buffer.fill(conn)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            self.logger.warning('WARNING', '%s encoutered by %s:%d - %s', type(e).__name__, *self.registry.address(conn), e)
+            self.disconnect_client(conn, lost=True)
+            return
+
+        self.touch(conn)
+        self.handle_buffered_messages(conn)
+        return
+
+
+    def handle_buffered_messages(self, conn: socket.socket) -> None:
+        '''
+        Process every complete message in the connection's receive buffer.
+        A client whose message cannot be handled is disconnected, after
+        the messages it sent before it, the other clients sharing the
+        loop are not affected
+        '''
+        while conn in self.inbound:
+            try:
+                messages: List[Envelope] = self.inbound[conn].envelopes()
+            except ValueError as e:
+                self.logger.warning('WARNING', 'Malformed message from %s:%d - %s', *self.registry.address(conn), e)
+                self.disconnect_client(conn)
+                return
+
+            if not messages:
+                return
+
+            self.handle_messages(conn, messages)
+
+        return
+
+
+    def handle_messages(self, conn: socket.socket, messages: List[Envelope]) -> None:
+        '''
+        Process decoded messages of a connection in order. Messages that
+        arrive while its username is being claimed wait for the claim
+        '''
+        for msg in messages:
+            if conn not in self.registry:
+                break
+
+            if conn in self.claiming:
+                self.claiming[conn].append(msg)
+                continue
+
+            try:
+                self.handle_client_message(conn, msg)
+            except Exception as e:
+                self.logger.error('ERROR', 'Unknown error occured while handling a message from %s:%d - %s', *self.registry.address(conn), e)
+                self.disconnect_client(conn)
+                break
+
+        return
+
+
+    def handle_client_message(self, conn: socket.socket, msg: Envelope) -> None:
+        '''
+        Process a single decoded message, either as part of the
+        username handshake or as a chat message
+        '''
+        name: str = self.registry.username(conn)
+
+        if name is None:
+            reply: Union[Envelope, None] = self.answer_username(conn, msg, functools.partial(self.complete_handshake, conn))
+
+            # The loop keeps serving the other clients while the other workers or nodes answer the claim
+            if reply is None:
+                self.claiming[conn] = []
+            else:
+                self.complete_handshake(conn, reply)
+
+            return
+
+        if msg.kind == Envelope.QUIT:
+            self.disconnect_client(conn)
+            return
+
+        self.process_message(conn, name, msg)
+        return
+
+
+    def complete_handshake(self, conn: socket.socket, reply: Envelope) -> None:
+        '''
+        Send the reply to a username request and register the client once
+        its username is accepted. The messages received while the username
+        was being claimed are processed next
+        '''
+        deferred: List[Envelope] = self.claiming.pop(conn, [])
+
+        # The connection was closed while its username was being claimed
+        if conn not in self.registry:
+            if reply.kind == Envelope.LOGIN:
+                self.release_username(reply.text)
+            return
+
+        self.send_envelope(conn, reply)
+
+        if reply.kind == Envelope.QUIT:
+            self.disconnect_client(conn)
+        elif reply.kind == Envelope.LOGIN:
+            self.register_client(conn, reply.text)
+
+        self.handle_messages(conn, deferred)
+        return
+
+
+    def disconnect_client(self, conn: socket.socket, lost: bool=False) -> None:
+        '''
+        Unregister and close a client connection. The session
+        of a client whose connection was lost is suspended.
+        Frames still queued, like the reply to a rejected username,
+        are written before the connection is closed
+        '''
+        if conn not in self.registry:
+            return
+
+        self.logger.info('INFO', '%s:%d disconnecting...', *self.registry.address(conn))
+
+        queue: OutboundQueue = self.outbound[conn]
+        del self.inbound[conn]
+        self.dirty.pop(conn, None)
+        self.claiming.pop(conn, None)
+        self.close_outbound_queue(conn)
+        self.unregister_client(conn, self.registry.username(conn), lost)
+
+        if lost:
+            queue.close(discard=True)
+
+        self.closing[conn] = queue
+        self.selector.modify(conn, selectors.EVENT_WRITE, self.finish_closing)
+        self.finish_closing(conn, selectors.EVENT_WRITE)
+        return
+
+
+    def finish_closing(self, conn: socket.socket, mask: int) -> None:
+        '''
+        Write the frames left in the queue of a disconnected client,
+        and close the connection once they are written or it fails
+        '''
+        queue: OutboundQueue = self.closing[conn]
+        frames: List[Union[bytes, memoryview]] = queue.pending()
+
+        try:
+            queue.consume(self.send_frames(conn, frames) if frames else 0)
+        except (BlockingIOError, InterruptedError):
+            queue.consume(0)
+        except OSError:
+            queue.close(discard=True)
+
+        if len(queue):
+            return
+
+        del self.closing[conn]
+        self.selector.unregister(conn)
+        conn.close()
+        return
+
+
+    def transferable_clients(self) -> List[socket.socket]:
+        '''
+        Connections that can be handed over to another process,
+        leaving out those already being closed
+        '''
+        return [conn for conn in self.inbound if not self.outbound[conn].closed]
+
+
+    def export_client(self, conn: socket.socket) -> Dict[str, Any]:
+        '''
+        Everything another process needs to take over a connection:
+        its address, username, room and session token, the data received
+        but not yet handled, including the chunks of a message being
+        received, and the data queued but not yet written
+        '''
+        return {
+            'address': self.registry.address(conn),
+            'name': self.registry.username(conn),
+            'room': self.client_rooms.get(conn),
+            'token': self.sessions.token(conn),
+            'inbound': base64.b64encode(self.inbound[conn].unparsed()).decode('ascii'),
+            'outbound': base64.b64encode(b''.join(self.outbound[conn].pending() + self.outbound[conn].backlog())).decode('ascii'),
+            'chunks': {'parts': self.inbound[conn].assembler.parts, 'size': self.inbound[conn].assembler.size},
+        }
+
+
+    def adopt(self, state: Dict[str, Any]) -> None:
+        '''
+        Take over the listening socket, history, suspended sessions
+        and connections handed over by a previous server process
+        '''
+        self.server_socket.close()
+        self.server_socket = state['listener']
+        self.host_address = self.server_socket.getsockname()[:2]
+        self.adopted_listener = True
+
+        if state['history'] is not None and self.history.log is None:
+            self.history.restore(state['history'])
+
+        # Suspended sessions keep their usernames claimed
+        if state['sessions'] is not None:
+            for name in self.sessions.restore(state['sessions']):
+                self.registry.claim(name)
+
+        for conn, client in state['clients']:
+            self.adopt_client(conn, client)
+
+        # Messages that arrived complete are handled once the loop starts
+        self.run_threadsafe(self.handle_adopted_messages)
+        self.logger.info('HANDOFF', 'Took over %d connections', len(state['clients']))
+        return
+
+
+    def adopt_client(self, conn: socket.socket, client: Dict[str, Any]) -> None:
+        '''
+        Serve a connection handed over by a previous server process,
+        without the client noticing
+        '''
+        conn.setblocking(False)
+        self.record_connection(conn, tuple(client['address']))
+
+        self.inbound[conn] = ReceiveBuffer(self)
+        self.inbound[conn].feed(base64.b64decode(client['inbound']))
+        self.inbound[conn].assembler.parts = client['chunks']['parts']
+        self.inbound[conn].assembler.size = client['chunks']['size']
+        self.outbound[conn] = OutboundQueue(self.OUTBOUND_QUEUE_SIZE, self.queue_policy)
+        self.selector.register(conn, selectors.EVENT_READ, self.handle_client)
+
+        outbound: bytes = base64.b64decode(client['outbound'])
+        if outbound:
+            self.send_frame(conn, outbound)
+
+        if client['name'] is not None:
+            self.accepted.pop(conn, None)
+            self.registry.claim(client['name'])
+            self.add_client(conn, client['name'])
+
+            if client['token'] is not None:
+                self.sessions.issue(conn, client['name'], client['token'])
+
+            if client['room'] is not None:
+                with self.rooms_lock:
+                    self.rooms.setdefault(client['room'], set()).add(conn)
+                    self.client_rooms[conn] = client['room']
+
+        return
+
+
+    def handle_adopted_messages(self) -> None:
+        '''
+        Process the complete messages handed over with the adopted connections
+        '''
+        for conn in list(self.inbound):
+            if conn in self.inbound:
+                self.handle_buffered_messages(conn)
+
+        return
+
+
+    def detach_clients(self) -> None:
+        '''
+        Let go of every connection after handing them over to another
+        process, without closing them, and stop the server
+        '''
+        self.server_up = False
+        self.selector.unregister(self.server_socket)
+
+        for conn in list(self.inbound):
+            self.selector.unregister(conn)
+            del self.inbound[conn]
+            self.outbound.pop(conn, None)
+            self.dirty.pop(conn, None)
+            self.registry.remove(conn)
+            self.last_seen.pop(conn, None)
+            self.timers.cancel(conn)
+
+        if self.stats_listener is not None:
+            self.stats_listener.close()
+
+        return
+
+
+    def send_message(self, conn: socket.socket, message: str) -> None:
+        '''
+        Queue an encoded message on the connection's outgoing buffer
+        and write as much of it as the socket accepts
+        '''
+        self.send_frame(conn, self.encode_message(message))
+        return
+
+
+    def send_frame(self, conn: socket.socket, frame: Union[bytes, memoryview]) -> None:
+        '''
+        Queue an already encoded frame on the connection's outbound queue.
+        The connection is flushed once the current batch of events is handled.
+        '''
+        super().send_frame(conn, frame)
+
+        if conn in self.outbound:
+            self.dirty.setdefault(conn, time.monotonic())
+
+        return
+
+
+    def send_chunks(self, conn: socket.socket, frames: Sequence[Union[bytes, memoryview]]) -> None:
+        '''
+        Queue the chunk frames of a large message on the connection's
+        outbound queue. Every flush writes at most one of them, so the
+        connections sharing the loop take turns
+        '''
+        super().send_chunks(conn, frames)
+
+        if conn in self.outbound:
+            self.dirty.setdefault(conn, time.monotonic())
+
+        return
+
+
+    def flush_timeout(self) -> Union[float, None]:
+        '''
+        Time the selector may wait before the oldest flush window expires
+        '''
+        if not self.dirty:
+            return None
+
+        return max(0, min(self.dirty.values()) + self.FLUSH_WINDOW_US / 1e6 - time.monotonic())
+
+
+    def flush_dirty_connections(self) -> None:
+        '''
+        Flush every connection whose flush window expired
+        or whose queued data reached the byte threshold
+        '''
+        now: float = time.monotonic()
+        window: float = self.FLUSH_WINDOW_US / 1e6
+
+        for conn, since in list(self.dirty.items()):
+            queue: OutboundQueue = self.outbound.get(conn)
+
+            if queue is None:
+                del self.dirty[conn]
+            elif now - since >= window or (self.FLUSH_WINDOW_BYTES > 0 and queue.nbytes >= self.FLUSH_WINDOW_BYTES):
+                del self.dirty[conn]
+                self.flush_messages(conn)
+
+        return
+
+
+    def flush_messages(self, conn: socket.socket) -> None:
+        '''
+        Write pending outgoing frames with a single non-blocking
+        scatter-gather call and only watch the socket for writability
+        while data remains
+        '''
+        queue: OutboundQueue = self.outbound[conn]
+        frames = queue.pending()
+        sent: int = 0
+
+        try:
+            sent = self.send_frames(conn, frames) if frames else 0
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError:
+            # The read side reports the broken connection and disconnects it
+            queue.close(discard=True)
+
+        queue.consume(sent)
+        self.metrics.increment('bytes_out', sent)
+
+        events: int = selectors.EVENT_READ | (selectors.EVENT_WRITE if len(queue) else 0)
+        if self.selector.get_key(conn).events != events:
+            self.selector.modify(conn, events, self.handle_client)
+
+        return
@@ -0,0 +1,180 @@
+'''
+receive_buffer.py :
+Contains the interface and implementation for the ReceiveBuffer class
+'''
+# --- Libraries --- #
+import socket
+from typing import Callable, List, Optional, TypeVar
+
+from .base_socket import BaseSocket
+from .envelope import Envelope, EnvelopeAssembler
+
+T = TypeVar('T')
+
+# --- ReceiveBuffer Class --- #
+class ReceiveBuffer:
+    '''
+    ReceiveBuffer class -
+    Preallocated per-connection buffer filled with `recv_into`.
+    Frames are parsed in place, and every complete frame
+    of a single read is decoded at once. The chunks of
+    large typed messages are reassembled as they arrive
+    '''
+    def __init__(self, framing: BaseSocket, size: int=BaseSocket.RECV_BUFFER_SIZE) -> None:
+        '''
+        Initialization
+        '''
+        self.framing: BaseSocket = framing
+        self.buffer: bytearray = bytearray(size)
+        self.view: memoryview = memoryview(self.buffer)
+        self.start: int = 0
+        self.end: int = 0
+        self.assembler: EnvelopeAssembler = EnvelopeAssembler(framing.MAX_MESSAGE_SIZE)
+        self.error: Optional[ValueError] = None
+
+
+    def fill(self, conn: socket.socket) -> int:
+        '''
+        Read as much data as the socket has available into the free
+        space of the buffer. Raises ConnectionResetError when the peer
+        closed the connection.
+        '''
+        if self.end == len(self.buffer):
+            self.make_room(1)
+
+        count: int = conn.recv_into(self.view[self.end:])
+        if count == 0:
+            raise ConnectionResetError('Connection closed by peer')
+
+        self.end += count
+        return count
+
+
+    def feed(self, data: bytes) -> None:
+        '''
+        Append data that was read elsewhere to the buffer
+        '''
+        self.make_room(len(data))
+        self.view[self.end:self.end + len(data)] = data
+        self.end += len(data)
+        return
+
+
+    def unparsed(self) -> bytes:
+        '''
+        Data received but not yet consumed as complete frames
+        '''
+        return bytes(self.view[self.start:self.end])
+
+
+    def make_room(self, needed: int) -> None:
+        '''
+        Move the unparsed data to the front of the buffer and
+        grow the buffer if `needed` more bytes still do not fit
+        '''
+        length: int = self.end - self.start
+
+        if length + needed > len(self.buffer):
+            buffer: bytearray = bytearray(max(2 * len(self.buffer), length + needed))
+            buffer[:length] = self.view[self.start:self.end]
+
+            self.view.release()
+            self.buffer = buffer
+            self.view = memoryview(self.buffer)
+        elif self.start > 0:
+            self.view[:length] = self.view[self.start:self.end]
+
+        self.start = 0
+        self.end = length
+        return
+
+
+    def frames(self, decode: Callable[[memoryview], T], limit: int=0) -> List[T]:
+        '''
+        Decode and consume every complete frame currently buffered.
+        Payloads are decoded in place, before the buffer is compacted.
+        Raises ValueError on a frame larger than `limit` bytes, if set,
+        before buffering it, or on a frame `decode` rejects. The frames
+        decoded before a bad frame are returned first, and the error
+        is raised by the next call
+        '''
+        if self.error is not None:
+            error: ValueError = self.error
+            self.error = None
+            raise error
+
+        messages: List[T] = []
+        header_size: int = self.framing.header_size
+
+        while self.end - self.start >= header_size:
+            message_length: int = self.framing.decode_header(self.view[self.start:self.start + header_size])
+            frame_end: int = self.start + header_size + message_length
+
+            if 0 < limit < message_length:
+                # The header stays buffered, the next call raises again
+                if messages:
+                    break
+                raise ValueError('Frame of %d bytes exceeds the maximum message size' % message_length)
+
+            if frame_end > self.end:
+                # Make sure the rest of the frame fits in the buffer
+                if frame_end - self.start > len(self.buffer):
+                    self.make_room(frame_end - self.end)
+                break
+
+            payload: memoryview = self.view[self.start + header_size:frame_end]
+            self.start = frame_end
+            try:
+                messages.append(decode(payload))
+            except ValueError as e:
+                if not messages:
+                    raise
+                self.error = e
+                break
+
+        if self.start == self.end:
+            self.start = self.end = 0
+
+        return messages
+
+
+    def messages(self) -> List[str]:
+        '''
+        Decode and consume every complete frame currently buffered as text
+        '''
+        return self.frames(lambda payload: str(payload, self.framing.FORMAT))
+
+
+    def envelopes(self) -> List[Envelope]:
+        '''
+        Decode and consume every complete frame currently buffered as a typed
+        message. Chunks are held until the last part of their message arrives.
+        Raises ValueError on a malformed frame, which is consumed, or on
+        a frame larger than the maximum message size, once the messages
+        buffered before it were returned
+        '''
+        messages: List[Envelope] = self.frames(self.framing.decode_envelope, self.framing.max_frame_size)
+
+        return [message for message in map(self.assembler.add, messages) if message is not None]
+
+
+    def receive(self, conn: socket.socket) -> List[str]:
+        '''
+        Block until at least one complete frame is available
+        and return every buffered message
+        '''
+        while not (messages := self.messages()):
+            self.fill(conn)
+
+        return messages
+
+
+    def receive_envelopes(self, conn: socket.socket) -> List[Envelope]:
+        '''
+        Block until at least one complete frame is available
+        and return every buffered typed message
+        '''
+        while not (messages := self.envelopes()):
+            self.fill(conn)
+
+        return messages
@@ -0,0 +1,159 @@
+'''
+registry.py :
+Contains the interface and implementation for the ConnectionRegistry class
+'''
+# --- Libraries --- #
+import socket
+import threading
+from typing import Dict, Optional, Tuple
+
+# --- ConnectionRegistry Class --- #
+class ConnectionRegistry:
+    '''
+    ConnectionRegistry class -
+    Thread-safe mapping between connections, their addresses and
+    their usernames, in both directions. Every lookup is a single
+    dictionary access. Fan-out iterates over an immutable snapshot of the
+    registered clients, rebuilt once after the membership changed, so
+    clients may join and leave while a broadcast is running.
+    '''
+    def __init__(self) -> None:
+        '''
+        Initialization
+        '''
+        self.lock: threading.Lock = threading.Lock()
+        self.addresses: Dict[socket.socket, Tuple[str, int]] = {}
+        self.usernames: Dict[socket.socket, str] = {}
+        # Claimed usernames, mapped to None until their client is registered
+        self.connections: Dict[str, Optional[socket.socket]] = {}
+        self.clients: Optional[Tuple[socket.socket, ...]] = ()
+
+
+    def __len__(self) -> int:
+        '''
+        Number of open connections, including those still in the username handshake
+        '''
+        return len(self.addresses)
+
+
+    def __contains__(self, conn: socket.socket) -> bool:
+        '''
+        Whether the connection is open
+        '''
+        return conn in self.addresses
+
+
+    def add(self, conn: socket.socket, address: Tuple[str, int]) -> None:
+        '''
+        Record a newly accepted connection
+        '''
+        with self.lock:
+            self.addresses[conn] = address
+
+        return
+
+
+    def claim(self, name: str) -> bool:
+        '''
+        Reserve a username. Returns False if it is already claimed
+        '''
+        with self.lock:
+            if name in self.connections:
+                return False
+
+            self.connections[name] = None
+
+        return True
+
+
+    def release(self, name: str) -> None:
+        '''
+        Make a claimed username available again
+        '''
+        with self.lock:
+            conn: Optional[socket.socket] = self.connections.pop(name, None)
+
+            if conn is not None and self.usernames.get(conn) == name:
+                del self.usernames[conn]
+                self.clients = None
+
+        return
+
+
+    def register(self, conn: socket.socket, name: str) -> None:
+        '''
+        Bind a claimed username to the connection that completed the handshake
+        '''
+        with self.lock:
+            self.usernames[conn] = name
+            self.connections[name] = conn
+            self.clients = None
+
+        return
+
+
+    def detach(self, conn: socket.socket) -> Optional[str]:
+        '''
+        Unbind the username of a connection, which stays claimed, and return it
+        '''
+        with self.lock:
+            name: Optional[str] = self.usernames.pop(conn, None)
+
+            if name is not None:
+                if self.connections.get(name) is conn:
+                    self.connections[name] = None
+                self.clients = None
+
+        return name
+
+
+    def remove(self, conn: socket.socket) -> Optional[str]:
+        '''
+        Forget a connection and release its username, which is returned
+        '''
+        with self.lock:
+            self.addresses.pop(conn, None)
+            name: Optional[str] = self.usernames.pop(conn, None)
+
+            if name is not None:
+                del self.connections[name]
+                self.clients = None
+
+        return name
+
+
+    def address(self, conn: socket.socket) -> Optional[Tuple[str, int]]:
+        '''
+        Address of a connection
+        '''
+        return self.addresses.get(conn)
+
+
+    def username(self, conn: socket.socket) -> Optional[str]:
+        '''
+        Username of a registered connection
+        '''
+        return self.usernames.get(conn)
+
+
+    def connection(self, name: str) -> Optional[socket.socket]:
+        '''
+        Connection of a registered username
+        '''
+        return self.connections.get(name)
+
+
+    def snapshot(self) -> Tuple[socket.socket, ...]:
+        '''
+        Immutable tuple of the registered connections. The same tuple
+        is shared by every caller until the membership changes.
+        '''
+        clients: Optional[Tuple[socket.socket, ...]] = self.clients
+
+        if clients is None:
+            with self.lock:
+                if self.clients is None:
+                    self.clients = tuple(self.usernames)
+                clients = self.clients
+
+        return clients
@@ -0,0 +1,85 @@
+'''
+renderer.py :
+Contains the interface and implementation for the ChatRenderer class
+'''
+# --- Libraries --- #
+import curses
+from typing import List, Optional, Sequence, Tuple
+
+# --- ChatRenderer Class --- #
+class ChatRenderer:
+    '''
+    ChatRenderer class -
+    Draws the chat lines on a curses pad and the room and input bars
+    below it. Remembers what is on the screen and only redraws the rows
+    that changed, so an unchanged screen costs no terminal output.
+    '''
+    def __init__(self, stdscr: curses.window, rows: int) -> None:
+        '''
+        Initialization
+        '''
+        self.stdscr: curses.window = stdscr
+        self.rows: int = rows
+        self.width: int = stdscr.getmaxyx()[1]
+
+        # One spare row so the last visible row can be written up to its last column
+        self.pad: curses.window = curses.newpad(rows + 1, self.width)
+        self.shown: List[Optional[Tuple[str, int]]] = [None] * rows
+        self.room: Optional[str] = None
+        self.input: Optional[str] = None
+
+        stdscr.clear()
+        stdscr.refresh()
+
+
+    def render(self, lines: Sequence[Tuple[str, int]], start: int, room: str, current_text: List[str]) -> None:
+        '''
+        Show `lines` from the `start` row onwards, the current room and
+        the input bar, redrawing only what differs from the last render
+        '''
+        changed: bool = False
+        visible: List[Tuple[str, int]] = lines[start:start + self.rows]
+
+        for row in range(self.rows):
+            line: Optional[Tuple[str, int]] = visible[row] if row < len(visible) else None
+
+            if line != self.shown[row]:
+                self.pad.move(row, 0)
+                self.pad.clrtoeol()
+                if line is not None:
+                    try:
+                        self.pad.addstr(row, 0, *line)
+                    except curses.error:
+                        # Wide characters may not fit the row, the rest is clipped
+                        pass
+
+                self.shown[row] = line
+                changed = True
+
+        if changed:
+            self.pad.noutrefresh(0, 0, 0, 0, self.rows - 1, self.width - 1)
+
+        if room != self.room:
+            self.stdscr.move(self.rows + 1, 0)
+            self.stdscr.clrtoeol()
+            self.stdscr.addstr(self.rows + 1, 0, 'Room: #%s' % room, curses.A_BOLD)
+            self.room = room
+            self.input = None
+
+        text: str = ''.join(current_text)
+        if text != self.input:
+            # Keep the end of long input visible
+            visible_text: str = text[-(self.width - len('<You>: ') - 1):] if text else ''
+
+            self.stdscr.move(self.rows + 2, 0)
+            self.stdscr.clrtoeol()
+            self.stdscr.addstr(self.rows + 2, 0, '<You>: ' + visible_text)
+            self.input = text
+            changed = True
+
+        if changed:
+            # Refreshed last so the cursor stays on the input bar
+            self.stdscr.noutrefresh()
+            curses.doupdate()
+
+        return
@@ -0,0 +1,205 @@
+'''
+scrollback.py :
+Contains the interface and implementation for the RowLog
+and Scrollback classes
+'''
+# --- Libraries --- #
+import struct
+import tempfile
+from collections import OrderedDict, deque
+from typing import BinaryIO, Deque, List, Tuple, Union
+
+# --- RowLog Class --- #
+class RowLog:
+    '''
+    RowLog class -
+    Append-only list of encoded rows kept in a temporary file, with an
+    on-disk offset index. Rows are read back lazily, a page at a time,
+    and only the most recently used pages are kept in memory.
+    '''
+    INDEX_ENTRY: struct.Struct = struct.Struct('!Q')
+    PAGE_ROWS: int = 64
+    CACHED_PAGES: int = 8
+
+    def __init__(self) -> None:
+        '''
+        Initialization
+        '''
+        self.data: BinaryIO = tempfile.TemporaryFile()
+        self.index: BinaryIO = tempfile.TemporaryFile()
+        self.pages: 'OrderedDict[int, List[bytes]]' = OrderedDict()
+        self.count: int = 0
+        self.size: int = 0
+
+
+    def __len__(self) -> int:
+        '''
+        Number of rows in the log
+        '''
+        return self.count
+
+
+    def append(self, record: bytes) -> None:
+        '''
+        Add an encoded row at the end of the log
+        '''
+        self.data.seek(self.size)
+        self.data.write(record)
+        self.index.seek(self.count * self.INDEX_ENTRY.size)
+        self.index.write(self.INDEX_ENTRY.pack(self.size))
+
+        # The last page may be cached without this row
+        self.pages.pop(self.count // self.PAGE_ROWS, None)
+
+        self.size += len(record)
+        self.count += 1
+        return
+
+
+    def get(self, position: int) -> bytes:
+        '''
+        Encoded row at the given position
+        '''
+        number: int = position // self.PAGE_ROWS
+        page: Union[List[bytes], None] = self.pages.get(number)
+
+        if page is None:
+            page = self.pages[number] = self.load_page(number)
+            if len(self.pages) > self.CACHED_PAGES:
+                self.pages.popitem(last=False)
+        else:
+            self.pages.move_to_end(number)
+
+        return page[position % self.PAGE_ROWS]
+
+
+    def load_page(self, number: int) -> List[bytes]:
+        '''
+        Read every row of a page with one index read and one data read
+        '''
+        first: int = number * self.PAGE_ROWS
+        last: int = min(first + self.PAGE_ROWS, self.count)
+
+        self.data.flush()
+        self.index.flush()
+        self.index.seek(first * self.INDEX_ENTRY.size)
+        # The offset of the next page's first row ends this page's last row
+        raw: bytes = self.index.read((last - first + 1) * self.INDEX_ENTRY.size)
+        offsets: List[int] = [offset for offset, in self.INDEX_ENTRY.iter_unpack(raw)][:last - first + 1]
+        if len(offsets) == last - first:
+            offsets.append(self.size)
+
+        self.data.seek(offsets[0])
+        chunk: bytes = self.data.read(offsets[-1] - offsets[0])
+
+        return [chunk[start - offsets[0]:end - offsets[0]] for start, end in zip(offsets, offsets[1:])]
+
+
+    def clear(self) -> None:
+        '''
+        Remove every row
+        '''
+        self.data.truncate(0)
+        self.index.truncate(0)
+        self.pages.clear()
+        self.count = self.size = 0
+        return
+
+
+# --- Scrollback Class --- #
+class Scrollback:
+    '''
+    Scrollback class -
+    Chat rows of the client. Only the newest `window` rows are kept in
+    memory, as encoded bytes. Older rows are spilled to a RowLog, and rows
+    prepended from older history pages go to a second RowLog, so memory
+    stays flat however long the session runs.
+    '''
+    COLOR: struct.Struct = struct.Struct('!I')
+
+    def __init__(self, window: int) -> None:
+        '''
+        Initialization
+        '''
+        self.window: int = window
+        self.recent: Deque[bytes] = deque()
+        self.spilled: RowLog = RowLog()
+        self.prepended: RowLog = RowLog()
+
+
+    def __len__(self) -> int:
+        '''
+        Number of rows in the scrollback
+        '''
+        return len(self.prepended) + len(self.spilled) + len(self.recent)
+
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Tuple[str, int], List[Tuple[str, int]]]:
+        '''
+        Row, or list of rows, at the given position
+        '''
+        if isinstance(index, slice):
+            return [self.row(position) for position in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Scrollback index out of range')
+
+        return self.row(index)
+
+
+    def row(self, position: int) -> Tuple[str, int]:
+        '''
+        Decode the row at a valid position
+        '''
+        if position < len(self.prepended):
+            # Prepended rows are stored newest first
+            record: bytes = self.prepended.get(len(self.prepended) - 1 - position)
+        elif position < len(self.prepended) + len(self.spilled):
+            record: bytes = self.spilled.get(position - len(self.prepended))
+        else:
+            record: bytes = self.recent[position - len(self.prepended) - len(self.spilled)]
+
+        return str(record[self.COLOR.size:], 'utf-8'), self.COLOR.unpack_from(record)[0]
+
+
+    def encode(self, row: Tuple[str, int]) -> bytes:
+        '''
+        Compact encoding of a row: its color followed by its UTF-8 text
+        '''
+        text, color = row
+        return self.COLOR.pack(color) + text.encode('utf-8')
+
+
+    def extend(self, rows: List[Tuple[str, int]]) -> None:
+        '''
+        Append rows, spilling the oldest in-memory rows to disk
+        '''
+        for row in rows:
+            self.recent.append(self.encode(row))
+
+            if len(self.recent) > self.window:
+                self.spilled.append(self.recent.popleft())
+
+        return
+
+
+    def prepend(self, rows: List[Tuple[str, int]]) -> None:
+        '''
+        Insert rows, in order, before every other row
+        '''
+        for row in reversed(rows):
+            self.prepended.append(self.encode(row))
+
+        return
+
+
+    def clear(self) -> None:
+        '''
+        Remove every row
+        '''
+        self.recent.clear()
+        self.spilled.clear()
+        self.prepended.clear()
+        return
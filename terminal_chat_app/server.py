@@ -3,11 +3,27 @@ server.py :
 Contains the interface and implementation for the Server class
 '''
 # --- Libraries --- #
+import time
 import socket
+import functools
 import threading
-from typing import Dict, Set, Tuple, Union
+from queue import SimpleQueue
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
 
 from .base_socket import BaseSocket
+from .envelope import Envelope
+from .history import MessageHistory
+from .logger import AsyncLogger
+from .metrics import Metrics, StatsListener
+from .outbound_queue import OutboundQueue
+from .rate_limit import TokenBucket
+from .receive_buffer import ReceiveBuffer
+from .registry import ConnectionRegistry
+from .sessions import SessionStore
+from .timer_wheel import TimerWheel
+
+if TYPE_CHECKING:
+    from .cluster import ClusterBus
 
 # --- Server Class --- #
 class Server(BaseSocket):
@@ -15,16 +31,49 @@ class Server(BaseSocket):
     Server class -
     Provides a wrapper for the server socket
     '''
+    BLOCKING_QUEUES: bool = True
+    TIMER_TICK: float = 1.0
+    # Types of the messages registered clients send, which count against their rate limit
+    CLIENT_MESSAGES: Set[int] = {Envelope.CHAT, Envelope.JOIN, Envelope.LEAVE, Envelope.DIRECT, Envelope.HISTORY}
+
     def __init__(self, host: str=BaseSocket.HOST, port: int=BaseSocket.PORT) -> None:
         '''
         Initialization
         '''
         self.server_socket: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.host_address: Tuple[str, int] = (host, port)
-        self.addresses: Dict[socket.socket, str] = {}
-        self.existing_usernames: Set[str] = set()
+        self.logger: AsyncLogger = AsyncLogger(self.LOG_LEVEL)
+        self.metrics: Metrics = Metrics()
+        self.registry: ConnectionRegistry = ConnectionRegistry()
+        self.accepted: Dict[socket.socket, float] = {}
+        self.last_seen: Dict[socket.socket, float] = {}
+        self.timers: TimerWheel = TimerWheel(self.TIMER_TICK)
+        self.buckets: Dict[socket.socket, TokenBucket] = {}
+        self.throttled: Set[socket.socket] = set()
+        # Connections dropped for flooding or overflowing their outbound queue, whose sessions are not kept
+        self.expelled: Set[socket.socket] = set()
+        self.sessions: SessionStore = SessionStore(self.SESSION_TIMEOUT, self.TIMER_TICK)
+        self.resuming: Dict[socket.socket, Tuple[Optional[str], int]] = {}
+        self.global_bucket: Optional[TokenBucket] = None
+        self.stats_listener: Optional[StatsListener] = None
+        self.outbound: Dict[socket.socket, OutboundQueue] = {}
+        self.rooms: Dict[str, Set[socket.socket]] = {}
+        self.client_rooms: Dict[socket.socket, str] = {}
+        self.rooms_lock: threading.Lock = threading.Lock()
+        self.history: MessageHistory = MessageHistory(self.HISTORY_SIZE, self.HISTORY_DIR, self.HISTORY_SEGMENT_SIZE)
+        self.evictions: int = 0
+        self.dropped_frames: int = 0
+        self.bus: Optional['ClusterBus'] = None
         self.server_up: bool = True
 
+        self.queue_policy: str = self.OUTBOUND_QUEUE_POLICY
+        if self.queue_policy == OutboundQueue.BLOCK and not self.BLOCKING_QUEUES:
+            self.logger.warning('WARNING', '%s cannot block on a full outbound queue, using the disconnect policy', type(self).__name__)
+            self.queue_policy = OutboundQueue.DISCONNECT
+
+        if self.GLOBAL_RATE_LIMIT > 0:
+            self.global_bucket = TokenBucket(self.GLOBAL_RATE_LIMIT, self.GLOBAL_RATE_BURST or self.GLOBAL_RATE_LIMIT)
+
         self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 
     def start_server(self) -> None:
@@ -35,10 +84,146 @@ class Server(BaseSocket):
         self.server_socket.bind(self.host_address)
         self.server_socket.listen()
 
-        print('[START] Server listening at %s:%d' % self.host_address)
+        self.logger.info('START', 'Server listening at %s:%d', *self.host_address)
+        self.start_stats_listener()
+        self.start_heartbeats()
         self.accept_client_connection()
 
 
+    def start_stats_listener(self) -> None:
+        '''
+        Serve the server statistics on the stats port, if one is configured
+        '''
+        if self.STATS_PORT:
+            self.stats_listener = StatsListener(self.STATS_HOST, self.STATS_PORT, self.stats)
+            self.stats_listener.start()
+            self.logger.info('START', 'Statistics available at %s:%d', self.STATS_HOST, self.STATS_PORT)
+
+        return
+
+
+    def start_heartbeats(self) -> None:
+        '''
+        Start checking the connections for inactivity and the suspended
+        sessions for expiry on every timer tick, unless both are disabled
+        '''
+        if self.IDLE_TIMEOUT > 0 or self.sessions.enabled:
+            threading.Thread(target=self.run_heartbeats, daemon=True).start()
+
+        return
+
+
+    def run_heartbeats(self) -> None:
+        '''
+        Advance the timer wheels on every tick, on the thread serving the clients
+        '''
+        while self.server_up:
+            time.sleep(self.TIMER_TICK)
+            self.run_threadsafe(self.check_timers)
+
+        return
+
+
+    def check_timers(self) -> None:
+        '''
+        Handle the connection timers and the session timers that expired
+        '''
+        self.check_heartbeats()
+        self.expire_sessions()
+        return
+
+
+    def check_heartbeats(self) -> None:
+        '''
+        Check every connection whose timer expired. Registered clients
+        silent for HEARTBEAT_INTERVAL are pinged, and connections silent for
+        IDLE_TIMEOUT are reaped. Otherwise the timer is set again for the
+        next time the connection could reach one of those limits.
+        '''
+        now: float = time.monotonic()
+
+        for conn in self.timers.advance(now):
+            last_seen: Union[float, None] = self.last_seen.get(conn)
+            if last_seen is None:
+                continue
+
+            idle: float = now - last_seen
+            if idle >= self.IDLE_TIMEOUT:
+                if self.drop_connection(conn, 'idle for %d seconds' % self.IDLE_TIMEOUT):
+                    self.metrics.increment('idle_reaped')
+                continue
+
+            if idle >= self.heartbeat_delay:
+                # Only registered clients answer pings
+                if self.registry.username(conn) is not None:
+                    self.send_envelope(conn, Envelope(Envelope.PING))
+                    self.metrics.increment('pings_sent')
+                deadline: float = last_seen + self.IDLE_TIMEOUT
+            else:
+                deadline: float = last_seen + self.heartbeat_delay
+
+            self.timers.schedule(conn, deadline - now)
+
+        return
+
+
+    def expire_sessions(self) -> None:
+        '''
+        Release the usernames of the suspended sessions that expired
+        and announce that their clients left
+        '''
+        for name in self.sessions.expire():
+            self.metrics.increment('sessions_expired')
+            self.release_username(name)
+            self.announce_departure(name)
+
+        return
+
+
+    @property
+    def heartbeat_delay(self) -> float:
+        '''
+        Silence after which a connection is pinged, or reaped
+        if heartbeats are disabled or longer than the idle timeout
+        '''
+        if 0 < self.HEARTBEAT_INTERVAL < self.IDLE_TIMEOUT:
+            return self.HEARTBEAT_INTERVAL
+
+        return self.IDLE_TIMEOUT
+
+
+    def touch(self, conn: socket.socket) -> None:
+        '''
+        Record activity on a connection. Its timer is not moved,
+        it is only checked against the last activity when it expires
+        '''
+        if conn in self.last_seen:
+            self.last_seen[conn] = time.monotonic()
+
+        return
+
+
+    def drop_connection(self, conn: socket.socket, reason: str, expel: bool=False) -> bool:
+        '''
+        Drop an idle or misbehaving connection. The connection is shut down
+        so its handler goes through the regular disconnection. The session
+        of an expelled client is ended rather than suspended.
+        Returns False if the connection is already closing
+        '''
+        queue: OutboundQueue = self.outbound.get(conn)
+        if queue is None or queue.closed:
+            return False
+
+        self.logger.warning('WARNING', '%s:%d dropped - %s', *self.registry.address(conn), reason)
+
+        if expel:
+            self.expelled.add(conn)
+
+        queue.close(discard=True)
+        self.abort_connection(conn)
+        return True
+
+
     def accept_client_connection(self) -> None:
         '''
         Accepts incoming client connections and dispatches a handler
@@ -49,19 +234,21 @@ class Server(BaseSocket):
             while self.server_up:
                 try:
                     conn, addr = self.server_socket.accept()
-                    print('[NEW CONNECTION] %s:%d has connected' % addr)
-                    self.addresses[conn] = addr
+                    self.limit_unsent_data(conn)
+                    self.record_connection(conn, addr)
+                    self.outbound[conn] = OutboundQueue(self.OUTBOUND_QUEUE_SIZE, self.queue_policy)
                 except ConnectionResetError:
-                    print('[WARNING] Server closed. Incoming connection handler stopped')
+                    self.logger.warning('WARNING', 'Server closed. Incoming connection handler stopped')
                     return
                 except socket.timeout:
                     continue
 
+                threading.Thread(target=self.handle_client_output, args=(conn,)).start()
                 threading.Thread(target=self.handle_client, args=(conn,)).start()
 
         except KeyboardInterrupt:
             self.server_up = False
-            print('[WARNING] Server closed. KeyboardInterrupt exception detected')
+            self.logger.warning('WARNING', 'Server closed. KeyboardInterrupt exception detected')
             self.server_socket.close()
             return
 
@@ -72,85 +259,705 @@ class Server(BaseSocket):
         for a single connection and handles incoming messages
         from the client.
         '''
-        name: str = self.handle_username_assignment(conn)
-        
-        if name == self.CLIENT_DISCONNECT_MESSAGE:
-            print('[INFO] %s:%d disconnecting...' % self.addresses[conn])
-            del self.addresses[conn]
-            conn.close()
+        try:
+            name: Optional[str] = self.handle_username_assignment(conn)
+        except Exception:
+            name = None
+
+        if name is None:
+            self.logger.info('INFO', '%s:%d disconnecting...', *self.registry.address(conn))
+            self.unregister_client(conn, None)
+            self.close_outbound_queue(conn)
             return
         
-        self.existing_usernames.add(name)
-        self.broadcast('<Server>: %s connected - %d users online' % (name, len(self.addresses)))
+        self.register_client(conn, name)
+
+        buffer: ReceiveBuffer = ReceiveBuffer(self)
+        lost: bool = False
 
         while self.server_up:
             try:
-                msg: str = self.receive_message(conn)
-            except ConnectionResetError or ConnectionAbortedError as e:
-                print('[WARNING] %s encoutered by %s:%d - %s' % (type(e).__name__, *self.addresses[conn], e))
-                msg = self.CLIENT_DISCONNECT_MESSAGE
+                messages: List[Envelope] = buffer.receive_envelopes(conn)
+                self.touch(conn)
             except BlockingIOError as e:
                 continue
+            except OSError as e:
+                # Also raised once an evicted or dropped connection was closed
+                self.logger.warning('WARNING', '%s encoutered by %s:%d - %s', type(e).__name__, *self.registry.address(conn), e)
+                messages = [Envelope(Envelope.QUIT)]
+                lost = True
+            except ValueError as e:
+                self.logger.warning('WARNING', 'Malformed message from %s:%d - %s', *self.registry.address(conn), e)
+                messages = [Envelope(Envelope.QUIT)]
             except Exception as e:
-                print('[ERROR] Unknown error occured: %s' % e)
-                msg = self.CLIENT_DISCONNECT_MESSAGE
+                self.logger.error('ERROR', 'Unknown error occured: %s', e)
+                messages = [Envelope(Envelope.QUIT)]
             
-            if msg == self.CLIENT_DISCONNECT_MESSAGE:
-                print('[INFO] %s:%d disconnecting...' % self.addresses[conn])
+            for msg in messages:
+                if msg.kind == Envelope.QUIT:
+                    self.logger.info('INFO', '%s:%d disconnecting...', *self.registry.address(conn))
 
-                self.existing_usernames.remove(name)
-                del self.addresses[conn]
-                
-                if len(self.addresses) > 0: 
-                    self.broadcast('<Server>: %s disconnected from the server - %d users online' % (name, len(self.addresses)))
-                conn.close()
+                    self.unregister_client(conn, name, lost)
+                    self.close_outbound_queue(conn)
 
-                break
-            
-            print('[MESSAGE] <%s>: %s' % (name, msg))
-            self.broadcast('<%s>: %s' % (name, msg))
+                    return
+
+                # A message the server fails to handle only disconnects its sender
+                try:
+                    self.process_message(conn, name, msg)
+                except Exception as e:
+                    self.logger.error('ERROR', 'Unknown error occured while handling a message from %s:%d - %s', *self.registry.address(conn), e)
+                    self.unregister_client(conn, name)
+                    self.close_outbound_queue(conn)
+                    return
 
         return
 
 
-    def handle_username_assignment(self, conn: socket.socket) -> str:
+    def record_connection(self, conn: socket.socket, addr: Tuple[str, int]) -> None:
         '''
-        Handle the assignment of a new user's username assignment
+        Record a newly accepted connection, before its username handshake
         '''
-        name: str = self.receive_message(conn)
-        
-        # If the check returns None, proceed to return the name to the client handler
-        while (check := self.check_username_validity(name)):
-            self.send_message(conn, check)
+        self.registry.add(conn, addr)
+        self.accepted[conn] = time.perf_counter()
 
-            if check == self.CLIENT_DISCONNECT_MESSAGE:
-                return self.CLIENT_DISCONNECT_MESSAGE
+        if self.IDLE_TIMEOUT > 0:
+            self.last_seen[conn] = time.monotonic()
+            self.timers.schedule(conn, self.heartbeat_delay)
+        self.metrics.increment('connections_total')
+        self.logger.info('NEW CONNECTION', '%s:%d has connected', *addr)
 
-            name = self.receive_message(conn)
-        
-        self.send_message(conn, name)
-        return name
+        return
 
 
-    def check_username_validity(self, username: str) -> Union[str, None]:
+    def limit_unsent_data(self, sock: socket.socket) -> None:
         '''
-        Check if the username has been used or not
+        Keep at most a couple of chunks of unsent data in the kernel buffer
+        of a client socket, where the platform allows it. The rest waits in
+        the outbound queue, where chunks of large messages are interleaved
+        with the other messages instead of being written ahead of them
         '''
-        # Check if the username has been used, return None if it has not
-        if username in self.existing_usernames:
-            return self.USERNAME_EXISTS_MESSAGE
-        
-        if username == self.CLIENT_DISCONNECT_MESSAGE:
-            return self.CLIENT_DISCONNECT_MESSAGE
+        if self.CHUNK_SIZE > 0 and hasattr(socket, 'TCP_NOTSENT_LOWAT'):
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NOTSENT_LOWAT, 2 * self.CHUNK_SIZE)
+            except OSError:
+                pass
+
+        return
+
+
+    def register_client(self, conn: socket.socket, name: str) -> None:
+        '''
+        Record a client that completed the username handshake and send
+        it its session token. A new client is placed in the default room
+        and announced, a resumed one silently goes back to its room
+        '''
+        self.metrics.handshake_latency.observe(time.perf_counter() - self.accepted.pop(conn))
+        self.add_client(conn, name)
+
+        if self.sessions.enabled:
+            token: str = self.sessions.issue(conn, name)
+            self.send_envelope(conn, Envelope(Envelope.SESSION, token))
+
+            # The other workers ask for the session when the client reconnects to them
+            if self.bus is not None:
+                self.bus.register_session(token, name)
+
+        resumed: Optional[Tuple[Optional[str], int]] = self.resuming.pop(conn, None)
+        if resumed is not None:
+            self.rejoin_room(conn, *resumed)
+            return
+
+        self.join_room(conn, name, self.DEFAULT_ROOM, announce=False)
+        self.broadcast(Envelope(Envelope.NOTICE, '%s connected - %d users online' % (name, len(self.registry))))
+
+        return
+
+
+    def add_client(self, conn: socket.socket, name: str) -> None:
+        '''
+        Bind a claimed username to its connection and give the client its rate limit
+        '''
+        self.registry.register(conn, name)
+
+        if self.RATE_LIMIT > 0:
+            self.buckets[conn] = TokenBucket(self.RATE_LIMIT, self.RATE_BURST or self.RATE_LIMIT)
+
+        return
+
+
+    def unregister_client(self, conn: socket.socket, name: Union[str, None], lost: bool=False) -> None:
+        '''
+        Forget a disconnecting client and, if it completed
+        the username handshake, announce its departure. The session of a
+        client whose connection was lost is suspended instead, keeping its
+        username claimed until the client resumes it or it expires. Clients
+        the server expelled lose their session
+        '''
+        if lost and conn not in self.expelled and self.sessions.suspend(conn, self.client_rooms.get(conn)):
+            self.registry.detach(conn)
+        self.sessions.discard(conn)
+        self.expelled.discard(conn)
+
+        # No username is left once the session was suspended or taken over by another connection
+        current: Union[str, None] = self.registry.remove(conn)
+        self.accepted.pop(conn, None)
+        self.last_seen.pop(conn, None)
+        self.timers.cancel(conn)
+        self.resuming.pop(conn, None)
+        if name is None:
+            return
+
+        self.leave_room(conn)
+        self.buckets.pop(conn, None)
+        self.throttled.discard(conn)
+
+        if current is not None:
+            self.release_username(name)
+            self.announce_departure(name)
+
+        return
+
+
+    def announce_departure(self, name: str) -> None:
+        '''
+        Tell the remaining clients that a client left
+        '''
+        if len(self.registry) > 0: 
+            self.broadcast(Envelope(Envelope.NOTICE, '%s disconnected from the server - %d users online' % (name, len(self.registry))))
+
+        return
+
+
+    def process_message(self, conn: socket.socket, name: str, msg: Envelope) -> None:
+        '''
+        Handle a message sent by a registered client, dispatched on its
+        type: a chat message, a room change, a private message or a
+        history request. Pongs only count as activity
+        '''
+        if msg.kind not in self.CLIENT_MESSAGES or not self.allow_message(conn):
+            return
+
+        if msg.flags & Envelope.OVERSIZED:
+            self.metrics.increment('oversized_messages')
+            self.send_notice(conn, 'Your message is longer than %d characters and was not sent' % self.MAX_MESSAGE_SIZE)
+            return
+
+        self.metrics.increment('messages_in')
+        self.metrics.increment('bytes_in', self.header_size + Envelope.HEADER.size + len(msg.text.encode(self.FORMAT)))
+
+        if msg.kind == Envelope.JOIN:
+            if msg.text.strip():
+                self.join_room(conn, name, msg.text.strip())
+            return
+
+        if msg.kind == Envelope.LEAVE:
+            self.join_room(conn, name, self.DEFAULT_ROOM)
+            return
+
+        if msg.kind == Envelope.DIRECT:
+            self.send_direct(conn, name, msg.sender, msg.text)
+            return
+
+        room: str = self.client_rooms.get(conn, self.DEFAULT_ROOM)
+
+        if msg.kind == Envelope.HISTORY:
+            self.send_history(conn, self.history.page(room, msg.seq or None, self.HISTORY_PAGE_SIZE))
+            return
+
+        self.logger.debug('MESSAGE', '#%s <%s>: %s', room, name, msg.text)
+        self.broadcast(Envelope(Envelope.CHAT, msg.text, name), room=room)
+
+        return
+
+
+    def allow_message(self, conn: socket.socket) -> bool:
+        '''
+        Take a token from the client's bucket and the server-wide bucket.
+        Over the limit, the message is dropped and the client is told once
+        until it slows down. Clients that keep flooding are disconnected.
+        '''
+        bucket: Union[TokenBucket, None] = self.buckets.get(conn)
+
+        if bucket is not None and not bucket.take():
+            self.metrics.increment('throttled_messages')
+
+            if 0 < self.THROTTLE_DISCONNECT <= bucket.rejected:
+                if self.drop_connection(conn, 'flooding, %d messages throttled' % bucket.rejected, expel=True):
+                    self.metrics.increment('throttle_disconnects')
+            elif conn not in self.throttled:
+                self.throttled.add(conn)
+                self.send_notice(conn, 'You are sending messages too fast. Your messages are dropped until you slow down')
+
+            return False
+
+        if self.global_bucket is not None and not self.global_bucket.take():
+            self.metrics.increment('throttled_global')
+
+            if conn not in self.throttled:
+                self.throttled.add(conn)
+                self.send_notice(conn, 'The server is busy. Your messages are dropped until the load goes down')
+
+            return False
+
+        self.throttled.discard(conn)
+        return True
+
+
+    def join_room(self, conn: socket.socket, name: str, room: str, announce: bool=True) -> None:
+        '''
+        Move a client into a room, leaving its previous room.
+        The client is told its new room through a room message.
+        '''
+        previous: Union[str, None] = self.leave_room(conn)
+
+        with self.rooms_lock:
+            self.rooms.setdefault(room, set()).add(conn)
+            self.client_rooms[conn] = room
+
+        self.send_envelope(conn, Envelope(Envelope.ROOM, room))
+        self.send_history(conn, self.history.recent(room))
+
+        if announce:
+            if previous is not None and previous != room:
+                self.broadcast(Envelope(Envelope.NOTICE, '%s left the room' % name), room=previous)
+            self.broadcast(Envelope(Envelope.NOTICE, '%s joined the room' % name), room=room)
+
+        return
+
+
+    def rejoin_room(self, conn: socket.socket, room: Union[str, None], seq: int) -> None:
+        '''
+        Put a resumed client back in its room, without telling the room,
+        and send it the room's messages numbered `seq` or later, which
+        it missed while reconnecting
+        '''
+        room = self.DEFAULT_ROOM if room is None else room
+
+        with self.rooms_lock:
+            self.rooms.setdefault(room, set()).add(conn)
+            self.client_rooms[conn] = room
+
+        for message in self.history.since(room, seq, self.RESUME_LIMIT):
+            self.send_envelope(conn, message)
+
+        self.metrics.increment('sessions_resumed')
+        return
+
+
+    def send_direct(self, conn: socket.socket, name: str, recipient: str, text: str) -> None:
+        '''
+        Send a private message to a single user.
+        The sender gets a delivered receipt, or an undelivered reply when
+        no such user is online. Users on other workers or nodes are
+        reached through the bus, which answers with the receipt.
+        '''
+        if not recipient or not text.strip():
+            self.send_notice(conn, 'A private message needs a recipient and a text')
+            return
+
+        self.metrics.increment('direct_messages')
+
+        if self.deliver_direct(name, recipient, text):
+            self.direct_receipt(name, recipient, text, True)
+        elif self.bus is None or not self.bus.send_direct(name, recipient, text):
+            self.direct_receipt(name, recipient, text, False)
+
+        return
+
+
+    def deliver_direct(self, sender: str, recipient: str, text: str) -> bool:
+        '''
+        Queue a private message for a local user.
+        Returns False if the user is not connected to this server
+        '''
+        conn: Union[socket.socket, None] = self.registry.connection(recipient)
+        if conn is None:
+            return False
+
+        self.send_envelope(conn, Envelope(Envelope.PRIVATE, text, sender))
+        self.metrics.increment('messages_out')
+        return True
+
+
+    def receive_direct(self, sender: str, recipient: str, text: str) -> None:
+        '''
+        Deliver a private message relayed by the bus and send the receipt back
+        '''
+        self.bus.send_receipt(sender, recipient, text, self.deliver_direct(sender, recipient, text))
+        return
+
+
+    def direct_receipt(self, sender: str, recipient: str, text: str, delivered: bool) -> None:
+        '''
+        Tell a local sender whether its private message was delivered
+        '''
+        conn: Union[socket.socket, None] = self.registry.connection(sender)
+
+        if conn is not None:
+            # The receipt's sender is the recipient of the private message
+            self.send_envelope(conn, Envelope(Envelope.DELIVERED if delivered else Envelope.UNDELIVERED, text, recipient))
 
+        return
+
+
+    def leave_room(self, conn: socket.socket) -> Union[str, None]:
+        '''
+        Remove a client from its current room and return the room's name
+        '''
+        with self.rooms_lock:
+            room: Union[str, None] = self.client_rooms.pop(conn, None)
+
+            if room is not None:
+                members: Set[socket.socket] = self.rooms[room]
+                members.discard(conn)
+                if not members:
+                    del self.rooms[room]
+
+        return room
+
+
+    def send_history(self, conn: socket.socket, messages: List[Envelope]) -> None:
+        '''
+        Send past messages of a room to a client, flagged as replayed
+        '''
+        for message in messages:
+            self.send_envelope(conn, message.replay())
+
+        return
+
+
+    def send_notice(self, conn: socket.socket, text: str) -> None:
+        '''
+        Send an announcement from the server to a single client
+        '''
+        self.send_envelope(conn, Envelope(Envelope.NOTICE, text))
+        return
+
+
+    def handle_client_output(self, conn: socket.socket) -> None:
+        '''
+        Individual writer function that flushes the connection's
+        outbound queue, so a slow client never stalls the threads
+        broadcasting to it. Pending frames are coalesced into a single
+        write per flush. Closes the connection once the queue is
+        closed and drained.
+        '''
+        queue: OutboundQueue = self.outbound[conn]
+        window: float = self.FLUSH_WINDOW_US / 1e6
+
+        try:
+            while (frames := queue.wait_for_frames(window, self.FLUSH_WINDOW_BYTES)):
+                sent: int = self.send_frames(conn, frames)
+                queue.consume(sent)
+                self.metrics.increment('bytes_out', sent)
+        except OSError:
+            queue.close(discard=True)
+
+        self.abort_connection(conn)
+        conn.close()
+        return
+
+
+    def handle_username_assignment(self, conn: socket.socket) -> Optional[str]:
+        '''
+        Handle the assignment of a new user's username assignment.
+        Returns None if the client left during the handshake
+        '''
+        replies: 'SimpleQueue[Envelope]' = SimpleQueue()
+
+        while True:
+            reply: Optional[Envelope] = self.answer_username(conn, self.receive_envelope(conn), replies.put)
+            self.touch(conn)
+
+            # Each connection has its own thread, which can wait for the other workers or nodes
+            if reply is None:
+                reply = replies.get()
+
+            self.send_envelope(conn, reply)
+
+            if reply.kind == Envelope.QUIT:
+                return None
+            if reply.kind == Envelope.LOGIN:
+                return reply.text
+
+
+    def answer_username(self, conn: socket.socket, request: Envelope, callback: Callable[[Envelope], None]) -> Optional[Envelope]:
+        '''
+        Claim the username requested during the handshake, or resume
+        a session, and build the reply: the accepted username, a username
+        taken or session expired reply, or a quit reply if the client is leaving.
+        Returns None when the username must also be claimed with the other
+        workers or nodes, or the session asked from the other workers,
+        without waiting for them: `callback` is called with the reply,
+        through `run_threadsafe`, once they answered
+        '''
+        if request.kind == Envelope.QUIT:
+            return Envelope(Envelope.QUIT)
+
+        if request.kind == Envelope.RESUME:
+            return self.resume_session(conn, request, callback)
+
+        username: str = request.text
+
+        if not self.registry.claim(username):
+            return Envelope(Envelope.USERNAME_TAKEN, username)
+
+        if self.bus is None:
+            return Envelope(Envelope.LOGIN, username)
+
+        # When running as a worker or a node, the username must also be free on the other workers or nodes
+        self.bus.claim_username(username, functools.partial(self.run_threadsafe, self.answer_claim, username, callback))
+        return None
+
+
+    def answer_claim(self, username: str, callback: Callable[[Envelope], None], granted: bool) -> None:
+        '''
+        Build the reply to a username request once the other workers
+        or nodes answered its claim, and pass it to `callback`
+        '''
+        if not granted:
+            self.registry.release(username)
+            callback(Envelope(Envelope.USERNAME_TAKEN, username))
+        else:
+            callback(Envelope(Envelope.LOGIN, username))
+
+        return
+
+
+    def resume_session(self, conn: socket.socket, request: Envelope, callback: Callable[[Envelope], None]) -> Optional[Envelope]:
+        '''
+        Give a reconnecting client the username of the session whose token
+        it sent. Once registered, the client goes back to its room and only
+        gets the messages from the request's sequence number on.
+        Returns None when the session is not kept here, but may be kept by
+        another worker, which is asked to hand it over: `callback` is called
+        with the reply, through `run_threadsafe`, once it answered
+        '''
+        session: Union[Tuple[str, Union[str, None]], None] = self.take_over_session(request.text, 'session resumed from another connection')
+
+        if session is not None:
+            self.resuming[conn] = (session[1], request.seq)
+            return Envelope(Envelope.LOGIN, session[0])
+
+        if self.bus is None:
+            return Envelope(Envelope.SESSION_EXPIRED)
+
+        self.bus.resume_session(request.text, functools.partial(self.run_threadsafe, self.answer_handover, conn, callback))
         return None
+
+
+    def answer_handover(self, conn: socket.socket, callback: Callable[[Envelope], None], session: Union[Tuple[str, Union[str, None]], None]) -> None:
+        '''
+        Build the reply to a resume request once another worker handed its
+        session over, or did not find it, and pass it to `callback`. Sequence
+        numbers are only meaningful to the worker that numbered the messages,
+        so the client gets the last messages of its room instead
+        '''
+        if session is None or not self.registry.claim(session[0]):
+            callback(Envelope(Envelope.SESSION_EXPIRED))
+            return
+
+        self.resuming[conn] = (session[1], 0)
+        callback(Envelope(Envelope.LOGIN, session[0]))
+        return
+
+
+    def take_over_session(self, token: str, reason: str) -> Union[Tuple[str, Union[str, None]], None]:
+        '''
+        End the session of a token, suspended or still connected, and return
+        its username and room. A connection still holding the session is
+        dropped for `reason`. Returns None if the token is unknown or expired
+        '''
+        session: Union[Tuple[str, Union[str, None], Union[socket.socket, None]], None] = self.sessions.resume(token)
+
+        if session is None:
+            return None
+
+        name, room, previous = session
+
+        # The client noticed the connection was lost before the server did
+        if previous is not None:
+            room = self.client_rooms.get(previous)
+            self.registry.detach(previous)
+            self.drop_connection(previous, reason)
+
+        return name, room
+
+
+    def hand_over_session(self, token: str, callback: Callable[[Union[Tuple[str, Union[str, None]], None]], None]) -> None:
+        '''
+        Hand a session over to the worker its client reconnected to, and
+        pass its username and room to `callback`, or None if it is not kept
+        here. The username now belongs to the other worker, so it is only
+        released locally and the other clients are not told the client left
+        '''
+        session: Union[Tuple[str, Union[str, None]], None] = self.take_over_session(token, 'session resumed on another worker')
+
+        if session is not None:
+            self.registry.release(session[0])
+
+        callback(session)
+        return
+
+
+    def release_username(self, username: str) -> None:
+        '''
+        Make the username of a disconnected client available again
+        '''
+        self.registry.release(username)
+
+        if self.bus is not None:
+            self.bus.release_username(username)
+
+        return
         
 
-    def broadcast(self, message:str) -> None:
+    def broadcast(self, message: Envelope, relay: bool=True, room: Union[str, None]=None) -> None:
         '''
-        Send a message to all connected clients.
+        Send a message to all connected clients, or only to the members of `room`.
+        The frame, or the chunk frames of a large message, are encoded once
+        and shared by every recipient.
+        Unless `relay` is unset, the message is also published to the other workers.
+        Room messages are recorded in the room's history, which numbers them.
         '''
-        for client in self.addresses.keys():
-            self.send_message(client, message)
-            
+        start: float = time.perf_counter()
+
+        if room is not None:
+            self.history.record(room, message)
+
+        frames: List[memoryview] = [memoryview(frame) for frame in self.encode_chunks(message)]
+
+        # Iterate over a snapshot, clients may join, leave or be evicted while broadcasting.
+        # Only registered clients completed the username handshake
+        if room is None:
+            recipients: Sequence[socket.socket] = self.registry.snapshot()
+        else:
+            with self.rooms_lock:
+                recipients: Sequence[socket.socket] = list(self.rooms.get(room, ()))
+
+        for client in recipients:
+            self.send_encoded(client, frames)
+
+        if relay and self.bus is not None:
+            self.bus.publish(message, room)
+
+        self.metrics.increment('messages_out', len(recipients))
+        if len(frames) > 1:
+            self.metrics.increment('chunked_messages')
+        self.metrics.broadcast_duration.observe(time.perf_counter() - start)
+        return
+
+
+    def run_threadsafe(self, callback: Callable[..., Any], *args: Any) -> None:
+        '''
+        Run a callback on behalf of another thread. Connection handlers
+        run in their own threads, so the callback can run right away.
+        '''
+        callback(*args)
+        return
+
+
+    def send_frame(self, conn: socket.socket, frame: Union[bytes, memoryview]) -> None:
+        '''
+        Queue an already encoded frame on the connection's outbound queue
+        '''
+        queue: OutboundQueue = self.outbound.get(conn)
+
+        if queue is not None and not queue.put(frame):
+            self.evict_client(conn)
+
         return
+
+
+    def send_chunks(self, conn: socket.socket, frames: Sequence[Union[bytes, memoryview]]) -> None:
+        '''
+        Queue the chunk frames of a large message on the connection's
+        outbound queue. They are written one at a time, interleaved
+        with the other messages sent to the client meanwhile
+        '''
+        queue: OutboundQueue = self.outbound.get(conn)
+
+        if queue is not None and not queue.put_chunks(frames):
+            self.evict_client(conn)
+
+        return
+
+
+    def evict_client(self, conn: socket.socket) -> None:
+        '''
+        Drop a client whose outbound queue overflowed. The connection is
+        shut down so its handler goes through the regular disconnection.
+        '''
+        queue: OutboundQueue = self.outbound.get(conn)
+        if queue is None or queue.closed:
+            return
+
+        self.evictions += 1
+        self.logger.warning('WARNING', '%s:%d evicted - outbound queue full', *self.registry.address(conn))
+        self.expelled.add(conn)
+
+        queue.close(discard=True)
+        self.abort_connection(conn)
+        return
+
+
+    def abort_connection(self, conn: socket.socket) -> None:
+        '''
+        Shut down both directions of a connection, waking up
+        any thread blocked on it
+        '''
+        try:
+            conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+        return
+
+
+    def close_outbound_queue(self, conn: socket.socket) -> None:
+        '''
+        Close and forget the outbound queue of a disconnecting client
+        '''
+        queue: OutboundQueue = self.outbound.pop(conn, None)
+
+        if queue is not None:
+            self.dropped_frames += queue.dropped
+            queue.close()
+
+        return
+
+
+    def outbound_stats(self) -> Dict[str, int]:
+        '''
+        Counters describing the state of the outbound queues
+        '''
+        queues = list(self.outbound.values())
+        depths = [len(queue) for queue in queues]
+
+        return {
+            'queued_frames': sum(depths),
+            'max_queue_depth': max(depths, default=0),
+            'dropped_frames': self.dropped_frames + sum(queue.dropped for queue in queues),
+            'evictions': self.evictions,
+        }
+
+
+    def stats(self) -> Dict[str, Any]:
+        '''
+        Snapshot of the server metrics, the outbound queue counters,
+        the outbound queue depth of every client and the number of
+        throttled messages of every client that was throttled
+        '''
+        with self.rooms_lock:
+            rooms: int = len(self.rooms)
+
+        return {
+            **self.metrics.snapshot(),
+            'connections_current': len(self.registry),
+            'rooms': rooms,
+            'sessions_suspended': len(self.sessions),
+            **self.outbound_stats(),
+            'queue_depths': {'%s:%d' % (self.registry.address(conn) or ('?', 0)): len(queue) for conn, queue in list(self.outbound.items())},
+            'throttled_by_client': {'%s:%d' % (self.registry.address(conn) or ('?', 0)): bucket.rejected for conn, bucket in list(self.buckets.items()) if bucket.rejected},
+        }
@@ -0,0 +1,163 @@
+'''
+sessions.py :
+Contains the interface and implementation for the SessionStore class
+'''
+# --- Libraries --- #
+import socket
+import secrets
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .timer_wheel import TimerWheel
+
+# --- SessionStore Class --- #
+class SessionStore:
+    '''
+    SessionStore class -
+    Resumable sessions of the registered clients. Every client gets a
+    random token when it logs in. When its connection is lost, its session
+    is suspended for `timeout` seconds, keeping its username and room, so a
+    client reconnecting with the token takes its place back without a new
+    handshake. Suspended sessions expire through a timer wheel keyed by token.
+    '''
+    TOKEN_BYTES: int = 18
+
+    def __init__(self, timeout: float, tick: float=1.0) -> None:
+        '''
+        Initialization
+        '''
+        self.timeout: float = timeout
+        self.lock: threading.Lock = threading.Lock()
+        self.tokens: Dict[socket.socket, str] = {}
+        # Sessions of connected clients, by token
+        self.active: Dict[str, Tuple[socket.socket, str]] = {}
+        # Username and room of the sessions waiting to be resumed, by token
+        self.suspended: Dict[str, Tuple[str, Optional[str]]] = {}
+        self.timers: TimerWheel = TimerWheel(tick)
+
+
+    def __len__(self) -> int:
+        '''
+        Number of suspended sessions
+        '''
+        return len(self.suspended)
+
+
+    @property
+    def enabled(self) -> bool:
+        '''
+        Whether sessions survive a lost connection
+        '''
+        return self.timeout > 0
+
+
+    def issue(self, conn: socket.socket, name: str, token: Optional[str]=None) -> str:
+        '''
+        Start the session of a registered client and return its token.
+        A new token is drawn unless one is given
+        '''
+        token = secrets.token_urlsafe(self.TOKEN_BYTES) if token is None else token
+
+        with self.lock:
+            self.tokens[conn] = token
+            self.active[token] = (conn, name)
+
+        return token
+
+
+    def token(self, conn: socket.socket) -> Optional[str]:
+        '''
+        Token of a connected client's session
+        '''
+        return self.tokens.get(conn)
+
+
+    def discard(self, conn: socket.socket) -> None:
+        '''
+        End the session of a client that left
+        '''
+        with self.lock:
+            token: Optional[str] = self.tokens.pop(conn, None)
+
+            if token is not None:
+                del self.active[token]
+
+        return
+
+
+    def suspend(self, conn: socket.socket, room: Optional[str]) -> bool:
+        '''
+        Keep the session of a client whose connection was lost until it
+        resumes or expires. Returns False if the client has no session
+        '''
+        if not self.enabled:
+            return False
+
+        with self.lock:
+            token: Optional[str] = self.tokens.pop(conn, None)
+            if token is None:
+                return False
+
+            _, name = self.active.pop(token)
+            self.suspended[token] = (name, room)
+
+        self.timers.schedule(token, self.timeout)
+        return True
+
+
+    def resume(self, token: str) -> Optional[Tuple[str, Optional[str], Optional[socket.socket]]]:
+        '''
+        Take a session over from a new connection. Returns its username,
+        its room if it was suspended, and the previous connection if the
+        server has not noticed yet that it was lost. Returns None if the
+        token is unknown or the session expired
+        '''
+        with self.lock:
+            if token in self.suspended:
+                name, room = self.suspended.pop(token)
+                self.timers.cancel(token)
+                return name, room, None
+
+            if token in self.active:
+                conn, name = self.active.pop(token)
+                del self.tokens[conn]
+                return name, None, conn
+
+        return None
+
+
+    def expire(self, now: Optional[float]=None) -> List[str]:
+        '''
+        End the suspended sessions whose timeout passed and return their usernames
+        '''
+        names: List[str] = []
+
+        for token in self.timers.advance(now):
+            with self.lock:
+                session: Optional[Tuple[str, Optional[str]]] = self.suspended.pop(token, None)
+
+            if session is not None:
+                names.append(session[0])
+
+        return names
+
+
+    def state(self) -> Dict[str, Any]:
+        '''
+        Suspended sessions as a JSON serializable dictionary
+        '''
+        with self.lock:
+            return {'suspended': {token: list(session) for token, session in self.suspended.items()}}
+
+
+    def restore(self, state: Dict[str, Any]) -> List[str]:
+        '''
+        Suspend the sessions of a state produced by `state`, for a full
+        timeout, and return their usernames
+        '''
+        for token, (name, room) in state['suspended'].items():
+            with self.lock:
+                self.suspended[token] = (name, room)
+            self.timers.schedule(token, self.timeout)
+
+        return [name for name, _ in state['suspended'].values()]
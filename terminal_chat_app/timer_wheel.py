@@ -0,0 +1,96 @@
+'''
+timer_wheel.py :
+Contains the interface and implementation for the TimerWheel class
+'''
+# --- Libraries --- #
+import math
+import time
+import threading
+from typing import Dict, Hashable, List, Optional
+
+# --- TimerWheel Class --- #
+class TimerWheel:
+    '''
+    TimerWheel class -
+    Hashed timer wheel. A timer is stored in the slot of the tick it
+    expires at, modulo the number of slots, so scheduling and cancelling
+    cost O(1) and every tick only looks at a single slot. Timers further
+    away than a full turn stay in their slot until their tick comes.
+    '''
+    def __init__(self, tick: float=1.0, slots: int=512) -> None:
+        '''
+        Initialization
+        '''
+        self.tick: float = tick
+        self.slots: List[Dict[Hashable, int]] = [{} for _ in range(slots)]
+        self.positions: Dict[Hashable, int] = {}
+        self.start: float = time.monotonic()
+        self.current: int = 0
+        self.lock: threading.Lock = threading.Lock()
+
+
+    def __len__(self) -> int:
+        '''
+        Number of scheduled timers
+        '''
+        return len(self.positions)
+
+
+    def schedule(self, key: Hashable, delay: float) -> None:
+        '''
+        Expire `key` after `delay` seconds, replacing its previous timer.
+        Timers expire on the first tick at or after their deadline
+        '''
+        with self.lock:
+            self.remove(key)
+
+            deadline: int = self.current + max(1, math.ceil(delay / self.tick))
+            slot: int = deadline % len(self.slots)
+
+            self.slots[slot][key] = deadline
+            self.positions[key] = slot
+
+        return
+
+
+    def cancel(self, key: Hashable) -> None:
+        '''
+        Forget the timer of `key`, if it has one
+        '''
+        with self.lock:
+            self.remove(key)
+
+        return
+
+
+    def remove(self, key: Hashable) -> None:
+        '''
+        Forget the timer of `key` while holding the lock
+        '''
+        slot: Optional[int] = self.positions.pop(key, None)
+
+        if slot is not None:
+            del self.slots[slot][key]
+
+        return
+
+
+    def advance(self, now: Optional[float]=None) -> List[Hashable]:
+        '''
+        Move the wheel up to the current time and return
+        the keys of every timer that expired on the way
+        '''
+        target: int = int(((time.monotonic() if now is None else now) - self.start) / self.tick)
+        expired: List[Hashable] = []
+
+        with self.lock:
+            while self.current < target:
+                self.current += 1
+                slot: Dict[Hashable, int] = self.slots[self.current % len(self.slots)]
+
+                for key in [key for key, deadline in slot.items() if deadline <= self.current]:
+                    del slot[key]
+                    del self.positions[key]
+                    expired.append(key)
+
+        return expired
@@ -4,53 +4,47 @@ Defines some utility functions
 '''
 # --- Libraries --- #
 import curses
-from typing import Dict, List
+from typing import List, Tuple
+
+from .envelope import Envelope
+from .scrollback import Scrollback
 
 # --- Functions --- #
-def init_header_color_map(username: str) -> Dict[str, int]:
+def format_message(message: Envelope, username: str) -> Tuple[str, int]:
+    '''
+    Render a message received from the server as a chat line and its
+    font color, from the message's type and sender
+    '''
+    if message.kind == Envelope.CHAT:
+        return '<%s>: %s' % (message.sender, message.text), curses.color_pair(3) if message.sender == username else curses.A_NORMAL
+
+    if message.kind == Envelope.PRIVATE:
+        return '<%s> (private): %s' % (message.sender, message.text), curses.A_NORMAL
+
+    # Receipts carry the recipient of the private message as their sender
+    if message.kind == Envelope.DELIVERED:
+        return '<%s> -> %s: %s' % (username, message.sender, message.text), curses.color_pair(3)
+
+    if message.kind == Envelope.UNDELIVERED:
+        return '<Server>: %s is not online, your message was not delivered' % message.sender, curses.color_pair(1)
+
+    return '<Server>: %s' % message.text, curses.color_pair(1)
+
+def format_line(line: str, color: int, width: int) -> List[Tuple[str, int]]:
     '''
-    Intializes the mappings between chat headers
-    and their corresponding font colors     
+    Split a line into rows of at most `width` characters,
+    each paired with the line's font color
     '''
-    return {
-        '<Interface>': curses.color_pair(2),
-        '<Server>': curses.color_pair(1),
-        f'<{username}>': curses.color_pair(3)
-    }
-
-def render_text(
-    stdscr: curses.window,
-    textpad_chats: List[str],
-    start: int,
-    end: int,
-    padding: int,
-    current_text: List[str],
-    header_color_map: Dict[str, int]
-) -> None:
+    return [(line[i:i + width], color) for i in range(0, max(len(line), 1), width)]
+
+def interface_line(text: str, width: int) -> List[Tuple[str, int]]:
     '''
-    Render the `textpad_chats` onto the curses window and
-    display the input bar
+    Rows of a line written by the client interface itself
     '''
-    stdscr.clear()
-    
-    for i in range(start, end):
-        line = textpad_chats[i]
-        header = line[:line.index('>') + 1]
-
-        color = header_color_map.get(header, None)
-        
-        if color is None:
-            stdscr.addstr(line)
-        else:
-            stdscr.addstr(line, color)
-    
-    stdscr.addstr(padding + 2, 0, '<You>: ')
-    stdscr.addstr(padding + 2, len('<You>: '), ''.join(current_text))
-    
-    stdscr.refresh()
-
-def receive_broadcast(message: str, message_list: List[str]) -> None:
+    return format_line('<Interface>: %s' % text, curses.color_pair(2), width)
+
+def receive_broadcast(message: Envelope, message_list: Scrollback, username: str, width: int) -> None:
         '''
         Append messages received from the server to the message list
         '''
-        message_list.append(message + '\n')
\ No newline at end of file
+        message_list.extend(format_line(*format_message(message, username), width))
\ No newline at end of file
@@ -0,0 +1,197 @@
+'''
+test_async_client.py :
+Tests of the AsyncClient class, against a scripted server
+'''
+# --- Libraries --- #
+import asyncio
+from typing import Awaitable, Callable, List, Tuple
+
+import pytest
+
+from terminal_chat_app.async_client import AsyncClient
+from terminal_chat_app.base_socket import BaseSocket
+from terminal_chat_app.envelope import Envelope
+
+from .test_federation import HOST
+
+# --- Helpers --- #
+FRAMING: BaseSocket = BaseSocket()
+
+Handler = Callable[[asyncio.StreamReader, asyncio.StreamWriter], Awaitable[None]]
+
+
+async def read(reader: asyncio.StreamReader) -> Envelope:
+    '''
+    Next typed message sent by the client
+    '''
+    length: int = FRAMING.decode_header(await reader.readexactly(FRAMING.header_size))
+    return FRAMING.decode_envelope(await reader.readexactly(length))
+
+
+async def write(writer: asyncio.StreamWriter, *messages: Envelope) -> None:
+    '''
+    Send typed messages to the client, large ones in chunks
+    '''
+    for message in messages:
+        writer.writelines(FRAMING.encode_chunks(message))
+    await writer.drain()
+    return
+
+
+def run(handler: Handler, scenario: Callable[[AsyncClient], Awaitable[None]]) -> None:
+    '''
+    Serve every connection with `handler` and play `scenario` with a connected client
+    '''
+    async def main() -> None:
+        '''
+        Start the server, then the client
+        '''
+        server: asyncio.AbstractServer = await asyncio.start_server(handler, HOST, 0)
+        client: AsyncClient = AsyncClient(HOST, server.sockets[0].getsockname()[1])
+        await client.connect()
+
+        try:
+            await asyncio.wait_for(scenario(client), 5)
+        finally:
+            await client.close()
+            server.close()
+
+    asyncio.run(main())
+    return
+
+
+# --- Tests --- #
+def test_login() -> None:
+    '''
+    Login succeeds with the accepted username only
+    '''
+    async def handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        '''
+        Refuse the first username, accept the second
+        '''
+        await read(reader)
+        await write(writer, Envelope(Envelope.USERNAME_TAKEN, 'alice'))
+        await write(writer, Envelope(Envelope.LOGIN, (await read(reader)).text))
+
+    async def scenario(client: AsyncClient) -> None:
+        '''
+        Ask for a taken username, then a free one
+        '''
+        assert not await client.login('alice')
+        assert await client.login('bob')
+
+    run(handler, scenario)
+
+
+def test_pipelined_sends(monkeypatch: pytest.MonkeyPatch) -> None:
+    '''
+    Messages sent during the same loop iteration are written at once, in order
+    '''
+    received: List[Envelope] = []
+    writes: List[int] = []
+
+    async def handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        '''
+        Record the messages of the client
+        '''
+        for _ in range(4):
+            received.append(await read(reader))
+        await write(writer, Envelope(Envelope.QUIT))
+
+    async def scenario(client: AsyncClient) -> None:
+        '''
+        Send every type of message concurrently
+        '''
+        writelines: Callable[[List[bytes]], None] = client.writer.writelines
+
+        def count_writes(frames: List[bytes]) -> None:
+            '''
+            Record the number of frames of every write
+            '''
+            writes.append(len(frames))
+            writelines(frames)
+
+        monkeypatch.setattr(client.writer, 'writelines', count_writes)
+
+        await asyncio.gather(client.send('hi'), client.join('dev'), client.send_direct('bob', 'psst'), client.request_history())
+        assert [message async for message in client] == []
+
+    run(handler, scenario)
+
+    assert writes == [4]
+    assert [(message.kind, message.text, message.sender, message.seq) for message in received] == [
+        (Envelope.CHAT, 'hi', '', 0),
+        (Envelope.JOIN, 'dev', '', 0),
+        (Envelope.DIRECT, 'psst', 'bob', 0),
+        (Envelope.HISTORY, '', '', 0),
+    ]
+
+
+def test_iteration() -> None:
+    '''
+    Heartbeats are answered and session tokens kept, both are skipped,
+    large messages are reassembled and iteration stops when the server leaves
+    '''
+    answers: List[int] = []
+    large: str = 'x' * (3 * FRAMING.CHUNK_SIZE + 1)
+
+    async def handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        '''
+        Send a heartbeat, a session token and room messages, then close
+        '''
+        await write(writer, Envelope(Envelope.PING), Envelope(Envelope.SESSION, 'token'))
+        await write(writer, Envelope(Envelope.CHAT, 'hi', 'alice', 4), Envelope(Envelope.CHAT, large, 'alice', 5))
+        answers.append((await read(reader)).kind)
+        writer.close()
+
+    async def scenario(client: AsyncClient) -> None:
+        '''
+        Read every message until the connection is closed
+        '''
+        messages: List[Envelope] = [message async for message in client]
+
+        assert [(message.text, message.seq) for message in messages] == [('hi', 4), (large, 5)]
+        assert client.session_token == 'token'
+        assert client.next_seq == 6
+
+    run(handler, scenario)
+
+    assert answers == [Envelope.PONG]
+
+
+def test_resume() -> None:
+    '''
+    A client resumes its session on a new connection, from the first message it missed
+    '''
+    requests: List[Tuple[int, str, int]] = []
+
+    async def handler(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        '''
+        Open a session on the first connection, accept its resume on the second
+        '''
+        request: Envelope = await read(reader)
+        requests.append((request.kind, request.text, request.seq))
+
+        if request.kind == Envelope.LOGIN:
+            await write(writer, Envelope(Envelope.LOGIN, 'alice'), Envelope(Envelope.SESSION, 'token'))
+            await write(writer, Envelope(Envelope.CHAT, 'hi', 'alice', 7))
+            writer.close()
+        else:
+            await write(writer, Envelope(Envelope.LOGIN, 'alice'), Envelope(Envelope.QUIT))
+
+    async def scenario(client: AsyncClient) -> None:
+        '''
+        Log in, lose the connection and resume
+        '''
+        assert not await client.resume()
+        assert await client.login('alice')
+        assert [message.text async for message in client] == ['hi']
+
+        with pytest.raises(ConnectionResetError):
+            await client.send('lost')
+
+        assert await client.resume()
+
+    run(handler, scenario)
+
+    assert requests == [(Envelope.LOGIN, 'alice', 0), (Envelope.RESUME, 'token', 8)]
@@ -0,0 +1,173 @@
+'''
+test_base_socket.py :
+Tests of the length framing of BaseSocket
+'''
+# --- Libraries --- #
+from typing import List
+
+import pytest
+
+from terminal_chat_app.base_socket import BaseSocket
+from terminal_chat_app.envelope import Envelope
+from terminal_chat_app.receive_buffer import ReceiveBuffer
+
+# --- Helpers --- #
+class TrickleSocket:
+    '''
+    TrickleSocket class -
+    Socket stand-in that returns at most `step` bytes per read,
+    like a connection whose frames are split across TCP segments,
+    and accepts at most `accept` bytes per write
+    '''
+    def __init__(self, data: bytes=b'', step: int=1, accept: int=0) -> None:
+        '''
+        Initialization
+        '''
+        self.data: bytes = data
+        self.step: int = step
+        self.accept: int = accept
+        self.written: List[bytes] = []
+
+
+    def recv_into(self, view: memoryview) -> int:
+        '''
+        Copy the next few bytes into `view`, 0 once the data is exhausted
+        '''
+        count: int = min(self.step, len(view), len(self.data))
+        view[:count] = self.data[:count]
+        self.data = self.data[count:]
+        return count
+
+
+    def sendmsg(self, frames: List[bytes]) -> int:
+        '''
+        Accept up to `accept` bytes of the frames
+        '''
+        data: bytes = b''.join(bytes(frame) for frame in frames)
+        sent: bytes = data[:self.accept] if self.accept else data
+        self.written.append(sent)
+        return len(sent)
+
+
+@pytest.fixture(params=[1, 2])
+def framing(request: pytest.FixtureRequest) -> BaseSocket:
+    '''
+    BaseSocket using each framing version
+    '''
+    base: BaseSocket = BaseSocket()
+    base.FRAMING_VERSION = request.param
+    return base
+
+
+# --- Tests --- #
+def test_header_sizes(framing: BaseSocket) -> None:
+    '''
+    Version 1 pads an ASCII length to HEADER bytes, version 2 packs it in 4 bytes
+    '''
+    header: bytes = framing.encode_header(1234)
+
+    assert len(header) == framing.header_size == (BaseSocket.HEADER if framing.FRAMING_VERSION == 1 else 4)
+    assert framing.decode_header(header) == 1234
+
+
+def test_binary_header_is_big_endian() -> None:
+    '''
+    Version 2 headers are 4-byte big-endian unsigned integers
+    '''
+    base: BaseSocket = BaseSocket()
+    base.FRAMING_VERSION = 2
+
+    assert base.encode_header(0x01020304) == b'\x01\x02\x03\x04'
+
+
+def test_length_counts_bytes(framing: BaseSocket) -> None:
+    '''
+    The header holds the encoded length of multi-byte text, not its character count
+    '''
+    frame: bytes = framing.encode_message('é€😀')
+
+    assert framing.decode_header(frame[:framing.header_size]) == 9
+    assert len(frame) == framing.header_size + 9
+
+
+def test_receive_split_frames(framing: BaseSocket) -> None:
+    '''
+    Frames delivered a byte at a time are read whole, one after the other
+    '''
+    first: Envelope = Envelope(Envelope.CHAT, 'héllo', 'alice', seq=3)
+    second: Envelope = Envelope(Envelope.NOTICE, 'bye')
+    conn: TrickleSocket = TrickleSocket(framing.encode_envelope(first) + framing.encode_envelope(second))
+
+    received: Envelope = framing.receive_envelope(conn)
+    assert (received.kind, received.text, received.sender, received.seq) == (Envelope.CHAT, 'héllo', 'alice', 3)
+    assert framing.receive_envelope(conn).text == 'bye'
+
+
+def test_receive_truncated_frame(framing: BaseSocket) -> None:
+    '''
+    A connection closed in the middle of a frame is reported as reset
+    '''
+    conn: TrickleSocket = TrickleSocket(framing.encode_message('truncated')[:-2], step=4)
+
+    with pytest.raises(ConnectionResetError):
+        framing.receive_message(conn)
+
+
+def test_receive_oversized_frame(framing: BaseSocket) -> None:
+    '''
+    A frame larger than the largest message allowed is rejected before its payload is read
+    '''
+    conn: TrickleSocket = TrickleSocket(framing.encode_header(framing.max_frame_size + 1))
+
+    with pytest.raises(ValueError):
+        framing.receive_envelope(conn)
+
+
+def test_send_frames_partial_write(framing: BaseSocket) -> None:
+    '''
+    Frames are written with one call, which reports how much the socket accepted
+    '''
+    conn: TrickleSocket = TrickleSocket(accept=5)
+
+    assert framing.send_frames(conn, [b'AAA', b'BBBB']) == 5
+    assert conn.written == [b'AAABB']
+
+
+def test_send_frames_iov_limit() -> None:
+    '''
+    A single write never passes more than IOV_MAX frames
+    '''
+    base: BaseSocket = BaseSocket()
+    base.IOV_MAX = 2
+    conn: TrickleSocket = TrickleSocket()
+
+    assert base.send_frames(conn, [b'A', b'B', b'C']) == 2
+
+
+def test_buffered_frames_before_malformed_frame(framing: BaseSocket) -> None:
+    '''
+    The messages buffered before a malformed frame are returned,
+    and the error is raised by the next read
+    '''
+    buffer: ReceiveBuffer = ReceiveBuffer(framing)
+    buffer.feed(framing.encode_envelope(Envelope(Envelope.CHAT, 'first')))
+    buffer.feed(framing.encode_message('bad'))
+
+    assert [message.text for message in buffer.envelopes()] == ['first']
+    with pytest.raises(ValueError):
+        buffer.envelopes()
+    assert buffer.envelopes() == []
+
+
+def test_buffered_frames_before_oversized_frame(framing: BaseSocket) -> None:
+    '''
+    The messages buffered before an oversized frame are returned,
+    and the oversized frame is rejected by the next read
+    '''
+    buffer: ReceiveBuffer = ReceiveBuffer(framing)
+    buffer.feed(framing.encode_envelope(Envelope(Envelope.CHAT, 'first')))
+    buffer.feed(framing.encode_header(framing.max_frame_size + 1))
+
+    assert [message.text for message in buffer.envelopes()] == ['first']
+    with pytest.raises(ValueError):
+        buffer.envelopes()
@@ -0,0 +1,113 @@
+'''
+test_chunking.py :
+Tests of the splitting of large messages and of the EnvelopeAssembler class
+'''
+# --- Libraries --- #
+from typing import List, Optional
+
+import pytest
+
+from terminal_chat_app.envelope import Envelope, EnvelopeAssembler
+
+# --- Helpers --- #
+def reassemble(assembler: EnvelopeAssembler, parts: List[Envelope]) -> List[Envelope]:
+    '''
+    Feed received messages to the assembler and return the complete ones
+    '''
+    complete: List[Envelope] = []
+
+    for part in parts:
+        message: Optional[Envelope] = assembler.add(Envelope.decode(part.encode()))
+        if message is not None:
+            complete.append(message)
+
+    return complete
+
+
+# --- Tests --- #
+def test_small_message_not_split() -> None:
+    '''
+    Messages that fit in a chunk, or with chunking disabled, are sent alone
+    '''
+    message: Envelope = Envelope(Envelope.CHAT, 'x' * 16)
+
+    assert message.split(16) == [message]
+    assert message.split(0) == [message]
+
+
+def test_split_into_chunks() -> None:
+    '''
+    A large message becomes chunks followed by the message itself, flagged as continued
+    '''
+    message: Envelope = Envelope(Envelope.CHAT, 'abcdefghij', 'alice', seq=4, timestamp=1.0)
+    parts: List[Envelope] = message.split(4)
+
+    assert [part.kind for part in parts] == [Envelope.CHUNK, Envelope.CHUNK, Envelope.CHAT]
+    assert [part.text for part in parts] == ['abcd', 'efgh', 'ij']
+    assert (parts[-1].sender, parts[-1].seq, parts[-1].flags) == ('alice', 4, Envelope.CONTINUED)
+    assert all(part.timestamp == 1.0 for part in parts)
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 7])
+def test_split_multibyte_boundaries(size: int) -> None:
+    '''
+    Characters cut by a chunk boundary are carried over whole to the next part
+    '''
+    text: str = 'aé€😀' * 5
+    parts: List[Envelope] = Envelope(Envelope.CHAT, text).split(size)
+
+    assert len(parts) > 1
+    assert ''.join(part.text for part in parts) == text
+    assert all(len(part.text.encode()) < size + 4 for part in parts)
+
+
+def test_reassemble() -> None:
+    '''
+    The chunks are collected and the full message comes back without the continued flag
+    '''
+    text: str = 'héllo wörld 😀' * 20
+    complete: List[Envelope] = reassemble(EnvelopeAssembler(), Envelope(Envelope.CHAT, text, 'alice').split(8))
+
+    assert len(complete) == 1
+    assert (complete[0].kind, complete[0].text, complete[0].sender, complete[0].flags) == (Envelope.CHAT, text, 'alice', 0)
+
+
+def test_messages_between_chunks() -> None:
+    '''
+    Messages that are not split pass through while a large message is being collected
+    '''
+    parts: List[Envelope] = Envelope(Envelope.CHAT, 'abcdefghij').split(4)
+    complete: List[Envelope] = reassemble(EnvelopeAssembler(), parts[:1] + [Envelope(Envelope.PONG)] + parts[1:])
+
+    assert [(message.kind, message.text) for message in complete] == [(Envelope.PONG, ''), (Envelope.CHAT, 'abcdefghij')]
+
+
+def test_consecutive_messages() -> None:
+    '''
+    The assembler starts over after every complete message
+    '''
+    parts: List[Envelope] = Envelope(Envelope.CHAT, 'abcdefghij').split(4) + Envelope(Envelope.CHAT, '0123456789').split(4)
+
+    assert [message.text for message in reassemble(EnvelopeAssembler(), parts)] == ['abcdefghij', '0123456789']
+
+
+def test_oversized_split_message() -> None:
+    '''
+    A split message growing past the limit is dropped and flagged as oversized,
+    without affecting the next message
+    '''
+    assembler: EnvelopeAssembler = EnvelopeAssembler(6)
+    parts: List[Envelope] = Envelope(Envelope.CHAT, 'abcdefghij').split(4) + Envelope(Envelope.CHAT, 'abcdef').split(4)
+    complete: List[Envelope] = reassemble(assembler, parts)
+
+    assert (complete[0].text, complete[0].flags) == ('', Envelope.OVERSIZED)
+    assert (complete[1].text, complete[1].flags) == ('abcdef', 0)
+
+
+def test_oversized_single_message() -> None:
+    '''
+    A message sent whole past the limit is dropped and flagged as oversized too
+    '''
+    complete: List[Envelope] = reassemble(EnvelopeAssembler(4), [Envelope(Envelope.CHAT, 'abcdef')])
+
+    assert (complete[0].text, complete[0].flags) == ('', Envelope.OVERSIZED)
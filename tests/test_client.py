@@ -0,0 +1,69 @@
+'''
+test_client.py :
+Tests of the commands typed in the Client class
+'''
+# --- Libraries --- #
+import socket
+from typing import Iterator, Tuple
+
+import pytest
+
+from terminal_chat_app.client import Client
+from terminal_chat_app.envelope import Envelope
+
+# --- Helpers --- #
+@pytest.fixture
+def client() -> Iterator[Client]:
+    '''
+    Client connected to a listener that never answers
+    '''
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as listener:
+        listener.bind(('127.0.0.1', 0))
+        listener.listen()
+        connected: Client = Client(*listener.getsockname())
+        yield connected
+        connected.close_socket()
+
+
+def parsed(client: Client, text: str) -> Tuple[int, str, str, int]:
+    '''
+    Type, text, sender and sequence number of the message built for a typed line
+    '''
+    message: Envelope = client.parse_input(text)
+    return message.kind, message.text, message.sender, message.seq
+
+
+# --- Tests --- #
+def test_chat(client: Client) -> None:
+    '''
+    Lines that are not commands are sent as they are, slashes included
+    '''
+    assert parsed(client, 'hello /join') == (Envelope.CHAT, 'hello /join', '', 0)
+    assert parsed(client, '/unknown x') == (Envelope.CHAT, '/unknown x', '', 0)
+
+
+def test_rooms(client: Client) -> None:
+    '''
+    Room commands carry the room in the text, a join without room is a chat message
+    '''
+    assert parsed(client, '/join  games ') == (Envelope.JOIN, 'games', '', 0)
+    assert parsed(client, '/leave') == (Envelope.LEAVE, '', '', 0)
+    assert parsed(client, '/join') == (Envelope.CHAT, '/join', '', 0)
+
+
+def test_direct(client: Client) -> None:
+    '''
+    Private messages carry the recipient in the sender field
+    '''
+    assert parsed(client, '/msg bob hi there') == (Envelope.DIRECT, 'hi there', 'bob', 0)
+    assert parsed(client, '/msg bob') == (Envelope.DIRECT, '', 'bob', 0)
+
+
+def test_history(client: Client) -> None:
+    '''
+    History requests carry the sequence number in its field, 0 for the last page
+    '''
+    assert parsed(client, '/history 42') == (Envelope.HISTORY, '', '', 42)
+    assert parsed(client, '/history') == (Envelope.HISTORY, '', '', 0)
+    assert parsed(client, '/history ²') == (Envelope.HISTORY, '', '', 0)
+    assert parsed(client, '/history -3') == (Envelope.HISTORY, '', '', 0)
@@ -0,0 +1,115 @@
+'''
+test_cluster.py :
+Tests of the ClusterHub class, relaying events between workers
+'''
+# --- Libraries --- #
+import io
+import json
+import socket
+import threading
+from typing import Any, Dict, Iterator, List, Tuple
+
+import pytest
+
+from terminal_chat_app.base_socket import BaseSocket
+from terminal_chat_app.cluster import ClusterHub
+from terminal_chat_app.envelope import Envelope
+from terminal_chat_app.logger import AsyncLogger
+from terminal_chat_app.receive_buffer import ReceiveBuffer
+
+from .test_federation import wait_for
+
+# --- Helpers --- #
+FRAMING: BaseSocket = BaseSocket()
+
+
+def send_event(worker: socket.socket, event: Dict[str, Any]) -> None:
+    '''
+    Send an event to the hub, as a worker does
+    '''
+    FRAMING.send_message(worker, json.dumps(event))
+    return
+
+
+def collect(worker: socket.socket) -> List[Dict[str, Any]]:
+    '''
+    Collect the events the hub sends to a worker from now on
+    '''
+    events: List[Dict[str, Any]] = []
+
+    def receive() -> None:
+        '''
+        Read events until the hub closes the connection
+        '''
+        buffer: ReceiveBuffer = ReceiveBuffer(FRAMING)
+        try:
+            while True:
+                events.extend(json.loads(raw) for raw in buffer.receive(worker))
+        except OSError:
+            pass
+
+    threading.Thread(target=receive, daemon=True).start()
+    return events
+
+
+@pytest.fixture
+def cluster(monkeypatch: pytest.MonkeyPatch) -> Iterator[Tuple[ClusterHub, List[socket.socket]]]:
+    '''
+    Hub serving three workers, with small queues, and the worker ends of their connections
+    '''
+    monkeypatch.setattr(ClusterHub, 'LINK_QUEUE_SIZE', 64)
+    hub_ends, worker_ends = zip(*(socket.socketpair() for _ in range(3)))
+    hub: ClusterHub = ClusterHub(list(hub_ends), AsyncLogger('ERROR', io.StringIO()))
+    threading.Thread(target=hub.serve, daemon=True).start()
+
+    yield hub, list(worker_ends)
+
+    for worker in worker_ends:
+        worker.close()
+
+
+# --- Tests --- #
+def test_username_claims(cluster: Tuple[ClusterHub, List[socket.socket]]) -> None:
+    '''
+    A username is granted to a single worker, until it releases it
+    '''
+    hub, (first, second, _) = cluster
+    first_events: List[Dict[str, Any]] = collect(first)
+    second_events: List[Dict[str, Any]] = collect(second)
+
+    send_event(first, {'type': 'claim', 'id': 0, 'name': 'alice'})
+    assert wait_for(lambda: first_events == [{'type': 'claimed', 'id': 0, 'granted': True}])
+
+    send_event(second, {'type': 'claim', 'id': 0, 'name': 'alice'})
+    assert wait_for(lambda: len(second_events) == 1)
+
+    # Events of different workers are not ordered, the release must be handled first
+    send_event(first, {'type': 'release', 'name': 'alice'})
+    assert wait_for(lambda: 'alice' not in hub.usernames)
+    send_event(second, {'type': 'claim', 'id': 1, 'name': 'alice'})
+
+    assert wait_for(lambda: len(second_events) == 2)
+    assert [event['granted'] for event in second_events] == [False, True]
+
+
+def test_stalled_worker_dropped(cluster: Tuple[ClusterHub, List[socket.socket]]) -> None:
+    '''
+    Broadcasts keep reaching the workers that read them while a worker
+    that stopped reading is dropped once its queue is full
+    '''
+    hub, (sender, reader, _) = cluster
+    stalled: socket.socket = list(hub.buffers)[2]
+    received: List[Dict[str, Any]] = collect(reader)
+    message: List[Any] = Envelope(Envelope.CHAT, 'x' * 65536, 'alice').fields()
+
+    def publish() -> None:
+        '''
+        Send broadcasts from a worker, as fast as the hub reads them
+        '''
+        for _ in range(256):
+            send_event(sender, {'type': 'publish', 'message': message, 'room': None})
+
+    threading.Thread(target=publish, daemon=True).start()
+
+    assert wait_for(lambda: stalled not in hub.buffers)
+    assert wait_for(lambda: len(received) == 256, timeout=10)
@@ -0,0 +1,104 @@
+'''
+test_envelope.py :
+Tests of the Envelope codec
+'''
+# --- Libraries --- #
+import struct
+
+import pytest
+
+from terminal_chat_app.envelope import Envelope
+
+# --- Tests --- #
+def test_round_trip() -> None:
+    '''
+    Every field survives encoding and decoding, multi-byte text included
+    '''
+    message: Envelope = Envelope(Envelope.PRIVATE, 'héllo 😀', 'zoë', seq=2**40, timestamp=1234.5, flags=Envelope.REPLAY)
+    decoded: Envelope = Envelope.decode(message.encode())
+
+    assert (decoded.kind, decoded.text, decoded.sender, decoded.seq, decoded.timestamp, decoded.flags) == \
+        (Envelope.PRIVATE, 'héllo 😀', 'zoë', 2**40, 1234.5, Envelope.REPLAY)
+
+
+def test_header_layout() -> None:
+    '''
+    The header is packed big-endian, followed by the sender and the text
+    '''
+    payload: bytes = Envelope(Envelope.CHAT, 'hi', 'al', seq=7, timestamp=0.0).encode()
+
+    assert len(payload) == Envelope.HEADER.size + 4 == 24
+    assert payload[:2] == bytes([Envelope.CHAT, 0])
+    assert payload[2:10] == (7).to_bytes(8, 'big')
+    assert payload[18:] == b'\x00\x02alhi'
+
+
+def test_decode_memoryview() -> None:
+    '''
+    Payloads can be decoded straight from a receive buffer
+    '''
+    payload: bytes = Envelope(Envelope.NOTICE, 'text').encode()
+
+    assert Envelope.decode(memoryview(payload)).text == 'text'
+
+
+def test_empty_fields() -> None:
+    '''
+    Messages without sender or text only take the header
+    '''
+    payload: bytes = Envelope(Envelope.PING).encode()
+    decoded: Envelope = Envelope.decode(payload)
+
+    assert len(payload) == Envelope.HEADER.size
+    assert (decoded.kind, decoded.text, decoded.sender) == (Envelope.PING, '', '')
+
+
+def test_truncated_header() -> None:
+    '''
+    A payload shorter than the header is rejected
+    '''
+    with pytest.raises(ValueError):
+        Envelope.decode(Envelope(Envelope.CHAT, 'text').encode()[:Envelope.HEADER.size - 1])
+
+
+def test_sender_out_of_bounds() -> None:
+    '''
+    A sender length pointing past the end of the payload is rejected
+    '''
+    payload: bytes = struct.pack('!BBQdH', Envelope.CHAT, 0, 0, 0.0, 10) + b'alice'
+
+    with pytest.raises(ValueError):
+        Envelope.decode(payload)
+
+
+def test_invalid_text_encoding() -> None:
+    '''
+    Text that is not valid UTF-8 is rejected like any malformed payload
+    '''
+    payload: bytes = Envelope(Envelope.CHAT).encode() + b'\xff\xfe'
+
+    with pytest.raises(ValueError):
+        Envelope.decode(payload)
+
+
+def test_replay() -> None:
+    '''
+    A replayed copy keeps every field and the original message is unchanged
+    '''
+    message: Envelope = Envelope(Envelope.CHAT, 'text', 'alice', seq=3, timestamp=1.0, flags=Envelope.CONTINUED)
+    replayed: Envelope = message.replay()
+
+    assert replayed.replayed and not message.replayed
+    assert replayed.flags == Envelope.CONTINUED | Envelope.REPLAY
+    assert (replayed.kind, replayed.text, replayed.sender, replayed.seq, replayed.timestamp) == \
+        (Envelope.CHAT, 'text', 'alice', 3, 1.0)
+
+
+def test_fields_round_trip() -> None:
+    '''
+    The JSON serializable fields rebuild the message
+    '''
+    message: Envelope = Envelope(Envelope.CHAT, 'text', 'alice', seq=3, timestamp=1.0)
+    rebuilt: Envelope = Envelope(*message.fields())
+
+    assert rebuilt.fields() == message.fields()
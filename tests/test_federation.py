@@ -0,0 +1,247 @@
+'''
+test_federation.py :
+Tests of the FederationBus class, on three linked nodes
+'''
+# --- Libraries --- #
+import json
+import time
+import socket
+import threading
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import pytest
+
+from terminal_chat_app.client import Client
+from terminal_chat_app.envelope import Envelope
+from terminal_chat_app.federation import FederationBus
+from terminal_chat_app.server import Server
+
+# --- Helpers --- #
+HOST: str = '127.0.0.1'
+
+
+def free_port() -> int:
+    '''
+    Port the system picks for an ephemeral listener
+    '''
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+        probe.bind((HOST, 0))
+        return probe.getsockname()[1]
+
+
+def wait_for(predicate: Callable[[], bool], timeout: float=5.0) -> bool:
+    '''
+    Poll `predicate` until it holds, or the timeout elapses
+    '''
+    deadline: float = time.monotonic() + timeout
+
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+
+    return True
+
+
+class Node:
+    '''
+    Node class -
+    Thread server linked to the nodes started before it
+    '''
+    def __init__(self, peer_addresses: List[Tuple[str, int]]) -> None:
+        '''
+        Initialization
+        '''
+        self.address: Tuple[str, int] = (HOST, free_port())
+        self.peer_address: Tuple[str, int] = (HOST, free_port())
+        self.server: Server = Server(*self.address)
+        self.bus: FederationBus = FederationBus(self.server, self.peer_address, peer_addresses)
+        self.server.bus = self.bus
+        self.clients: List[Client] = []
+
+
+    def start(self) -> None:
+        '''
+        Start accepting clients and peer links
+        '''
+        self.bus.start()
+        threading.Thread(target=self.server.start_server, daemon=True).start()
+        return
+
+
+    def login(self, username: str) -> Tuple[Client, Envelope]:
+        '''
+        Connect a client and request a username, returning the client and the reply
+        '''
+        client: Client = Client(*self.address)
+        self.clients.append(client)
+        return client, client.send_username(username)
+
+
+    def stop(self) -> None:
+        '''
+        Disconnect the clients and stop the node
+        '''
+        for client in self.clients:
+            client.disconnect()
+
+        self.bus.running = False
+        self.server.server_up = False
+        return
+
+
+def listen(client: Client) -> List[Envelope]:
+    '''
+    Collect the messages a client receives from now on
+    '''
+    received: List[Envelope] = []
+    client.start_listening(received.append)
+    return received
+
+
+def chats(received: List[Envelope]) -> List[Tuple[str, str]]:
+    '''
+    Sender and text of the chat messages received
+    '''
+    return [(message.sender, message.text) for message in list(received) if message.kind == Envelope.CHAT]
+
+
+@pytest.fixture
+def nodes() -> Iterator[List[Node]]:
+    '''
+    Three nodes linked as a full mesh
+    '''
+    mesh: List[Node] = []
+    for _ in range(3):
+        mesh.append(Node([node.peer_address for node in mesh]))
+
+    for node in mesh:
+        node.start()
+
+    assert wait_for(lambda: all(len(node.bus.peers) == 2 for node in mesh))
+    yield mesh
+
+    for node in mesh:
+        node.stop()
+
+
+# --- Tests --- #
+def test_broadcast_relayed_once(nodes: List[Node]) -> None:
+    '''
+    A broadcast reaches the clients of every node exactly once, although
+    each node of the mesh also receives it from the node that forwarded it
+    '''
+    received: Dict[str, List[Envelope]] = {}
+    for index, node in enumerate(nodes):
+        client, reply = node.login('user%d' % index)
+        assert reply.kind == Envelope.LOGIN
+        received[reply.text] = listen(client)
+
+    for index, node in enumerate(nodes):
+        node.clients[0].send_client_message('hello from %d' % index)
+
+    expected: List[Tuple[str, str]] = sorted(('user%d' % index, 'hello from %d' % index) for index in range(3))
+    assert wait_for(lambda: all(len(chats(messages)) >= 3 for messages in received.values()))
+    time.sleep(0.2)
+
+    for messages in received.values():
+        assert sorted(chats(messages)) == expected
+
+
+def test_duplicate_publish_ignored(nodes: List[Node]) -> None:
+    '''
+    A publish event already seen, under the same message ID, is not delivered again
+    '''
+    client, _ = nodes[1].login('bob')
+    received: List[Envelope] = listen(client)
+    event: Dict = {'type': 'publish', 'id': 'elsewhere:1', 'message': Envelope(Envelope.CHAT, 'once', 'alice').fields(), 'room': None}
+
+    for peer_id, conn in list(nodes[1].bus.peers.items()):
+        nodes[1].bus.handle_peer_event(peer_id, conn, event)
+
+    assert wait_for(lambda: chats(received) == [('alice', 'once')])
+    time.sleep(0.2)
+    assert chats(received) == [('alice', 'once')]
+
+
+def test_private_message_relayed(nodes: List[Node]) -> None:
+    '''
+    A private message reaches a recipient on another node,
+    and the receipt comes back to the sender's node
+    '''
+    alice, _ = nodes[0].login('alice')
+    bob, _ = nodes[2].login('bob')
+    sent: List[Envelope] = listen(alice)
+    received: List[Envelope] = listen(bob)
+
+    alice.send_direct('bob', 'psst')
+
+    assert wait_for(lambda: any(message.kind == Envelope.PRIVATE for message in received))
+    assert [(message.sender, message.text) for message in received if message.kind == Envelope.PRIVATE] == [('alice', 'psst')]
+    assert wait_for(lambda: any(message.kind == Envelope.DELIVERED for message in sent))
+
+
+def test_username_reserved_across_nodes(nodes: List[Node]) -> None:
+    '''
+    A username held on one node is refused on the others,
+    and available to all of them once its client leaves
+    '''
+    alice, reply = nodes[0].login('alice')
+    assert reply.kind == Envelope.LOGIN
+
+    for node in nodes[1:]:
+        _, reply = node.login('alice')
+        assert reply.kind == Envelope.USERNAME_TAKEN
+
+    alice.disconnect()
+    assert wait_for(lambda: all('alice' not in node.bus.remote_usernames for node in nodes[1:]))
+
+    _, reply = nodes[2].login('alice')
+    assert reply.kind == Envelope.LOGIN
+
+
+def test_concurrent_claims(nodes: List[Node]) -> None:
+    '''
+    When two nodes claim the same username at once, at most one gets it
+    '''
+    results: List[bool] = []
+    answered: threading.Event = threading.Event()
+
+    def record(granted: bool) -> None:
+        '''
+        Collect the outcome of a claim
+        '''
+        results.append(granted)
+        if len(results) == 2:
+            answered.set()
+
+    nodes[0].bus.claim_username('carol', record)
+    nodes[1].bus.claim_username('carol', record)
+
+    assert answered.wait(FederationBus.CLAIM_TIMEOUT + 1)
+    assert results.count(True) <= 1
+
+
+def test_stalled_peer_dropped() -> None:
+    '''
+    Broadcasts never wait for a peer that stopped reading,
+    whose link is dropped once its queue is full
+    '''
+    node: Node = Node([])
+    node.bus.LINK_QUEUE_SIZE = 64
+    node.start()
+
+    stalled: socket.socket = socket.create_connection(node.peer_address)
+    stalled.sendall(node.bus.encode_message(json.dumps({'type': 'hello', 'node': 'stalled', 'usernames': []})))
+    assert wait_for(lambda: 'stalled' in node.bus.peers)
+
+    message: Envelope = Envelope(Envelope.CHAT, 'x' * 65536, 'alice')
+    started: float = time.monotonic()
+    for _ in range(256):
+        node.bus.publish(message)
+
+    assert time.monotonic() - started < 2
+    assert wait_for(lambda: 'stalled' not in node.bus.peers)
+
+    stalled.close()
+    node.stop()
@@ -0,0 +1,136 @@
+'''
+test_handoff.py :
+Tests of the Handoff class, handing a reactor server over in-process
+'''
+# --- Libraries --- #
+import json
+import socket
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import pytest
+
+from terminal_chat_app.envelope import Envelope
+from terminal_chat_app.handoff import Handoff
+from terminal_chat_app.reactor_server import ReactorServer
+
+from .test_federation import HOST, free_port, wait_for
+from .test_server import FRAMING, RawClient, connect
+
+# --- Helpers --- #
+def start(server: ReactorServer, path: str) -> None:
+    '''
+    Wait for a successor on `path`, then run the server's loop in the background
+    '''
+    Handoff(path).listen(server)
+    threading.Thread(target=server.start_server, daemon=True).start()
+    return
+
+
+@pytest.fixture
+def path(tmp_path: Path) -> str:
+    '''
+    Path of the Unix socket the servers hand themselves over on
+    '''
+    return str(tmp_path / 'handoff.sock')
+
+
+@pytest.fixture
+def servers() -> Iterator[List[ReactorServer]]:
+    '''
+    Servers started by a test, stopped at its end
+    '''
+    started: List[ReactorServer] = []
+    yield started
+
+    for server in started:
+        server.server_up = False
+
+
+# --- Tests --- #
+def test_take_over_without_server(path: str) -> None:
+    '''
+    Nothing is taken over when no server listens on the path
+    '''
+    assert Handoff(path).take_over() is None
+
+
+def test_hand_over_clients(path: str, servers: List[ReactorServer]) -> None:
+    '''
+    A new process takes the listening socket, the clients, their rooms
+    and the history over, and the clients keep chatting without reconnecting
+    '''
+    previous: ReactorServer = ReactorServer(HOST, free_port())
+    servers.append(previous)
+    start(previous, path)
+
+    alice, bob = RawClient(previous, 'alice'), RawClient(previous, 'bob')
+    alice.send(Envelope(Envelope.JOIN, 'dev'))
+    assert alice.expect(Envelope.ROOM).text == 'dev'
+    alice.send(Envelope(Envelope.CHAT, 'before'))
+    assert alice.expect(Envelope.CHAT).text == 'before'
+    history: List[str] = [message.text for message in previous.history.recent('dev')]
+
+    successor: ReactorServer = ReactorServer(HOST, free_port())
+    servers.append(successor)
+    handoff: Handoff = Handoff(path)
+    state: Optional[Dict[str, Any]] = handoff.take_over()
+
+    assert state is not None
+    assert len(state['clients']) == 2
+
+    successor.adopt(state)
+    handoff.complete()
+    start(successor, path)
+
+    assert not previous.server_up
+    assert successor.host_address == previous.host_address
+    assert [message.text for message in successor.history.recent('dev')] == history
+
+    # Room memberships and usernames moved along with the connections
+    alice.send(Envelope(Envelope.CHAT, 'after'))
+    assert alice.expect(Envelope.CHAT).text == 'after'
+    bob.send(Envelope(Envelope.CHAT, 'lobby'))
+    assert bob.expect(Envelope.CHAT).text == 'lobby'
+
+    taken: socket.socket = connect(successor)
+    FRAMING.send_envelope(taken, Envelope(Envelope.LOGIN, 'alice'))
+    assert FRAMING.receive_envelope(taken).kind == Envelope.USERNAME_TAKEN
+    taken.close()
+
+    carol: RawClient = RawClient(successor, 'carol')
+    carol.send(Envelope(Envelope.DIRECT, 'psst', 'alice'))
+    assert alice.expect(Envelope.PRIVATE).text == 'psst'
+
+    for client in (alice, bob, carol):
+        client.close()
+
+
+def test_failed_handoff_keeps_serving(path: str, servers: List[ReactorServer]) -> None:
+    '''
+    A server whose successor fails keeps its clients, and can still be handed over
+    '''
+    server: ReactorServer = ReactorServer(HOST, free_port())
+    servers.append(server)
+    start(server, path)
+    alice: RawClient = RawClient(server, 'alice')
+
+    link: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    link.connect(path)
+    Handoff(path).send_message(link, json.dumps({'type': 'unknown'}))
+
+    assert link.recv(1) == b''
+    link.close()
+
+    alice.send(Envelope(Envelope.CHAT, 'still here'))
+    assert alice.expect(Envelope.CHAT).text == 'still here'
+
+    # The server listens for a successor again
+    assert wait_for(lambda: Path(path).exists())
+    handoff: Handoff = Handoff(path)
+    assert len(handoff.take_over()['clients']) == 1
+    handoff.complete()
+
+    assert not server.server_up
+    alice.conn.close()
@@ -0,0 +1,75 @@
+'''
+test_history.py :
+Tests of the numbering of the MessageHistory class
+'''
+# --- Libraries --- #
+from typing import List, Tuple
+
+import pytest
+
+from terminal_chat_app.envelope import Envelope
+from terminal_chat_app.history import MessageHistory
+
+# --- Helpers --- #
+def record(history: MessageHistory, *texts: str) -> List[int]:
+    '''
+    Record chat messages in the lobby and return their sequence numbers
+    '''
+    return [history.record('lobby', Envelope(Envelope.CHAT, text, 'alice')) for text in texts]
+
+
+def numbered(messages: List[Envelope]) -> List[Tuple[int, str]]:
+    '''
+    Sequence number and text of messages
+    '''
+    return [(message.seq, message.text) for message in messages]
+
+
+@pytest.fixture(params=[False, True], ids=['memory', 'log'])
+def history(request: pytest.FixtureRequest, tmp_path: str) -> MessageHistory:
+    '''
+    History kept in memory only, or also in a log
+    '''
+    return MessageHistory(2, str(tmp_path) if request.param else '')
+
+
+# --- Tests --- #
+def test_numbering_starts_at_one(history: MessageHistory) -> None:
+    '''
+    The first message is numbered 1, since 0 marks messages outside any history
+    '''
+    assert record(history, 'a', 'b') == [1, 2]
+    assert numbered(history.recent('lobby')) == [(1, 'a'), (2, 'b')]
+
+
+def test_since(history: MessageHistory) -> None:
+    '''
+    A resumed client gets the messages numbered from the one it missed
+    '''
+    record(history, 'a', 'b')
+
+    assert numbered(history.since('lobby', 2, 10)) == [(2, 'b')]
+    assert numbered(history.since('lobby', 0, 10)) == [(1, 'a'), (2, 'b')]
+
+
+def test_log_paging_reaches_first_message(tmp_path: str) -> None:
+    '''
+    Paging back through the log stops at the first message
+    '''
+    history: MessageHistory = MessageHistory(2, str(tmp_path))
+    record(history, 'a', 'b', 'c', 'd')
+
+    assert numbered(history.page('lobby', 3, 10)) == [(2, 'b'), (1, 'a')]
+    assert history.page('lobby', 1, 10) == []
+
+
+def test_log_numbering_survives_restart(tmp_path: str) -> None:
+    '''
+    A history reopened from its log goes on numbering after its last message
+    '''
+    record(MessageHistory(2, str(tmp_path)), 'a', 'b', 'c')
+    history: MessageHistory = MessageHistory(2, str(tmp_path))
+
+    assert numbered(history.recent('lobby')) == [(2, 'b'), (3, 'c')]
+    assert record(history, 'd') == [4]
+    assert numbered(history.page('lobby', None, 10)) == [(4, 'd'), (3, 'c'), (2, 'b'), (1, 'a')]
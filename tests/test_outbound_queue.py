@@ -0,0 +1,190 @@
+'''
+test_outbound_queue.py :
+Tests of the OutboundQueue class
+'''
+# --- Libraries --- #
+import threading
+from typing import List, Union
+
+import pytest
+
+from terminal_chat_app.outbound_queue import OutboundQueue
+
+# --- Helpers --- #
+def write(queue: OutboundQueue, limit: int=0) -> bytes:
+    '''
+    Write the pending frames like a writer whose socket accepts
+    at most `limit` bytes, and return the bytes written
+    '''
+    data: bytes = b''.join(bytes(frame) for frame in queue.pending())
+    written: bytes = data[:limit] if limit else data
+    queue.consume(len(written))
+    return written
+
+
+def drain(queue: OutboundQueue) -> bytes:
+    '''
+    Write everything queued, chunks included
+    '''
+    written: bytes = b''
+
+    while len(queue):
+        written += write(queue)
+
+    return written
+
+
+# --- Tests --- #
+def test_unknown_policy() -> None:
+    '''
+    Only the known overflow policies are accepted
+    '''
+    with pytest.raises(ValueError):
+        OutboundQueue(4, 'drop_newest')
+
+
+def test_partial_writes() -> None:
+    '''
+    The unwritten tail of a partially written frame is written next
+    '''
+    queue: OutboundQueue = OutboundQueue(4, OutboundQueue.DISCONNECT)
+    queue.put(b'AAAA')
+    queue.put(b'BBBB')
+
+    assert write(queue, 3) == b'AAA'
+    assert queue.nbytes == 5
+    assert write(queue, 3) == b'ABB'
+    assert write(queue) == b'BB'
+    assert len(queue) == 0 and queue.nbytes == 0
+
+
+def test_disconnect_policy() -> None:
+    '''
+    A full queue asks for the connection to be dropped
+    '''
+    queue: OutboundQueue = OutboundQueue(2, OutboundQueue.DISCONNECT)
+
+    assert queue.put(b'A') and queue.put(b'B')
+    assert not queue.put(b'C')
+
+
+def test_drop_oldest_policy() -> None:
+    '''
+    A full queue drops its oldest frame to make room
+    '''
+    queue: OutboundQueue = OutboundQueue(2, OutboundQueue.DROP_OLDEST)
+
+    for frame in (b'A', b'B', b'C'):
+        assert queue.put(frame)
+
+    assert drain(queue) == b'BC'
+    assert queue.dropped == 1
+
+
+def test_drop_oldest_keeps_partially_written_frame() -> None:
+    '''
+    A partially written frame is never dropped, the next one is
+    '''
+    queue: OutboundQueue = OutboundQueue(2, OutboundQueue.DROP_OLDEST)
+    queue.put(b'AAAA')
+    queue.put(b'BBBB')
+
+    written: bytes = write(queue, 2)
+    queue.put(b'CCCC')
+    written += drain(queue)
+
+    assert written == b'AAAACCCC'
+    assert queue.dropped == 1
+
+
+def test_drop_oldest_keeps_frames_being_written() -> None:
+    '''
+    Frames handed to the writer are never dropped. When nothing else
+    can be dropped, the new frame is, and every written byte is consumed
+    '''
+    queue: OutboundQueue = OutboundQueue(3, OutboundQueue.DROP_OLDEST)
+    queue.put(b'AAAA')
+    queue.put(b'BBBB')
+
+    frames: List[Union[bytes, memoryview]] = queue.wait_for_frames()
+    queue.put(b'CC')
+    queue.put(b'DDDD')
+    queue.put(b'EEEE')
+    queue.consume(sum(len(frame) for frame in frames))
+
+    assert b''.join(frames) == b'AAAABBBB'
+    assert drain(queue) == b'EEEE'
+    assert queue.dropped == 2
+
+
+def test_block_policy() -> None:
+    '''
+    A full queue makes the sender wait until the writer catches up
+    '''
+    queue: OutboundQueue = OutboundQueue(1, OutboundQueue.BLOCK)
+    queue.put(b'A')
+
+    sender: threading.Thread = threading.Thread(target=queue.put, args=(b'B',))
+    sender.start()
+    sender.join(0.1)
+    assert sender.is_alive()
+
+    assert write(queue) == b'A'
+    sender.join(1)
+    assert not sender.is_alive()
+    assert write(queue) == b'B'
+
+
+def test_chunks_interleaved() -> None:
+    '''
+    Chunks are written one at a time, each behind the frames queued meanwhile
+    '''
+    queue: OutboundQueue = OutboundQueue(8, OutboundQueue.DISCONNECT)
+    queue.put_chunks([b'1', b'2', b'3'])
+    queue.put(b'a')
+
+    assert write(queue) == b'1a'
+    queue.put(b'b')
+    assert write(queue) == b'2b'
+    assert write(queue) == b'3'
+    assert len(queue) == 0
+
+
+def test_chunked_messages_in_order() -> None:
+    '''
+    Chunked messages are written one after the other, never mixed
+    '''
+    queue: OutboundQueue = OutboundQueue(8, OutboundQueue.DISCONNECT)
+    queue.put_chunks([b'1', b'2'])
+    queue.put_chunks([b'x', b'y'])
+
+    assert queue.backlog() == [b'2', b'x', b'y']
+    assert drain(queue) == b'12xy'
+
+
+def test_drop_oldest_keeps_chunk_being_written() -> None:
+    '''
+    Dropping the oldest entry never drops the released chunk of a
+    chunked message, so the message is sent whole or not at all
+    '''
+    queue: OutboundQueue = OutboundQueue(2, OutboundQueue.DROP_OLDEST)
+    queue.put_chunks([b'1', b'2'])
+    queue.put(b'a')
+    queue.put(b'b')
+
+    assert drain(queue) == b'1b2'
+    assert queue.dropped == 1
+
+
+def test_close_discard() -> None:
+    '''
+    A discarded queue hands nothing out and wakes up its writer
+    '''
+    queue: OutboundQueue = OutboundQueue(4, OutboundQueue.DISCONNECT)
+    queue.put(b'A')
+    queue.put_chunks([b'1', b'2'])
+    queue.close(discard=True)
+
+    assert queue.wait_for_frames() == []
+    assert len(queue) == 0 and queue.nbytes == 0
+    assert queue.put(b'B') and len(queue) == 0
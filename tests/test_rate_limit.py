@@ -0,0 +1,71 @@
+'''
+test_rate_limit.py :
+Tests of the TokenBucket class
+'''
+# --- Libraries --- #
+from terminal_chat_app.rate_limit import TokenBucket
+
+# --- Helpers --- #
+def take_all(bucket: TokenBucket, now: float, count: int) -> int:
+    '''
+    Try to take `count` tokens at the same instant, and return how many were taken
+    '''
+    return sum(bucket.take(now) for _ in range(count))
+
+
+# --- Tests --- #
+def test_burst() -> None:
+    '''
+    A full bucket allows a burst of `burst` events, then rejects and counts the rest
+    '''
+    bucket: TokenBucket = TokenBucket(2, 5)
+    now: float = bucket.updated
+
+    assert take_all(bucket, now, 8) == 5
+    assert bucket.rejected == 3
+
+
+def test_refill_rate() -> None:
+    '''
+    Tokens come back at `rate` per second, fractions included
+    '''
+    bucket: TokenBucket = TokenBucket(2, 5)
+    now: float = bucket.updated
+    take_all(bucket, now, 5)
+
+    assert not bucket.take(now + 0.25)
+    assert bucket.take(now + 0.5)
+    assert take_all(bucket, now + 1.5, 3) == 2
+
+
+def test_refill_capped_at_burst() -> None:
+    '''
+    An idle bucket never holds more than `burst` tokens
+    '''
+    bucket: TokenBucket = TokenBucket(10, 3)
+    now: float = bucket.updated
+    take_all(bucket, now, 3)
+
+    assert take_all(bucket, now + 60, 10) == 3
+
+
+def test_sustained_rate() -> None:
+    '''
+    Over time, the events allowed approach `rate` per second plus the burst
+    '''
+    bucket: TokenBucket = TokenBucket(5, 2)
+    now: float = bucket.updated
+    allowed: int = sum(bucket.take(now + step / 100) for step in range(1000))
+
+    # 2 tokens at first, then 5 per second over the 9.99 seconds of attempts
+    assert allowed == 2 + 49
+
+
+def test_burst_at_least_one() -> None:
+    '''
+    A bucket always allows at least a single event
+    '''
+    bucket: TokenBucket = TokenBucket(1, 0)
+
+    assert bucket.take(bucket.updated)
+    assert not bucket.take(bucket.updated)
@@ -0,0 +1,145 @@
+'''
+test_registry.py :
+Tests of the ConnectionRegistry class
+'''
+# --- Libraries --- #
+import threading
+from typing import Any, List, Tuple
+
+import pytest
+
+from terminal_chat_app.registry import ConnectionRegistry
+
+# --- Helpers --- #
+@pytest.fixture
+def registry() -> ConnectionRegistry:
+    '''
+    Registry holding one registered client and one connection in its handshake.
+    Strings stand in for the connections, which are only used as keys
+    '''
+    registry: ConnectionRegistry = ConnectionRegistry()
+    registry.add('alice-conn', ('127.0.0.1', 1000))
+    registry.add('pending-conn', ('127.0.0.1', 1001))
+    registry.claim('alice')
+    registry.register('alice-conn', 'alice')
+    return registry
+
+
+# --- Tests --- #
+def test_lookups(registry: ConnectionRegistry) -> None:
+    '''
+    Connections, addresses and usernames are found in both directions
+    '''
+    assert len(registry) == 2
+    assert 'pending-conn' in registry
+    assert registry.address('alice-conn') == ('127.0.0.1', 1000)
+    assert registry.username('alice-conn') == 'alice'
+    assert registry.connection('alice') == 'alice-conn'
+    assert registry.username('pending-conn') is None
+    assert registry.connection('bob') is None
+
+
+def test_claim_is_exclusive(registry: ConnectionRegistry) -> None:
+    '''
+    A username can only be claimed once, until it is released
+    '''
+    assert not registry.claim('alice')
+    assert registry.claim('bob')
+    assert not registry.claim('bob')
+
+    registry.release('bob')
+    assert registry.claim('bob')
+
+
+def test_claimed_username_not_registered(registry: ConnectionRegistry) -> None:
+    '''
+    A claimed username has no connection until its handshake completes
+    '''
+    registry.claim('bob')
+
+    assert registry.connection('bob') is None
+    assert registry.snapshot() == ('alice-conn',)
+
+
+def test_detach_keeps_claim(registry: ConnectionRegistry) -> None:
+    '''
+    A detached username stays claimed, without a connection, until it is released
+    '''
+    assert registry.detach('alice-conn') == 'alice'
+    assert registry.username('alice-conn') is None
+    assert registry.connection('alice') is None
+    assert not registry.claim('alice')
+
+    registry.release('alice')
+    assert registry.claim('alice')
+
+
+def test_reregister_after_detach(registry: ConnectionRegistry) -> None:
+    '''
+    A detached username can be bound to a new connection, and releasing it
+    later does not unbind the old connection twice
+    '''
+    registry.detach('alice-conn')
+    registry.add('resumed-conn', ('127.0.0.1', 1002))
+    registry.register('resumed-conn', 'alice')
+
+    assert registry.connection('alice') == 'resumed-conn'
+    assert registry.detach('alice-conn') is None
+    assert registry.connection('alice') == 'resumed-conn'
+
+
+def test_remove_releases_username(registry: ConnectionRegistry) -> None:
+    '''
+    Removing a connection forgets it and releases its username
+    '''
+    assert registry.remove('alice-conn') == 'alice'
+    assert 'alice-conn' not in registry
+    assert registry.connection('alice') is None
+    assert registry.claim('alice')
+    assert registry.remove('pending-conn') is None
+    assert len(registry) == 0
+
+
+def test_snapshot_shared_until_membership_changes(registry: ConnectionRegistry) -> None:
+    '''
+    The same snapshot is handed out until a client registers or leaves,
+    and a snapshot taken earlier is not changed by later membership changes
+    '''
+    first: Tuple[Any, ...] = registry.snapshot()
+    assert registry.snapshot() is first
+
+    registry.claim('bob')
+    registry.register('pending-conn', 'bob')
+    second: Tuple[Any, ...] = registry.snapshot()
+
+    assert second is not first
+    assert first == ('alice-conn',)
+    assert set(second) == {'alice-conn', 'pending-conn'}
+
+    registry.remove('alice-conn')
+    assert registry.snapshot() == ('pending-conn',)
+    assert set(second) == {'alice-conn', 'pending-conn'}
+
+
+def test_concurrent_claims() -> None:
+    '''
+    Handshakes racing for the same username from many threads get it only once
+    '''
+    registry: ConnectionRegistry = ConnectionRegistry()
+    start: threading.Barrier = threading.Barrier(16)
+    granted: List[bool] = []
+
+    def claim() -> None:
+        '''
+        Claim the username as soon as every thread is ready
+        '''
+        start.wait()
+        granted.append(registry.claim('alice'))
+
+    threads: List[threading.Thread] = [threading.Thread(target=claim) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert granted.count(True) == 1
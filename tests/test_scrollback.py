@@ -0,0 +1,137 @@
+'''
+test_scrollback.py :
+Tests of the RowLog and Scrollback classes
+'''
+# --- Libraries --- #
+from typing import List, Tuple
+
+import pytest
+
+from terminal_chat_app.scrollback import RowLog, Scrollback
+
+# --- Helpers --- #
+@pytest.fixture
+def small_pages(monkeypatch: pytest.MonkeyPatch) -> None:
+    '''
+    Pages of 4 rows and a cache of 2 pages, so a few rows span several pages
+    '''
+    monkeypatch.setattr(RowLog, 'PAGE_ROWS', 4)
+    monkeypatch.setattr(RowLog, 'CACHED_PAGES', 2)
+
+
+def rows(count: int, start: int=0) -> List[Tuple[str, int]]:
+    '''
+    Rows with distinct texts and colors
+    '''
+    return [('row %d' % number, number % 7) for number in range(start, start + count)]
+
+
+# --- Tests --- #
+def test_offset_index(small_pages: None) -> None:
+    '''
+    Rows of any length, empty ones included, are read back from their offsets,
+    with one index entry per row
+    '''
+    log: RowLog = RowLog()
+    records: List[bytes] = [b'', b'a', 'héllo'.encode('utf-8'), b'x' * 1000, b'', b'last']
+
+    for record in records:
+        log.append(record)
+
+    assert len(log) == len(records)
+    assert [log.get(position) for position in range(len(log))] == records
+
+    log.index.seek(0, 2)
+    assert log.index.tell() == len(records) * RowLog.INDEX_ENTRY.size
+
+
+def test_page_cache_evicts_least_recently_used(small_pages: None) -> None:
+    '''
+    Only the most recently used pages stay cached
+    '''
+    log: RowLog = RowLog()
+    for number in range(12):
+        log.append(b'%d' % number)
+
+    log.get(0)
+    log.get(4)
+    log.get(1)
+    log.get(8)
+
+    assert list(log.pages) == [0, 2]
+    assert log.get(5) == b'5'
+    assert list(log.pages) == [2, 1]
+
+
+def test_cached_last_page_sees_new_rows(small_pages: None) -> None:
+    '''
+    A row appended to a page that is already cached is read back
+    '''
+    log: RowLog = RowLog()
+    log.append(b'first')
+    assert log.get(0) == b'first'
+
+    log.append(b'second')
+
+    assert log.get(1) == b'second'
+    assert log.get(0) == b'first'
+
+
+def test_spill_to_disk(small_pages: None) -> None:
+    '''
+    Only the newest rows stay in memory, the older ones are spilled
+    '''
+    scrollback: Scrollback = Scrollback(3)
+    scrollback.extend(rows(10))
+
+    assert len(scrollback.recent) == 3
+    assert len(scrollback.spilled) == 7
+    assert len(scrollback) == 10
+    assert scrollback[0] == ('row 0', 0)
+    assert scrollback[-1] == ('row 9', 2)
+
+
+def test_read_across_memory_and_disk(small_pages: None) -> None:
+    '''
+    Prepended, spilled and in-memory rows are read in order, across their boundaries
+    '''
+    scrollback: Scrollback = Scrollback(3)
+    scrollback.extend(rows(6, start=4))
+    scrollback.prepend(rows(2, start=2))
+    scrollback.prepend(rows(2))
+
+    assert len(scrollback.prepended) == 4
+    assert scrollback[:] == rows(10)
+    assert scrollback[3:8] == rows(5, start=3)
+    assert scrollback[::-3] == rows(10)[::-3]
+
+
+def test_index_out_of_range() -> None:
+    '''
+    Positions past either end are rejected
+    '''
+    scrollback: Scrollback = Scrollback(2)
+    scrollback.extend(rows(3))
+
+    with pytest.raises(IndexError):
+        scrollback[3]
+    with pytest.raises(IndexError):
+        scrollback[-4]
+
+
+def test_clear(small_pages: None) -> None:
+    '''
+    Clearing removes the rows of memory and disk, and the scrollback can be reused
+    '''
+    scrollback: Scrollback = Scrollback(2)
+    scrollback.extend(rows(5))
+    scrollback.prepend(rows(2))
+    scrollback[0]
+
+    scrollback.clear()
+
+    assert len(scrollback) == 0
+    assert scrollback.spilled.pages == scrollback.prepended.pages == {}
+
+    scrollback.extend(rows(4, start=1))
+    assert scrollback[:] == rows(4, start=1)
@@ -0,0 +1,189 @@
+'''
+test_server.py :
+Tests of the server engines, run in-process
+'''
+# --- Libraries --- #
+import socket
+import threading
+from typing import Iterator, List, Type
+
+import pytest
+
+from terminal_chat_app.async_server import AsyncServer
+from terminal_chat_app.base_socket import BaseSocket
+from terminal_chat_app.envelope import Envelope
+from terminal_chat_app.reactor_server import ReactorServer
+from terminal_chat_app.receive_buffer import ReceiveBuffer
+from terminal_chat_app.server import Server
+
+from .test_federation import HOST, free_port
+
+# --- Helpers --- #
+FRAMING: BaseSocket = BaseSocket()
+
+
+@pytest.fixture(params=[Server, AsyncServer, ReactorServer], ids=['thread', 'async', 'reactor'])
+def server(request: pytest.FixtureRequest) -> Iterator[Server]:
+    '''
+    Server of every engine, listening on a free port
+    '''
+    engine: Type[Server] = request.param
+    running: Server = engine(HOST, free_port())
+    threading.Thread(target=running.start_server, daemon=True).start()
+
+    yield running
+    running.server_up = False
+
+
+def connect(server: Server) -> socket.socket:
+    '''
+    Raw connection to the server, retried until it listens
+    '''
+    for _ in range(50):
+        try:
+            conn: socket.socket = socket.create_connection(server.host_address)
+            conn.settimeout(5)
+            return conn
+        except ConnectionRefusedError:
+            threading.Event().wait(0.02)
+
+    raise ConnectionRefusedError('Server not listening')
+
+
+class RawClient:
+    '''
+    RawClient class -
+    Logged in connection to the server, in the default room,
+    reading its typed messages
+    '''
+    def __init__(self, server: Server, name: str) -> None:
+        '''
+        Initialization
+        '''
+        self.conn: socket.socket = connect(server)
+        self.buffer: ReceiveBuffer = ReceiveBuffer(FRAMING)
+        self.pending: List[Envelope] = []
+
+        self.send(Envelope(Envelope.LOGIN, name))
+        assert self.expect(Envelope.LOGIN).text == name
+        assert self.expect(Envelope.ROOM).text == server.DEFAULT_ROOM
+
+
+    def send(self, message: Envelope) -> None:
+        '''
+        Send a typed message to the server
+        '''
+        FRAMING.send_envelope(self.conn, message)
+        return
+
+
+    def expect(self, *kinds: int) -> Envelope:
+        '''
+        Next message of one of the given types, skipping the others
+        '''
+        while True:
+            while not self.pending:
+                self.pending = self.buffer.receive_envelopes(self.conn)
+
+            message: Envelope = self.pending.pop(0)
+            if message.kind in kinds and not message.replayed:
+                return message
+
+
+    def expect_notice(self, text: str) -> str:
+        '''
+        Wait for the given announcement, skipping the other messages
+        '''
+        while self.expect(Envelope.NOTICE).text != text:
+            pass
+
+        return text
+
+
+    def close(self) -> None:
+        '''
+        Leave the server
+        '''
+        self.send(Envelope(Envelope.QUIT))
+        self.conn.close()
+        return
+
+
+# --- Tests --- #
+def test_quit_during_handshake(server: Server) -> None:
+    '''
+    A client leaving before it has a username gets the quit reply
+    before the server closes the connection
+    '''
+    conn: socket.socket = connect(server)
+    FRAMING.send_envelope(conn, Envelope(Envelope.QUIT))
+
+    assert FRAMING.receive_envelope(conn).kind == Envelope.QUIT
+    assert conn.recv(1) == b''
+    conn.close()
+
+
+def test_room_broadcasts(server: Server) -> None:
+    '''
+    Room messages only reach the members of the room,
+    and members are told when someone joins or leaves
+    '''
+    alice, bob, carol = (RawClient(server, name) for name in ('alice', 'bob', 'carol'))
+
+    alice.send(Envelope(Envelope.JOIN, 'dev'))
+    assert alice.expect(Envelope.ROOM).text == 'dev'
+    bob.send(Envelope(Envelope.JOIN, 'dev'))
+    assert bob.expect(Envelope.ROOM).text == 'dev'
+    assert alice.expect_notice('bob joined the room')
+
+    # The echo shows a message was broadcast before the other room talks
+    alice.send(Envelope(Envelope.CHAT, 'in dev'))
+    assert alice.expect(Envelope.CHAT).text == 'in dev'
+    carol.send(Envelope(Envelope.CHAT, 'in lobby'))
+
+    assert bob.expect(Envelope.CHAT).text == 'in dev'
+    assert carol.expect(Envelope.CHAT).text == 'in lobby'
+
+    bob.send(Envelope(Envelope.LEAVE))
+    assert bob.expect(Envelope.ROOM).text == server.DEFAULT_ROOM
+    assert alice.expect_notice('bob left the room')
+
+    alice.send(Envelope(Envelope.CHAT, 'alone in dev'))
+    assert alice.expect(Envelope.CHAT).text == 'alone in dev'
+    carol.send(Envelope(Envelope.CHAT, 'back in lobby'))
+
+    assert bob.expect(Envelope.CHAT).text == 'back in lobby'
+    assert carol.expect(Envelope.CHAT).text == 'back in lobby'
+
+    for client in (alice, bob, carol):
+        client.close()
+
+
+def test_direct_receipts(server: Server) -> None:
+    '''
+    A private message reaches its recipient only, and its sender gets a
+    delivered receipt, or an undelivered one when the recipient is not online
+    '''
+    alice, bob, carol = (RawClient(server, name) for name in ('alice', 'bob', 'carol'))
+
+    alice.send(Envelope(Envelope.DIRECT, 'psst', 'bob'))
+    received: Envelope = bob.expect(Envelope.PRIVATE)
+    receipt: Envelope = alice.expect(Envelope.DELIVERED, Envelope.UNDELIVERED)
+
+    assert (received.sender, received.text) == ('alice', 'psst')
+    assert (receipt.kind, receipt.sender, receipt.text) == (Envelope.DELIVERED, 'bob', 'psst')
+
+    alice.send(Envelope(Envelope.DIRECT, 'hello?', 'zed'))
+    receipt = alice.expect(Envelope.DELIVERED, Envelope.UNDELIVERED)
+
+    assert (receipt.kind, receipt.sender, receipt.text) == (Envelope.UNDELIVERED, 'zed', 'hello?')
+
+    alice.send(Envelope(Envelope.DIRECT, '', 'bob'))
+    assert alice.expect_notice('A private message needs a recipient and a text')
+
+    # Private messages are not broadcast
+    carol.send(Envelope(Envelope.CHAT, 'anyone?'))
+    assert carol.expect(Envelope.PRIVATE, Envelope.CHAT).text == 'anyone?'
+
+    for client in (alice, bob, carol):
+        client.close()
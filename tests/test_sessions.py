@@ -0,0 +1,159 @@
+'''
+test_sessions.py :
+Tests of the SessionStore class
+'''
+# --- Libraries --- #
+import socket
+from typing import Iterator, Tuple
+
+import pytest
+
+from terminal_chat_app.sessions import SessionStore
+
+# --- Helpers --- #
+@pytest.fixture
+def store() -> SessionStore:
+    '''
+    Store keeping suspended sessions for 3 one-second ticks
+    '''
+    return SessionStore(3.0)
+
+
+@pytest.fixture
+def conns() -> Iterator[Tuple[socket.socket, socket.socket]]:
+    '''
+    Two connections standing for the clients
+    '''
+    first, second = socket.socketpair()
+    yield first, second
+    first.close()
+    second.close()
+
+
+def at(store: SessionStore, ticks: float) -> float:
+    '''
+    Time `ticks` ticks after the store's timer wheel started
+    '''
+    return store.timers.start + ticks * store.timers.tick
+
+
+# --- Tests --- #
+def test_tokens_are_unique(store: SessionStore, conns: Tuple[socket.socket, socket.socket]) -> None:
+    '''
+    Every session gets its own token
+    '''
+    first, second = conns
+
+    assert store.issue(first, 'alice') != store.issue(second, 'bob')
+    assert store.token(first) != store.token(second)
+
+
+def test_resume_suspended_session(store: SessionStore, conns: Tuple[socket.socket, socket.socket]) -> None:
+    '''
+    A suspended session is resumed once, with its username and room
+    '''
+    first, _ = conns
+    token: str = store.issue(first, 'alice')
+
+    assert store.suspend(first, 'dev')
+    assert store.token(first) is None
+    assert len(store) == 1
+
+    assert store.resume(token) == ('alice', 'dev', None)
+    assert len(store) == 0
+    assert len(store.timers) == 0
+    assert store.resume(token) is None
+
+
+def test_resume_active_session(store: SessionStore, conns: Tuple[socket.socket, socket.socket]) -> None:
+    '''
+    A session whose lost connection was not noticed yet is taken over, with that connection
+    '''
+    first, _ = conns
+    token: str = store.issue(first, 'alice')
+
+    assert store.resume(token) == ('alice', None, first)
+    assert store.token(first) is None
+    assert store.resume(token) is None
+
+
+def test_unknown_token(store: SessionStore) -> None:
+    '''
+    A token that was never issued resumes nothing
+    '''
+    assert store.resume('unknown') is None
+
+
+def test_discarded_session(store: SessionStore, conns: Tuple[socket.socket, socket.socket]) -> None:
+    '''
+    The session of a client that left can neither be suspended nor resumed
+    '''
+    first, _ = conns
+    token: str = store.issue(first, 'alice')
+
+    store.discard(first)
+
+    assert not store.suspend(first, None)
+    assert store.resume(token) is None
+
+
+def test_suspend_disabled(conns: Tuple[socket.socket, socket.socket]) -> None:
+    '''
+    Without a timeout, sessions end with their connection
+    '''
+    first, _ = conns
+    store: SessionStore = SessionStore(0)
+    store.issue(first, 'alice')
+
+    assert not store.enabled
+    assert not store.suspend(first, None)
+    assert len(store) == 0
+
+
+def test_reuse_token(store: SessionStore, conns: Tuple[socket.socket, socket.socket]) -> None:
+    '''
+    A session resumed on a new connection keeps its token
+    '''
+    first, second = conns
+    token: str = store.issue(first, 'alice')
+    store.suspend(first, None)
+    name, _, _ = store.resume(token)
+
+    assert store.issue(second, name, token) == token
+    assert store.token(second) == token
+
+    assert store.suspend(second, 'dev')
+    assert store.resume(token) == ('alice', 'dev', None)
+
+
+def test_expire_through_timer_wheel(store: SessionStore, conns: Tuple[socket.socket, socket.socket]) -> None:
+    '''
+    Suspended sessions expire on the tick their timeout ends,
+    and an expired token can no longer be resumed
+    '''
+    first, second = conns
+    expiring: str = store.issue(first, 'alice')
+    resumed: str = store.issue(second, 'bob')
+    store.suspend(first, None)
+    store.suspend(second, None)
+    store.resume(resumed)
+
+    assert store.expire(at(store, 2.5)) == []
+    assert store.expire(at(store, 3.5)) == ['alice']
+    assert store.expire(at(store, 5)) == []
+    assert store.resume(expiring) is None
+
+
+def test_restore_state(store: SessionStore, conns: Tuple[socket.socket, socket.socket]) -> None:
+    '''
+    Suspended sessions move to another store with their tokens, for a full timeout
+    '''
+    first, _ = conns
+    token: str = store.issue(first, 'alice')
+    store.suspend(first, 'dev')
+
+    other: SessionStore = SessionStore(3.0)
+
+    assert other.restore(store.state()) == ['alice']
+    assert other.expire(at(other, 2)) == []
+    assert other.resume(token) == ('alice', 'dev', None)
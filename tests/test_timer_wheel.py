@@ -0,0 +1,103 @@
+'''
+test_timer_wheel.py :
+Tests of the TimerWheel class
+'''
+# --- Libraries --- #
+import pytest
+
+from terminal_chat_app.timer_wheel import TimerWheel
+
+# --- Helpers --- #
+@pytest.fixture
+def wheel() -> TimerWheel:
+    '''
+    Wheel of 4 one-second slots, so a full turn is reached quickly
+    '''
+    return TimerWheel(1.0, 4)
+
+
+def at(wheel: TimerWheel, ticks: float) -> float:
+    '''
+    Time `ticks` ticks after the wheel started
+    '''
+    return wheel.start + ticks * wheel.tick
+
+
+# --- Tests --- #
+def test_expires_on_first_tick_after_deadline(wheel: TimerWheel) -> None:
+    '''
+    A timer expires on the first tick at or after its deadline, only once
+    '''
+    wheel.schedule('a', 2.5)
+
+    assert wheel.advance(at(wheel, 2.9)) == []
+    assert wheel.advance(at(wheel, 3)) == ['a']
+    assert wheel.advance(at(wheel, 4)) == []
+    assert len(wheel) == 0
+
+
+def test_waits_at_least_one_tick(wheel: TimerWheel) -> None:
+    '''
+    A timer without a delay expires on the next tick, not the current one
+    '''
+    wheel.schedule('a', 0)
+
+    assert wheel.advance(at(wheel, 0.5)) == []
+    assert wheel.advance(at(wheel, 1)) == ['a']
+
+
+def test_reschedule_replaces_timer(wheel: TimerWheel) -> None:
+    '''
+    Scheduling a key again moves its timer instead of adding another one
+    '''
+    wheel.schedule('a', 1)
+    wheel.schedule('a', 3)
+
+    assert len(wheel) == 1
+    assert wheel.advance(at(wheel, 2)) == []
+    assert wheel.advance(at(wheel, 3)) == ['a']
+
+
+def test_cancel(wheel: TimerWheel) -> None:
+    '''
+    A cancelled timer never expires, and cancelling twice is harmless
+    '''
+    wheel.schedule('a', 1)
+    wheel.cancel('a')
+    wheel.cancel('a')
+
+    assert len(wheel) == 0
+    assert wheel.advance(at(wheel, 2)) == []
+
+
+def test_timer_beyond_one_turn(wheel: TimerWheel) -> None:
+    '''
+    A timer further away than a full turn stays in its slot until its tick comes
+    '''
+    wheel.schedule('far', 10)
+    wheel.schedule('near', 2)
+
+    assert wheel.advance(at(wheel, 6)) == ['near']
+    assert wheel.advance(at(wheel, 9)) == []
+    assert wheel.advance(at(wheel, 10)) == ['far']
+
+
+def test_advance_several_ticks(wheel: TimerWheel) -> None:
+    '''
+    Advancing over several ticks at once expires every timer on the way, in tick order
+    '''
+    for key, delay in (('c', 3), ('a', 1), ('b', 2)):
+        wheel.schedule(key, delay)
+
+    assert wheel.advance(at(wheel, 5)) == ['a', 'b', 'c']
+
+
+def test_schedule_relative_to_current_tick(wheel: TimerWheel) -> None:
+    '''
+    Delays count from the last tick the wheel advanced to
+    '''
+    wheel.advance(at(wheel, 5))
+    wheel.schedule('a', 2)
+
+    assert wheel.advance(at(wheel, 6)) == []
+    assert wheel.advance(at(wheel, 7)) == ['a']